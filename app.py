@@ -1,165 +1,320 @@
 # app.py - Global Microplastic Intake Research Analyzer
 
 from flask import Flask, request, jsonify, send_from_directory
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-from mlxtend.frequent_patterns import apriori, association_rules
+import cProfile
 import os
-import io
-import base64
-import numpy as np
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from jobs import JobManager, JobQueueFull
+from json_provider import json_provider_class
+from metrics import DURATION_BUCKETS, MEMORY_BUCKETS, Histogram, format_metric
+from microplastic import (ANALYSIS_STAGES, HEALTH_THRESHOLDS, MIN_CONFIDENCE, MIN_SUPPORT, AnalysisInputError,
+                          analysis_options, analyze_csv, country_page, country_page_options, decode_country_table,
+                          decode_plot_spec, parse_plot_dpi, query_options, render_cluster_plot)
+from microplastic.query import build_index, query_table
+from microplastic.plotting import PLOT_DPI, PLOT_FORMATS
+from microplastic.store import DatasetStore, dataset_directory
+from microplastic.streaming import STREAMING_CHUNK_ROWS
+from microplastic.timing import StageTimer
+from result_cache import ResultCache, hash_upload, pack_entry, unpack_entry
 
 # Initialize the Flask application
 app = Flask(__name__, static_folder='static')
+# orjson when installed: numpy values in results are encoded natively instead of converted first
+app.json = json_provider_class()(app)
 
-# Health risk thresholds (particles per gram/liter) based on research
-HEALTH_THRESHOLDS = {
-    'low': 50,
-    'moderate': 150,
-    'high': 300,
-    'very_high': 500
-}
-
-# Country-specific health recommendations
-COUNTRY_RECOMMENDATIONS = {
-    'high_risk': {
-        'policy': 'Implement strict regulations on plastic waste management and water quality standards',
-        'public_health': 'Launch nationwide awareness campaigns about microplastic risks',
-        'individual': 'Prioritize filtered water access and fresh food distribution programs'
-    },
-    'moderate_risk': {
-        'policy': 'Strengthen environmental monitoring and plastic recycling programs',
-        'public_health': 'Educate consumers about safer food choices and water sources',
-        'individual': 'Promote local, sustainable food systems and plastic alternatives'
-    },
-    'low_risk': {
-        'policy': 'Maintain current environmental protections and continue monitoring',
-        'public_health': 'Share best practices with higher-risk regions',
-        'individual': 'Continue sustainable practices and support global initiatives'
-    }
-}
-
-# Food source information for research analysis
-FOOD_SOURCE_INFO = {
-    'Seafood_Intake': {
-        'name': 'Seafood',
-        'description': 'Fish, shellfish, and other marine foods',
-        'main_risk': 'Ocean pollution and marine plastic ingestion',
-        'global_solution': 'Reduce ocean plastic pollution, implement sustainable fishing practices',
-        'country_action': 'Monitor coastal water quality, regulate fishing in polluted areas'
-    },
-    'Bottled_Water_Intake': {
-        'name': 'Bottled Water',
-        'description': 'Commercial bottled drinking water',
-        'main_risk': 'Plastic bottle degradation and processing contamination',
-        'global_solution': 'Improve bottled water regulations, promote alternatives',
-        'country_action': 'Set microplastic limits for bottled water, improve tap water infrastructure'
-    },
-    'Salt_Intake': {
-        'name': 'Table Salt',
-        'description': 'Sea salt and processed salt products',
-        'main_risk': 'Ocean and environmental contamination during production',
-        'global_solution': 'Cleaner salt production methods, environmental protection',
-        'country_action': 'Monitor salt production facilities, establish quality standards'
-    },
-    'Sugar_Intake': {
-        'name': 'Sugar Products',
-        'description': 'Processed sugar and sweeteners',
-        'main_risk': 'Contamination during processing and packaging',
-        'global_solution': 'Improve food processing standards, reduce plastic packaging',
-        'country_action': 'Regulate food processing facilities, monitor contamination levels'
-    },
-    'Packaged_Food_Intake': {
-        'name': 'Packaged Foods',
-        'description': 'Pre-packaged and processed foods',
-        'main_risk': 'Plastic packaging migration and processing contamination',
-        'global_solution': 'Develop safer packaging materials, reduce plastic use',
-        'country_action': 'Set packaging standards, promote fresh food access'
+# Worker processes for the automatic k search (clusters=auto); defaults to the CPU count
+CLUSTER_SEARCH_WORKERS = int(os.environ['MICROPLASTIC_CLUSTER_SEARCH_WORKERS']) if os.environ.get('MICROPLASTIC_CLUSTER_SEARCH_WORKERS') else None
+
+# Caches are in-memory LRUs, plus on-disk tiers in subdirectories of MICROPLASTIC_CACHE_DIR when it is set.
+# MICROPLASTIC_CACHE_MAX_BYTES is the budget of all the disk tiers together, shared out as below.
+CACHE_DIR = os.environ.get('MICROPLASTIC_CACHE_DIR')
+CACHE_MAX_BYTES = int(os.environ.get('MICROPLASTIC_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+CACHE_DISK_SHARES = {'results': 0.5, 'tables': 0.25, 'plots': 0.05, 'images': 0.2}
+
+def cache_disk(name):
+    """disk_dir and max_disk_bytes of one cache's share of the disk tier (no disk tier without MICROPLASTIC_CACHE_DIR)"""
+    return {
+        'disk_dir': os.path.join(CACHE_DIR, name) if CACHE_DIR else None,
+        'max_disk_bytes': int(CACHE_MAX_BYTES * CACHE_DISK_SHARES[name])
     }
-}
+
+# Bump RESULT_CACHE_VERSION whenever the analysis output changes so old entries are ignored.
+RESULT_CACHE_VERSION = 10
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('MICROPLASTIC_CACHE_ENTRIES', 32)),
+    # Each entry is the response JSON packed with the plot spec and country table it links to (see cached_result())
+    extension='.bundle',
+    **cache_disk('results')
+)
+
+# Background analysis jobs run on a bounded pool of worker processes
+job_manager = JobManager(
+    ANALYSIS_STAGES,
+    max_workers=int(os.environ.get('MICROPLASTIC_JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('MICROPLASTIC_JOB_QUEUE', 16)),
+    # Set when several server processes run (see serve.py) so any of them can answer for a job
+    shared_dir=os.environ.get('MICROPLASTIC_JOB_DIR'),
+    # Reported as 400 by /jobs/<id>/result, as /analyze does for the same upload
+    client_errors=(AnalysisInputError,)
+)
+
+# Plot specs, content-addressed like analysis results, and the images rendered from them (keyed id.dpi.format).
+# Kept apart so that rendering images never pushes out the specs they are rendered from.
+plot_cache = ResultCache(
+    max_entries=int(os.environ.get('MICROPLASTIC_PLOT_CACHE_ENTRIES', 64)),
+    extension='.npz',
+    **cache_disk('plots')
+)
+image_cache = ResultCache(
+    max_entries=int(os.environ.get('MICROPLASTIC_IMAGE_CACHE_ENTRIES', 64)),
+    extension='',
+    **cache_disk('images')
+)
+
+# Country tables of analysis results, paged and queried through /countries/<table_id>
+table_cache = ResultCache(
+    max_entries=int(os.environ.get('MICROPLASTIC_TABLE_CACHE_ENTRIES', 64)),
+    extension='.npz',
+    **cache_disk('tables')
+)
+
+# Caches of the payloads a cached result links to; each result entry carries copies to restore them
+LINKED_CACHES = {'plot': plot_cache, 'table': table_cache}
+
+# Decoded tables with their query indexes, so repeated drill-downs skip decoding and sorting
+TABLE_INDEX_ENTRIES = int(os.environ.get('MICROPLASTIC_TABLE_INDEX_ENTRIES', 8))
+table_indexes = OrderedDict()
+table_indexes_lock = threading.Lock()
+
+# Persistent datasets grown through /datasets/<name>/samples, one directory each
+DATASET_DIR = os.environ.get('MICROPLASTIC_DATASET_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datasets')
+# Stores of recently used datasets; any other is reloaded from its directory when next used
+DATASET_STORE_ENTRIES = int(os.environ.get('MICROPLASTIC_DATASET_STORE_ENTRIES', 32))
+dataset_stores = OrderedDict()
+dataset_stores_lock = threading.Lock()
+
+# Long lists (e.g. country_analyses) are serialized this many items at a time when streaming a response
+JSON_STREAM_BATCH = 1000
+
+# Stage timings of every analysis that actually runs, exported at /metrics
+stage_duration = Histogram('microplastic_stage_duration_seconds', 'Time spent in each analysis stage',
+                           DURATION_BUCKETS, ('stage',))
+stage_memory = Histogram('microplastic_stage_peak_memory_bytes', 'Peak heap growth per analysis stage (timings=memory requests)',
+                         MEMORY_BUCKETS, ('stage',))
+analysis_memory = Histogram('microplastic_analysis_peak_memory_bytes', 'Peak heap growth per analysis (timings=memory requests)',
+                            MEMORY_BUCKETS, ('dtype',))
+analysis_duration = Histogram('microplastic_analysis_duration_seconds', 'Total analysis time per upload',
+                              DURATION_BUCKETS, ('mode',))
+
+# On-demand cProfile dumps (profile=1) are only produced when explicitly enabled
+PROFILING_ENABLED = os.environ.get('MICROPLASTIC_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('MICROPLASTIC_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'microplastic-profiles')
+PROFILE_TOP_FUNCTIONS = 15
 
 # --- Main Route to Serve the Frontend ---
 @app.route('/')
 def index():
     return send_from_directory(app.static_folder, 'index.html')
 
-# --- Helper Functions for Population Analysis ---
-def get_risk_level(value):
-    """Determine risk level based on microplastic intake value"""
-    if value < HEALTH_THRESHOLDS['low']:
-        return 'Low', 'green'
-    elif value < HEALTH_THRESHOLDS['moderate']:
-        return 'Moderate', 'orange'
-    elif value < HEALTH_THRESHOLDS['high']:
-        return 'High', 'red'
-    else:
-        return 'Very High', 'darkred'
-
-def analyze_country_risk(country_data):
-    """Analyze risk level for a specific country/region"""
-    total_intake = sum([country_data[col] for col in country_data.index if col in FOOD_SOURCE_INFO])
-    avg_intake = total_intake / len([col for col in country_data.index if col in FOOD_SOURCE_INFO])
-    
-    risk_level, color = get_risk_level(avg_intake)
-    
-    # Generate country-specific recommendations
-    if risk_level in ['High', 'Very High']:
-        recommendations = COUNTRY_RECOMMENDATIONS['high_risk']
-    elif risk_level == 'Moderate':
-        recommendations = COUNTRY_RECOMMENDATIONS['moderate_risk']
-    else:
-        recommendations = COUNTRY_RECOMMENDATIONS['low_risk']
-    
-    return {
-        'average_intake': round(avg_intake, 1),
-        'total_intake': round(total_intake, 1),
-        'risk_level': risk_level,
-        'color': color,
-        'recommendations': recommendations
+# --- Helper Functions for the Analysis Endpoints ---
+def analysis_parameters(options):
+    """Parameters that affect the analysis output, used in the result cache key"""
+    params = {
+        'version': RESULT_CACHE_VERSION,
+        'thresholds': HEALTH_THRESHOLDS,
+        'min_support': MIN_SUPPORT,
+        'min_confidence': MIN_CONFIDENCE,
+        # Concurrency changes how fast the results come, not what they are
+        **{name: value for name, value in options.items() if name != 'stage_workers'}
     }
+    if options['mode'] == 'streaming':
+        params['chunk_rows'] = STREAMING_CHUNK_ROWS
+    return params
+
+def instrumentation_options(values):
+    """Per-request diagnostics: a timings block (time or memory) and a cProfile dump"""
+    timings = values.get('timings', '').lower()
+    if timings in ('1', 'true', 'yes'):
+        timings = 'time'
+    if timings not in ('', 'time', 'memory'):
+        raise AnalysisInputError(f"Unknown timings mode '{timings}' (choose from time, memory)")
+    profile = values.get('profile', '').lower() in ('1', 'true', 'yes')
+    if profile and not PROFILING_ENABLED:
+        raise AnalysisInputError("Profiling is disabled on this server (set MICROPLASTIC_PROFILING=1)")
+    return {'timings': timings, 'profile': profile}
+
+def record_stage_metrics(stage_report, mode, seconds):
+    """Add one analysis' per-stage measurements and wall-clock seconds to the /metrics histograms"""
+    for measured in stage_report:
+        stage_duration.observe(measured['seconds'], stage=measured['stage'])
+        if 'peak_memory_bytes' in measured:
+            stage_memory.observe(measured['peak_memory_bytes'], stage=measured['stage'])
+    # Stages may overlap, so the total is the timer's elapsed time rather than their sum
+    analysis_duration.observe(seconds, mode=mode)
+
+def json_chunks(results):
+    """Encode a results dict piece by piece, giving the same bytes as jsonify(results).
+
+    Each top-level section is encoded on its own and long lists a batch of items at a
+    time, so a huge response is never built as one string.
+    """
+    def dumps(value):
+        return app.json.dumps(value, separators=(',', ':'))
 
-def generate_global_insights(df):
-    """Generate insights for the global dataset"""
-    numeric_df = df.select_dtypes(include=['number'])
-    
-    insights = {
-        'total_countries': len(df),
-        'global_avg_intake': round(numeric_df.sum(axis=1).mean(), 1),
-        'highest_risk_country': '',
-        'lowest_risk_country': '',
-        'most_problematic_food': '',
-        'safest_food': ''
+    yield '{'
+    for i, key in enumerate(sorted(results)):
+        yield (',' if i else '') + dumps(key) + ':'
+        value = results[key]
+        if isinstance(value, list) and len(value) > JSON_STREAM_BATCH:
+            yield '['
+            for start in range(0, len(value), JSON_STREAM_BATCH):
+                yield (',' if start else '') + dumps(value[start:start + JSON_STREAM_BATCH])[1:-1]
+            yield ']'
+        else:
+            yield dumps(value)
+    yield '}\n'
+
+def json_response(results, on_complete=None):
+    """Stream results as JSON; on_complete(body) receives the full body once it has been sent"""
+    def generate():
+        chunks = []
+        for chunk in json_chunks(results):
+            data = chunk.encode('utf-8')
+            if on_complete:
+                chunks.append(data)
+            yield data
+        if on_complete:
+            on_complete(b''.join(chunks))
+
+    return app.response_class(generate(), mimetype='application/json')
+
+def cached_response(cache_key, results, instrumentation=None):
+    """Stream the results, storing the serialized bytes in the result cache once complete.
+
+    Instrumented responses (timings/profile) describe one particular run, so they are
+    returned as is and not cached.
+    """
+    # The plot spec is kept server-side; the response only links to the rendered image
+    attachments = []
+    plot_spec = results.pop('plot_spec', None)
+    if plot_spec is not None:
+        plot_cache.put(results['visualization_id'], plot_spec)
+        attachments.append(('plot', results['visualization_id'], plot_spec))
+
+    # Kept for paging and drill-down queries; compact results send only its first page
+    country_table = results.pop('country_table', None)
+    if country_table is not None:
+        table_cache.put(results['country_table_id'], country_table)
+        attachments.append(('table', results['country_table_id'], country_table))
+
+    stage_report = results.pop('stage_report', None)
+    analysis_seconds = results.pop('analysis_seconds', None)
+    if stage_report:
+        record_stage_metrics(stage_report, results.get('ingestion', {}).get('mode', 'full'), analysis_seconds)
+
+    instrumentation = instrumentation or {}
+    if instrumentation.get('timings'):
+        results['timings'] = stage_report
+    if instrumentation.get('timings') or instrumentation.get('profile'):
+        response = json_response(results)
+        response.headers['X-Cache'] = 'BYPASS'
+        return response
+
+    response = json_response(results, lambda payload: result_cache.put(cache_key, pack_entry(payload, attachments)))
+    response.headers['X-Cache'] = 'MISS'
+    return response
+
+def cached_result(cache_key):
+    """Serialized results of a cached analysis, or None.
+
+    The payloads the results link to are put back into their caches if those evicted
+    them first, so a cached response never points at a missing plot or table.
+    """
+    entry = result_cache.get(cache_key)
+    if entry is None:
+        return None
+    payload, attachments = unpack_entry(entry)
+    for name, key, data in attachments:
+        if not LINKED_CACHES[name].touch(key):
+            LINKED_CACHES[name].put(key, data)
+    return payload
+
+def render_job_result(cache_key, results):
+    """Serialized results of a finished job, for job managers sharing them between processes"""
+    return cached_response(cache_key, results).get_data()
+
+job_manager.render = render_job_result
+
+def profiled_analysis(file, options, trace_memory):
+    """Run analyze_upload under cProfile, save the dump and summarize the costliest calls"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler = cProfile.Profile()
+    results = profiler.runcall(analyze_upload, file, options, None, trace_memory)
+
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof'
+    profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+
+    functions = pstats.Stats(profiler).get_stats_profile().func_profiles
+    top = sorted(functions.items(), key=lambda item: item[1].cumtime, reverse=True)[:PROFILE_TOP_FUNCTIONS]
+    results['profile'] = {
+        'url': f'/profiles/{name}',
+        'top_functions': [
+            {
+                'function': function,
+                'location': f'{stats.file_name}:{stats.line_number}',
+                'calls': stats.ncalls,
+                'cumulative_seconds': round(stats.cumtime, 4)
+            }
+            for function, stats in top
+        ]
     }
-    
-    # Find highest and lowest risk countries
-    country_risks = []
-    for idx, row in df.iterrows():
-        country = row.get('Region', f'Sample {idx+1}')
-        # Get only numeric values from the row
-        numeric_row = row[numeric_df.columns]
-        total_intake = sum([numeric_row[col] for col in numeric_row.index if col in FOOD_SOURCE_INFO])
-        country_risks.append((country, total_intake))
-    
-    country_risks.sort(key=lambda x: x[1], reverse=True)
-    insights['highest_risk_country'] = country_risks[0][0] if country_risks else 'Unknown'
-    insights['lowest_risk_country'] = country_risks[-1][0] if country_risks else 'Unknown'
-    
-    # Find most problematic food source
-    food_averages = []
-    for col in numeric_df.columns:
-        if col in FOOD_SOURCE_INFO:
-            avg_intake = numeric_df[col].mean()
-            food_averages.append((FOOD_SOURCE_INFO[col]['name'], avg_intake))
-    
-    food_averages.sort(key=lambda x: x[1], reverse=True)
-    insights['most_problematic_food'] = food_averages[0][0] if food_averages else 'Unknown'
-    insights['safest_food'] = food_averages[-1][0] if food_averages else 'Unknown'
-    
-    return insights
+    return results
+
+def analyze_upload(file, options, report_stage=None, trace_memory=False):
+    """Analyze an uploaded data file object and link the results to their cluster plot"""
+    report_stage = report_stage or (lambda stage: None)
+    timer = StageTimer(trace_memory=trace_memory)
+    if trace_memory:
+        # tracemalloc measures the whole process, so per-stage peaks need one stage at a time
+        options = {**options, 'stage_workers': 1}
+
+    def report(stage):
+        report_stage(stage)
+        timer(stage)
+    report.finish = timer.finish
+
+    results = analyze_csv(file, options, report, CLUSTER_SEARCH_WORKERS)
+    timer.stop()
+    # Taken out again by cached_response() for /metrics and the optional timings block
+    results['stage_report'] = timer.report()
+    results['analysis_seconds'] = timer.elapsed()
+    if trace_memory and 'memory' in results:
+        results['memory']['peak_bytes'] = timer.request_peak_memory()
+        analysis_memory.observe(results['memory']['peak_bytes'], dtype=results['memory']['dtype'])
+    visualization_url = None
+    if results.get('visualization_id'):
+        visualization_url = f"/plots/{results['visualization_id']}.{options['plot_format']}"
+        if options['plot_dpi'] != PLOT_DPI:
+            visualization_url += f"?dpi={options['plot_dpi']}"
+    results['visualization_url'] = visualization_url
+    if results.get('country_table_id'):
+        results['countries_url'] = f"/countries/{results['country_table_id']}"
+        results['query_url'] = f"/countries/{results['country_table_id']}/query"
+    return results
+
+def analyze_upload_job(path, options, report_stage):
+    """Process pool entry point: analyze an upload spooled to disk, then remove it"""
+    try:
+        with open(path, 'rb') as file:
+            return analyze_upload(file, options, report_stage)
+    finally:
+        os.remove(path)
 
 # --- API Endpoint for Population Analysis ---
 @app.route('/analyze', methods=['POST'])
@@ -169,210 +324,271 @@ def analyze_data():
         file = request.files['file']
         if not file:
             return jsonify({"error": "No file uploaded"}), 400
-        
-        df = pd.read_csv(file)
-        
-        # Select only the numeric columns for analysis
-        numeric_df = df.select_dtypes(include=['number'])
-        
-        if numeric_df.empty:
-            return jsonify({"error": "No numeric data found in CSV for analysis"}), 400
-
-        # --- 2. Global Insights ---
-        global_insights = generate_global_insights(df)
-
-        # --- 3. Country/Region Analysis ---
-        country_analyses = []
-        for idx, row in df.iterrows():
-            country_name = row.get('Region', f'Sample {idx + 1}')
-            # Get only numeric values from the row
-            numeric_row = row[numeric_df.columns]
-            
-            country_analysis = analyze_country_risk(numeric_row)
-            country_analysis['country'] = country_name
-            country_analysis['sample_id'] = idx + 1
-            
-            # Add detailed food source breakdown
-            food_breakdown = []
-            for col in numeric_row.index:
-                if col in FOOD_SOURCE_INFO:
-                    value = numeric_row[col]
-                    risk_level, color = get_risk_level(value)
-                    food_breakdown.append({
-                        'food_source': FOOD_SOURCE_INFO[col]['name'],
-                        'intake_level': round(value, 1),
-                        'risk_level': risk_level,
-                        'color': color
-                    })
-            
-            country_analysis['food_breakdown'] = sorted(food_breakdown, 
-                                                      key=lambda x: x['intake_level'], 
-                                                      reverse=True)
-            country_analyses.append(country_analysis)
-
-        # Sort countries by risk (highest first)
-        country_analyses.sort(key=lambda x: x['total_intake'], reverse=True)
-
-        # --- 4. Population-Level Clustering ---
-        scaler = StandardScaler()
-        scaled_features = scaler.fit_transform(numeric_df)
-        
-        optimal_k = min(3, len(df))
-        kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
-        clusters = kmeans.fit_predict(scaled_features)
-        df['Cluster'] = clusters
-        
-        # Create population cluster descriptions
-        cluster_analysis = df.groupby('Cluster').mean(numeric_only=True).reset_index()
-        cluster_descriptions = []
-        
-        for cluster_id in cluster_analysis['Cluster']:
-            cluster_data = cluster_analysis[cluster_analysis['Cluster'] == cluster_id].iloc[0]
-            cluster_countries = df[df['Cluster'] == cluster_id]['Region'].tolist() if 'Region' in df.columns else []
-            
-            avg_total = sum([cluster_data[col] for col in numeric_df.columns if col in FOOD_SOURCE_INFO])
-            
-            if avg_total < 400:
-                risk_category = "Low Risk Population"
-                description = "Countries/regions with relatively low microplastic exposure across food sources."
-                health_impact = "Minimal immediate health concerns, maintain current practices."
-                policy_recommendation = "Continue monitoring and share best practices globally."
-            elif avg_total < 800:
-                risk_category = "Moderate Risk Population"
-                description = "Countries/regions with moderate exposure levels requiring attention."
-                health_impact = "Potential long-term health risks, preventive measures recommended."
-                policy_recommendation = "Implement targeted interventions and strengthen regulations."
-            else:
-                risk_category = "High Risk Population"
-                description = "Countries/regions with concerning exposure levels needing urgent action."
-                health_impact = "Significant health risks, immediate intervention required."
-                policy_recommendation = "Emergency response protocols and comprehensive policy reform."
-            
-            cluster_descriptions.append({
-                'cluster_id': int(cluster_id),
-                'risk_category': risk_category,
-                'description': description,
-                'health_impact': health_impact,
-                'policy_recommendation': policy_recommendation,
-                'average_intake': round(avg_total, 1),
-                'countries': cluster_countries,
-                'sample_count': len(df[df['Cluster'] == cluster_id])
-            })
-
-        # --- 5. Food Source Global Analysis ---
-        food_source_global_analysis = []
-        percentile_75 = numeric_df.quantile(0.75)
-        
-        for column in numeric_df.columns:
-            if column in FOOD_SOURCE_INFO:
-                food_info = FOOD_SOURCE_INFO[column]
-                avg_intake = numeric_df[column].mean()
-                max_intake = numeric_df[column].max()
-                min_intake = numeric_df[column].min()
-                risk_level, color = get_risk_level(avg_intake)
-                high_risk_countries = (numeric_df[column] > percentile_75[column]).sum()
-                
-                food_source_global_analysis.append({
-                    'food_source': food_info['name'],
-                    'global_average': round(avg_intake, 1),
-                    'highest_exposure': round(max_intake, 1),
-                    'lowest_exposure': round(min_intake, 1),
-                    'risk_level': risk_level,
-                    'color': color,
-                    'countries_at_risk': int(high_risk_countries),
-                    'main_concern': food_info['main_risk'],
-                    'global_solution': food_info['global_solution'],
-                    'country_action': food_info['country_action']
-                })
-        
-        food_source_global_analysis.sort(key=lambda x: x['global_average'], reverse=True)
-
-        # --- 6. Association Analysis (Food Consumption Patterns) ---
-        binary_df = numeric_df.apply(lambda x: x > x.median()).astype(bool)
-        
-        try:
-            frequent_itemsets = apriori(binary_df, min_support=0.2, use_colnames=True)
-            rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=0.6)
-            
-            consumption_patterns = []
-            for _, rule in rules.iterrows():
-                antecedents = [FOOD_SOURCE_INFO.get(item, {}).get('name', item) for item in rule['antecedents']]
-                consequents = [FOOD_SOURCE_INFO.get(item, {}).get('name', item) for item in rule['consequents']]
-                
-                consumption_patterns.append({
-                    'high_consumption_in': ', '.join(antecedents),
-                    'often_leads_to_high': ', '.join(consequents),
-                    'confidence': f"{rule['confidence']:.1%}",
-                    'support': f"{rule['support']:.1%}",
-                    'implication': f"Countries with high {', '.join(antecedents)} consumption often also have high {', '.join(consequents)} exposure"
-                })
-        except:
-            consumption_patterns = []
-
-        # --- 7. Create Visualization ---
-        pca = PCA(n_components=2)
-        principal_components = pca.fit_transform(scaled_features)
-        pca_df = pd.DataFrame(data=principal_components, columns=['PC1', 'PC2'])
-        pca_df['Cluster'] = clusters
-        
-        # Add country labels if available
-        if 'Region' in df.columns:
-            pca_df['Country'] = df['Region'].values
-
-        plt.figure(figsize=(12, 8))
-        colors = ['green', 'orange', 'red']
-        
-        for i, cluster_desc in enumerate(cluster_descriptions):
-            cluster_data = pca_df[pca_df['Cluster'] == cluster_desc['cluster_id']]
-            plt.scatter(cluster_data['PC1'], cluster_data['PC2'], 
-                       c=colors[i % len(colors)], 
-                       label=f"{cluster_desc['risk_category']} (n={cluster_desc['sample_count']})",
-                       s=120, alpha=0.7, edgecolors='black', linewidth=1)
-            
-            # Add country labels if available
-            if 'Country' in cluster_data.columns:
-                for idx, row in cluster_data.iterrows():
-                    plt.annotate(row['Country'], (row['PC1'], row['PC2']), 
-                               xytext=(5, 5), textcoords='offset points', 
-                               fontsize=8, alpha=0.8)
-        
-        plt.title('Global Microplastic Exposure Risk Analysis', fontsize=16, fontweight='bold')
-        plt.xlabel('Dietary Pattern Component 1', fontsize=12)
-        plt.ylabel('Dietary Pattern Component 2', fontsize=12)
-        plt.legend(title='Population Risk Groups', title_fontsize=12, bbox_to_anchor=(1.05, 1))
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        
-        # Save plot
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=300, bbox_inches='tight')
-        img_buffer.seek(0)
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-        plt.close()
-
-        # --- 8. Package Results ---
-        results = {
-            "global_insights": global_insights,
-            "country_analyses": country_analyses,
-            "population_clusters": cluster_descriptions,
-            "food_source_analysis": food_source_global_analysis,
-            "consumption_patterns": consumption_patterns,
-            "visualization_url": f"data:image/png;base64,{img_base64}",
-            "research_summary": {
-                "total_samples": len(df),
-                "risk_distribution": {
-                    "high_risk": len([c for c in country_analyses if c['risk_level'] in ['High', 'Very High']]),
-                    "moderate_risk": len([c for c in country_analyses if c['risk_level'] == 'Moderate']),
-                    "low_risk": len([c for c in country_analyses if c['risk_level'] == 'Low'])
-                }
-            }
-        }
-        
-        return jsonify(results)
-    
+
+        # Identical uploads with identical parameters are served from the result cache
+        options = analysis_options(request.values)
+        instrumentation = instrumentation_options(request.values)
+        cache_key = ResultCache.make_key(hash_upload(file), analysis_parameters(options))
+        instrumented = instrumentation['timings'] or instrumentation['profile']
+        cached = None if instrumented else cached_result(cache_key)
+        if cached is not None:
+            response = app.response_class(cached, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        trace_memory = instrumentation['timings'] == 'memory'
+        if instrumentation['profile']:
+            results = profiled_analysis(file, options, trace_memory)
+        else:
+            results = analyze_upload(file, options, trace_memory=trace_memory)
+        return cached_response(cache_key, results, instrumentation)
+
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
 
+# --- Asynchronous Analysis Jobs ---
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an analysis and return its job id immediately"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    try:
+        options = analysis_options(request.values)
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    cache_key = ResultCache.make_key(hash_upload(file), analysis_parameters(options))
+    cached = cached_result(cache_key)
+    if cached is not None:
+        job_id = job_manager.add_completed(cached, cache_key)
+    else:
+        # Spool the upload to disk so workers read it from there instead of a pickled copy
+        path = job_manager.spool_path()
+        file.save(path)
+        try:
+            job_id = job_manager.submit(analyze_upload_job, path, options, cache_key=cache_key)
+        except JobQueueFull as e:
+            os.remove(path)
+            return jsonify({"error": str(e)}), 503
+        except Exception:
+            os.remove(path)
+            raise
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report a job's state and the analysis stage it has reached"""
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Return a finished job's analysis results"""
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if status['state'] == 'failed':
+        if status['error_kind'] == 'input':
+            return jsonify({"error": status['error']}), 400
+        return jsonify({"error": f"Analysis failed: {status['error']}"}), 500
+    if status['state'] != 'done':
+        return jsonify(status), 202
+
+    job = job_manager.job(job_id)
+    if job['payload'] is None:
+        response = cached_response(job['cache_key'], job['results'])
+        job_manager.store_payload(job_id, response.get_data())
+        return response
+    return app.response_class(job['payload'], mimetype='application/json')
+
+# --- Cluster Plot Images ---
+@app.route('/plots/<visualization_id>.<fmt>', methods=['GET'])
+def get_plot(visualization_id, fmt):
+    """Render (or serve a cached rendering of) an analysis' PCA cluster plot"""
+    if fmt not in PLOT_FORMATS:
+        return jsonify({"error": f"Unsupported plot format '{fmt}'"}), 404
+    try:
+        dpi = parse_plot_dpi(request.args.get('dpi', PLOT_DPI))
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+
+    image_key = f'{visualization_id}.{dpi}.{fmt}'
+    image = image_cache.get(image_key)
+    if image is None:
+        spec = plot_cache.get(visualization_id)
+        if spec is None:
+            return jsonify({"error": "Plot not found; re-run the analysis to regenerate it"}), 404
+        image = render_cluster_plot(decode_plot_spec(spec), fmt, dpi)
+        image_cache.put(image_key, image)
+
+    # Plot URLs are content-addressed, so browsers and proxies may cache them indefinitely
+    response = app.response_class(image, mimetype=PLOT_FORMATS[fmt])
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(image_key)
+    return response.make_conditional(request)
+
+# --- Compact Country Analyses ---
+@app.route('/countries/<table_id>', methods=['GET'])
+def get_country_page(table_id):
+    """Page through a compact result's country analyses (offset, limit, sort, order, risk)"""
+    try:
+        page_options = country_page_options(request.args)
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    payload = table_cache.get(table_id)
+    if payload is None:
+        return jsonify({"error": "Country table not found; re-run the analysis to regenerate it"}), 404
+    return jsonify(country_page(decode_country_table(payload), **page_options))
+
+def indexed_table(table_id):
+    """(table, index) of a cached country table, or None when it is not cached"""
+    with table_indexes_lock:
+        if table_id in table_indexes:
+            table_indexes.move_to_end(table_id)
+            return table_indexes[table_id]
+    payload = table_cache.get(table_id)
+    if payload is None:
+        return None
+    table = decode_country_table(payload)
+    entry = (table, build_index(table))
+    with table_indexes_lock:
+        table_indexes[table_id] = entry
+        while len(table_indexes) > TABLE_INDEX_ENTRIES:
+            table_indexes.popitem(last=False)
+    return entry
+
+@app.route('/countries/<table_id>/query', methods=['GET'])
+def query_countries(table_id):
+    """Drill down into a result's countries by region and/or a range or top-N of a food (region, by, min, max, top)"""
+    try:
+        options = query_options(request.args)
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    entry = indexed_table(table_id)
+    if entry is None:
+        return jsonify({"error": "Country table not found; re-run the analysis to regenerate it"}), 404
+    try:
+        return jsonify(query_table(*entry, **options))
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+
+# --- Persistent Datasets ---
+def dataset_store(name, create=False):
+    """The store of a named dataset, shared by every request in this process.
+
+    None if the dataset does not exist and create is False, so reads of unknown names
+    leave nothing behind.
+    """
+    directory = dataset_directory(DATASET_DIR, name)
+    with dataset_stores_lock:
+        if directory in dataset_stores:
+            dataset_stores.move_to_end(directory)
+            return dataset_stores[directory]
+        store = DatasetStore(directory)
+        if not create and not store.exists():
+            return None
+        dataset_stores[directory] = store
+        while len(dataset_stores) > DATASET_STORE_ENTRIES:
+            dataset_stores.popitem(last=False)
+        return store
+
+@app.route('/datasets/<name>/samples', methods=['POST'])
+def append_dataset_samples(name):
+    """Append an uploaded batch of samples to a dataset (created on first append) and return its updated results"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({"error": "No file uploaded"}), 400
+    try:
+        store = dataset_store(name, create=True)
+        batch = store.append(file)
+        results = store.results()
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Append failed: {str(e)}"}), 500
+    results['batch'] = batch
+    return jsonify(results)
+
+@app.route('/datasets/<name>', methods=['GET'])
+def get_dataset(name):
+    """Results for everything appended to a dataset so far, served from its running statistics"""
+    try:
+        store = dataset_store(name)
+        if store is None or not store.exists():
+            return jsonify({"error": f"Dataset '{name}' not found"}), 404
+        return jsonify(store.results())
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Read failed: {str(e)}"}), 500
+
+@app.route('/datasets/<name>/query', methods=['GET'])
+def query_dataset(name):
+    """Drill down into a dataset's regions by name and/or a range or top-N of a food's mean (region, by, min, max, top)"""
+    try:
+        options = query_options(request.args)
+        store = dataset_store(name)
+        if store is None or not store.exists():
+            return jsonify({"error": f"Dataset '{name}' not found"}), 404
+        return jsonify(store.query(**options))
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Query failed: {str(e)}"}), 500
+
+@app.route('/datasets/<name>/recompute', methods=['POST'])
+def recompute_dataset(name):
+    """Re-read every batch of a dataset to rebuild its statistics exactly"""
+    try:
+        store = dataset_store(name)
+        if store is None or not store.exists():
+            return jsonify({"error": f"Dataset '{name}' not found"}), 404
+        store.recompute()
+        return jsonify(store.results())
+    except AnalysisInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Recompute failed: {str(e)}"}), 500
+
+# --- Instrumentation ---
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage timing histograms and cache counters in the Prometheus text format"""
+    lines = stage_duration.render() + stage_memory.render() + analysis_memory.render() + analysis_duration.render()
+    for name, cache in (('result', result_cache), ('plot', plot_cache), ('image', image_cache), ('table', table_cache)):
+        stats = cache.stats()
+        lines += format_metric(f'microplastic_{name}_cache_lookups_total', f'{name.capitalize()} cache lookups by outcome', 'counter', [
+            ('', {'outcome': 'hit'}, stats['hits']),
+            ('', {'outcome': 'miss'}, stats['misses'])
+        ])
+        lines += format_metric(f'microplastic_{name}_cache_evictions_total', f'{name.capitalize()} cache evictions', 'counter', [
+            ('', {}, stats['evictions'])
+        ])
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles/<name>', methods=['GET'])
+def get_profile(name):
+    """Download a cProfile dump produced by a profile=1 request"""
+    if not PROFILING_ENABLED:
+        return jsonify({"error": "Profiling is disabled on this server"}), 404
+    return send_from_directory(PROFILE_DIR, name, mimetype='application/octet-stream', as_attachment=True)
+
+# --- Result Cache Statistics ---
+@app.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Report result cache hit/miss counters and tier sizes"""
+    return jsonify(result_cache.stats())
+
 # --- Educational Content Endpoint ---
 @app.route('/health-tips', methods=['GET'])
 def get_health_tips():
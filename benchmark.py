@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for Global Microplastic Research Analyzer
+=========================================================
+
+Generates synthetic datasets from 10^3 up to 10^7 rows (see create_sample_data.py)
+and times the analysis at every scale, both directly through the microplastic
+package and through the /analyze endpoint with the Flask test client. Latency,
+throughput, per-stage timings and peak RSS are written to a JSON baseline that
+later runs can be compared against:
+
+    python benchmark.py --scales 1e3,1e4,1e5 --output baseline.json
+    python benchmark.py --scales 1e3,1e4,1e5 --compare baseline.json
+
+--throughput instead starts the Flask development server and the production server
+(serve.py) in turn and measures requests per second against each over real HTTP.
+"""
+
+import argparse
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from create_sample_data import write_scaled_dataset
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_SCALES = '1e3,1e4,1e5'
+# Full mode returns one entry per sample, so very large scales are benchmarked in streaming mode only
+FULL_MODE_MAX_ROWS = 1_000_000
+
+
+def parse_scales(text):
+    """'1e3,1e4,250000' -> [1000, 10000, 250000]"""
+    return [int(float(part)) for part in text.split(',') if part.strip()]
+
+
+def dataset_path(data_dir, rows, seed):
+    """Path of the generated dataset for a scale, creating it on first use"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'synthetic_{rows}_seed{seed}.csv')
+    if not os.path.exists(path):
+        print(f'  generating {rows:,} rows -> {path}')
+        write_scaled_dataset(path, rows, seed)
+    return path
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_direct(path, mode):
+    """Analyze a file through the microplastic package (runs in a fresh worker process)"""
+    from microplastic import analysis_options, analyze_csv
+    from microplastic.timing import StageTimer
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    analyze_csv(path, analysis_options({'mode': mode}), timer)
+    seconds = time.perf_counter() - start
+    timer.stop()
+    return {'seconds': seconds, 'stages': timer.report(), 'peak_rss_bytes': peak_rss_bytes()}
+
+
+def run_http(path, mode):
+    """Analyze a file through POST /analyze with the Flask test client (fresh worker process)"""
+    import app
+
+    client = app.app.test_client()
+    with open(path, 'rb') as f:
+        data = f.read()
+    start = time.perf_counter()
+    # timings=1 bypasses the result cache, so every run does the full work
+    response = client.post('/analyze', data={'file': (io.BytesIO(data), os.path.basename(path)), 'mode': mode, 'timings': '1'},
+                           content_type='multipart/form-data')
+    seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f'/analyze returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return {
+        'seconds': seconds,
+        'stages': response.get_json()['timings'],
+        'peak_rss_bytes': peak_rss_bytes(),
+        'response_bytes': len(response.get_data())
+    }
+
+
+RUNNERS = {'direct': run_direct, 'http': run_http}
+
+
+def measure(path_name, file_path, mode, repeat):
+    """Run one benchmark case `repeat` times, each in a new process so peak RSS is per run"""
+    runs = []
+    context = multiprocessing.get_context('spawn')
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(RUNNERS[path_name], file_path, mode).result())
+    best = min(runs, key=lambda run: run['seconds'])
+    best['runs'] = [round(run['seconds'], 4) for run in runs]
+    best['peak_rss_bytes'] = max((run['peak_rss_bytes'] or 0) for run in runs) or None
+    return best
+
+
+def convert_numpy_types(obj):
+    """The recursive numpy-to-Python pre-pass results used to go through before jsonify (reference only)"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, dict):
+        return {key: convert_numpy_types(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_numpy_types(item) for item in obj]
+    return obj
+
+
+def json_encoders():
+    """Encoders to compare: the old pre-pass approach and each available JSON provider"""
+    from flask import Flask
+    from json_provider import NumpyJSONProvider, OrjsonProvider, orjson
+
+    app = Flask(__name__)
+    encoders = {
+        'convert_numpy_types+json': lambda results: json.dumps(convert_numpy_types(results), sort_keys=True, separators=(',', ':')),
+        'NumpyJSONProvider': lambda results: NumpyJSONProvider(app).dumps(results, separators=(',', ':'))
+    }
+    if orjson is not None:
+        encoders['OrjsonProvider'] = lambda results: OrjsonProvider(app).dumps(results)
+    return encoders
+
+
+def benchmark_serialization(scales, data_dir, seed, repeat):
+    """Time encoding full and compact /analyze results with each JSON encoder"""
+    from microplastic import analysis_options, analyze_csv
+
+    records = []
+    encoders = json_encoders()
+    for rows in scales:
+        file_path = dataset_path(data_dir, rows, seed)
+        for response in ('full', 'compact'):
+            results = analyze_csv(file_path, analysis_options({'compact': '1' if response == 'compact' else ''}))
+            results.pop('plot_spec')
+            results.pop('country_table', None)
+            for name, encode in encoders.items():
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    body = encode(results)
+                    timings.append(time.perf_counter() - start)
+                seconds = min(timings)
+                records.append({'rows': rows, 'response': response, 'encoder': name, 'seconds': round(seconds, 4),
+                                'bytes': len(body.encode('utf-8')), 'megabytes_per_second': round(len(body) / seconds / 2 ** 20, 1)})
+                print(f"  {rows:>10,} {response:<8} {name:<26} {seconds:9.4f}s  {records[-1]['bytes']:>12,} bytes")
+    return records
+
+
+SERVER_COMMANDS = {
+    # What `python app.py` runs, minus the reloader (which only restarts it on code changes)
+    'dev': lambda port, workers, threads: [sys.executable, '-c', f"import app; app.app.run(port={port}, debug=True, use_reloader=False)"],
+    'production': lambda port, workers, threads: [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}',
+                                                  '--workers', str(workers), '--threads', str(threads)]
+}
+
+
+def start_server(name, port, workers, threads):
+    """Launch a server and wait until it answers; returns (process, seconds until the first response)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(SERVER_COMMANDS[name](port, workers, threads), stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    while time.perf_counter() - start < 120:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} server exited with code {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/health-tips')
+            if connection.getresponse().status == 200:
+                return process, time.perf_counter() - start
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f'{name} server did not start within 120 s')
+
+
+def multipart_upload(path, fields):
+    """Request body and headers of a form posting a data file plus fields"""
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode('utf-8')
+             for key, value in fields.items()]
+    with open(path, 'rb') as f:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + f.read() + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def throughput_cases(data_path):
+    """name -> (method, path, body, headers)"""
+    return {
+        'health_tips': ('GET', '/health-tips', None, {}),
+        # Repeats of one upload: served from the result cache after the first
+        'analyze_cached': ('POST', '/analyze', *multipart_upload(data_path, {})),
+        # timings=1 bypasses the result cache, so every request runs the whole analysis
+        'analyze': ('POST', '/analyze', *multipart_upload(data_path, {'timings': '1'}))
+    }
+
+
+def load_test(port, case, requests, concurrency):
+    """Send `requests` identical requests from `concurrency` keep-alive clients; returns rate and latency figures"""
+    method, path, body, headers = case
+    per_client = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    def client(count):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        latencies, errors = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            errors += response.status != 200
+        connection.close()
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(client, per_client))
+    seconds = time.perf_counter() - start
+    latencies = np.concatenate([latencies for latencies, _ in outcomes])
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(errors for _, errors in outcomes),
+        'seconds': round(seconds, 4),
+        'requests_per_second': round(requests / seconds, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 1),
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 1)
+    }
+
+
+def benchmark_throughput(data_path, requests, concurrency, workers, threads, port=8765):
+    """Requests per second of the development server and serve.py on light, cached and uncached requests"""
+    cases = throughput_cases(data_path)
+    records = []
+    for name in SERVER_COMMANDS:
+        process, startup = start_server(name, port, workers, threads)
+        try:
+            for case_name, case in cases.items():
+                # A full analysis takes far longer than the other requests, so send fewer
+                count = max(requests // 10, concurrency) if case_name == 'analyze' else requests
+                record = {'server': name, 'case': case_name, 'startup_seconds': round(startup, 2),
+                          **load_test(port, case, count, concurrency)}
+                if name == 'production':
+                    record.update(workers=workers, threads=threads)
+                records.append(record)
+                print(f"  {name:<10} {case_name:<15} {record['requests_per_second']:>9,.1f} req/s  "
+                      f"p50 {record['p50_ms']:8.1f} ms  p95 {record['p95_ms']:8.1f} ms  errors {record['errors']}")
+        finally:
+            process.terminate()
+            process.wait()
+    return records
+
+
+def environment():
+    """Machine and code version the numbers were recorded on"""
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print latency changes against a baseline; returns the number of regressions"""
+    previous = {(r['rows'], r['mode'], r['path']): r for r in baseline['results']}
+    regressions = 0
+    print(f"\nComparison with baseline ({baseline['environment'].get('commit') or 'unknown commit'}):")
+    for result in results:
+        before = previous.get((result['rows'], result['mode'], result['path']))
+        if before is None:
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flag = '  faster'
+        print(f"  {result['rows']:>10,} {result['mode']:<9} {result['path']:<6} "
+              f"{before['seconds']:9.3f}s -> {result['seconds']:9.3f}s  ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the microplastic analysis at several dataset sizes.')
+    parser.add_argument('--scales', default=DEFAULT_SCALES, help='comma-separated row counts, e.g. 1e3,1e4,1e5,1e6,1e7 (default: %(default)s)')
+    parser.add_argument('--modes', default='full,streaming', help='analysis modes to run (default: %(default)s)')
+    parser.add_argument('--paths', default='direct,http', help='direct (package) and/or http (Flask test client)')
+    parser.add_argument('--full-max-rows', type=int, default=FULL_MODE_MAX_ROWS, help='largest scale run in full mode (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the fastest is recorded')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default='benchmark_data', help='where generated datasets are kept between runs')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='slowdown fraction reported as a regression (default: %(default)s)')
+    parser.add_argument('--serialization', action='store_true', help='only compare JSON encoders on analysis results')
+    parser.add_argument('--throughput', action='store_true', help='only measure requests/second of the dev server and serve.py')
+    parser.add_argument('--requests', type=int, default=200, help='requests per throughput case (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent throughput clients (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='serve.py worker processes (default: the CPU count)')
+    parser.add_argument('--threads', type=int, default=4, help='serve.py threads per worker (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.throughput:
+        # The first scale is the upload used for the /analyze cases
+        rows = parse_scales(args.scales)[0]
+        print(f'⏱️  Measuring server throughput ({rows:,}-row uploads, {args.concurrency} clients)...')
+        records = benchmark_throughput(dataset_path(args.data_dir, rows, args.seed), args.requests, args.concurrency,
+                                       args.workers, args.threads)
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'rows': rows, 'throughput': records}, f, indent=2)
+        print(f"\n✅ Wrote {len(records)} results to '{args.output}'")
+        return 0
+
+    if args.serialization:
+        print('⏱️  Comparing JSON encoders on analysis results...')
+        records = benchmark_serialization(parse_scales(args.scales), args.data_dir, args.seed, max(args.repeat, 3))
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'seed': args.seed, 'serialization': records}, f, indent=2)
+        print(f"\n✅ Wrote {len(records)} results to '{args.output}'")
+        return 0
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    paths = [path for path in args.paths.split(',') if path]
+    for path_name in paths:
+        if path_name not in RUNNERS:
+            parser.error(f"unknown path '{path_name}' (choose from {', '.join(RUNNERS)})")
+
+    print('⏱️  Running microplastic analysis benchmarks...')
+    results = []
+    for rows in parse_scales(args.scales):
+        file_path = dataset_path(args.data_dir, rows, args.seed)
+        for mode in modes:
+            if mode == 'full' and rows > args.full_max_rows:
+                continue
+            for path_name in paths:
+                measured = measure(path_name, file_path, mode, args.repeat)
+                result = {
+                    'rows': rows,
+                    'mode': mode,
+                    'path': path_name,
+                    'seconds': round(measured['seconds'], 4),
+                    'rows_per_second': round(rows / measured['seconds']) if measured['seconds'] else None,
+                    **{key: value for key, value in measured.items() if key != 'seconds'}
+                }
+                results.append(result)
+                rss = f"{result['peak_rss_bytes'] / 2 ** 20:8.1f} MiB" if result['peak_rss_bytes'] else '       n/a'
+                print(f"  {rows:>10,} {mode:<9} {path_name:<6} {result['seconds']:9.3f}s  "
+                      f"{result['rows_per_second'] or 0:>12,} rows/s  peak RSS {rss}")
+
+    report = {'environment': environment(), 'seed': args.seed, 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Wrote {len(results)} results to '{args.output}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f'{regressions} regression(s) beyond {args.tolerance:.0%}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
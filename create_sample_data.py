@@ -7,10 +7,67 @@ This script creates sample data files representing microplastic intake
 across different countries and regions for research analysis.
 """
 
+import argparse
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import random
 
+# Countries/regions with varying pollution levels: (name, pollution level, seafood base, bottled water base)
+COUNTRY_PROFILES = [
+    # High pollution regions
+    ('China', 'high', 200, 350),
+    ('India', 'high', 180, 320),
+    ('Indonesia', 'high', 190, 340),
+    ('Philippines', 'high', 170, 330),
+    ('Bangladesh', 'high', 160, 310),
+    
+    # Moderate pollution regions
+    ('USA', 'moderate', 130, 240),
+    ('Brazil', 'moderate', 140, 250),
+    ('Japan', 'moderate', 120, 220),
+    ('South Korea', 'moderate', 125, 230),
+    ('Mexico', 'moderate', 135, 260),
+    ('Turkey', 'moderate', 115, 225),
+    ('Russia', 'moderate', 110, 210),
+    
+    # Low pollution regions
+    ('Norway', 'low', 80, 180),
+    ('Sweden', 'low', 75, 170),
+    ('Finland', 'low', 85, 190),
+    ('Denmark', 'low', 90, 200),
+    ('Switzerland', 'low', 70, 160),
+    ('New Zealand', 'low', 95, 205),
+    ('Canada', 'low', 100, 220),
+    ('Australia', 'low', 105, 215),
+    
+    # European countries (mixed)
+    ('Germany', 'moderate', 95, 205),
+    ('France', 'moderate', 100, 210),
+    ('UK', 'moderate', 105, 215),
+    ('Italy', 'moderate', 110, 220),
+    ('Spain', 'moderate', 115, 225),
+    
+    # Additional regions for better analysis
+    ('Nigeria', 'high', 150, 290),
+    ('Egypt', 'moderate', 125, 235),
+    ('South Africa', 'moderate', 120, 230),
+    ('Argentina', 'moderate', 115, 225),
+    ('Chile', 'low', 90, 195)
+]
+
+# Range of the per-sample multiplier applied to every food source, by pollution level
+POLLUTION_MULTIPLIERS = {
+    'high': (1.2, 1.8),
+    'moderate': (0.8, 1.2),
+    'low': (0.5, 0.9)
+}
+
 def create_research_dataset():
     """Create sample microplastic intake data for global research analysis"""
     
@@ -18,52 +75,9 @@ def create_research_dataset():
     np.random.seed(42)
     random.seed(42)
     
-    # Define countries/regions with varying pollution levels
-    countries_data = [
-        # High pollution regions
-        ('China', 'high', 200, 350),
-        ('India', 'high', 180, 320),
-        ('Indonesia', 'high', 190, 340),
-        ('Philippines', 'high', 170, 330),
-        ('Bangladesh', 'high', 160, 310),
-        
-        # Moderate pollution regions
-        ('USA', 'moderate', 130, 240),
-        ('Brazil', 'moderate', 140, 250),
-        ('Japan', 'moderate', 120, 220),
-        ('South Korea', 'moderate', 125, 230),
-        ('Mexico', 'moderate', 135, 260),
-        ('Turkey', 'moderate', 115, 225),
-        ('Russia', 'moderate', 110, 210),
-        
-        # Low pollution regions
-        ('Norway', 'low', 80, 180),
-        ('Sweden', 'low', 75, 170),
-        ('Finland', 'low', 85, 190),
-        ('Denmark', 'low', 90, 200),
-        ('Switzerland', 'low', 70, 160),
-        ('New Zealand', 'low', 95, 205),
-        ('Canada', 'low', 100, 220),
-        ('Australia', 'low', 105, 215),
-        
-        # European countries (mixed)
-        ('Germany', 'moderate', 95, 205),
-        ('France', 'moderate', 100, 210),
-        ('UK', 'moderate', 105, 215),
-        ('Italy', 'moderate', 110, 220),
-        ('Spain', 'moderate', 115, 225),
-        
-        # Additional regions for better analysis
-        ('Nigeria', 'high', 150, 290),
-        ('Egypt', 'moderate', 125, 235),
-        ('South Africa', 'moderate', 120, 230),
-        ('Argentina', 'moderate', 115, 225),
-        ('Chile', 'low', 90, 195)
-    ]
-    
     data = []
     
-    for country, pollution_level, seafood_base, bottled_water_base in countries_data:
+    for country, pollution_level, seafood_base, bottled_water_base in COUNTRY_PROFILES:
         # Add some variation within each country (multiple samples)
         for sample in range(random.randint(1, 3)):  # 1-3 samples per country
             
@@ -108,7 +122,220 @@ def create_small_sample():
     
     return pd.DataFrame(small_data)
 
-if __name__ == "__main__":
+def load_country_profiles(path):
+    """Read country profiles from a CSV with Region, Pollution_Level, Seafood_Base and Bottled_Water_Base columns"""
+    profiles_df = pd.read_csv(path)
+    profiles = []
+    for row in profiles_df.itertuples(index=False):
+        if row.Pollution_Level not in POLLUTION_MULTIPLIERS:
+            raise ValueError(f"Unknown pollution level '{row.Pollution_Level}' for {row.Region} (use high, moderate or low)")
+        profiles.append((row.Region, row.Pollution_Level, row.Seafood_Base, row.Bottled_Water_Base))
+    return profiles
+
+def select_countries(spec, profiles=COUNTRY_PROFILES, per_country=None):
+    """Profiles and per-country sample counts for a spec like 'China=50000,USA,Norway=2000'.
+
+    Countries without '=N' get `per_country` samples. Counts are None when no country has one,
+    meaning samples are spread randomly over the selected countries.
+    """
+    by_name = {profile[0]: profile for profile in profiles}
+    entries = [entry.strip() for entry in spec.split(',') if entry.strip()] if spec else list(by_name)
+    selected, counts = [], []
+    for entry in entries:
+        name, _, count = entry.partition('=')
+        name = name.strip()
+        if name not in by_name:
+            raise ValueError(f"Unknown country '{name}' (known: {', '.join(by_name)})")
+        selected.append(by_name[name])
+        counts.append(int(count) if count else per_country)
+    if all(count is None for count in counts):
+        return selected, None
+    if any(count is None for count in counts):
+        raise ValueError('Give every country a sample count (Country=N) or set a default per-country count')
+    return selected, counts
+
+def draw_samples(rng, profiles, country):
+    """Draw one sample per entry of `country` (indexes into profiles) in bulk from a NumPy Generator"""
+    rows = len(country)
+    names = np.array([profile[0] for profile in profiles], dtype=object)
+    seafood_base = np.array([profile[2] for profile in profiles])
+    bottled_water_base = np.array([profile[3] for profile in profiles])
+    multiplier_low = np.array([POLLUTION_MULTIPLIERS[profile[1]][0] for profile in profiles])
+    multiplier_high = np.array([POLLUTION_MULTIPLIERS[profile[1]][1] for profile in profiles])
+
+    pollution_multiplier = rng.uniform(multiplier_low[country], multiplier_high[country])
+
+    # Same ranges as the per-row random.randint() calls (inclusive upper bounds)
+    seafood_intake = np.maximum(20, seafood_base[country] + rng.integers(-40, 61, rows)) * pollution_multiplier
+    bottled_water_intake = np.maximum(50, bottled_water_base[country] + rng.integers(-60, 81, rows)) * pollution_multiplier
+    salt_intake = np.maximum(5, rng.integers(15, 81, rows)) * pollution_multiplier
+    sugar_intake = np.maximum(2, rng.integers(3, 26, rows)) * pollution_multiplier
+    packaged_food_intake = np.maximum(100, rng.integers(200, 401, rows)) * pollution_multiplier
+
+    return pd.DataFrame({
+        'Region': names[country],
+        'Seafood_Intake': np.round(seafood_intake, 1),
+        'Bottled_Water_Intake': np.round(bottled_water_intake, 1),
+        'Salt_Intake': np.round(salt_intake, 1),
+        'Sugar_Intake': np.round(sugar_intake, 1),
+        'Packaged_Food_Intake': np.round(packaged_food_intake, 1)
+    })
+
+def draw_scaled_samples(rng, rows, profiles=COUNTRY_PROFILES):
+    """Draw samples for randomly chosen countries in bulk from a NumPy Generator"""
+    return draw_samples(rng, profiles, rng.integers(0, len(profiles), rows))
+
+def plan_chunks(total_rows, chunk_rows):
+    """(start, end) row ranges of at most chunk_rows each"""
+    return [(start, min(start + chunk_rows, total_rows)) for start in range(0, total_rows, chunk_rows)] or [(0, 0)]
+
+def generate_chunk(profiles, counts, start, end, seed_sequence):
+    """Rows start..end of a dataset, drawn from the chunk's own independent random stream.
+
+    With counts, rows are laid out country by country (counts[0] rows of the first
+    country, then the second, ...); without, each row's country is drawn at random.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    if counts is None:
+        return draw_scaled_samples(rng, end - start, profiles)
+    country = np.searchsorted(np.cumsum(counts), np.arange(start, end), side='right')
+    return draw_samples(rng, profiles, country)
+
+def quote_csv_field(text):
+    """Quote a CSV field only when it needs it, as pandas' to_csv() does"""
+    if any(char in text for char in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def format_csv_chunk(chunk, header=True):
+    """CSV text of a generated chunk, identical to chunk.to_csv(index=False) but about 3x faster.
+
+    Every intake is a non-negative value rounded to one decimal, so each column is formatted by
+    looking its tenths up in a table of strings rather than through the generic float writer.
+    """
+    text = ','.join(chunk.columns) + '\n' if header else ''
+    if chunk.empty:
+        return text
+    region_codes, regions = pd.factorize(chunk['Region'])
+    lines = np.array([quote_csv_field(str(name)) for name in regions], dtype=object)[region_codes]
+    for column in chunk.columns[1:]:
+        tenths = np.rint(chunk[column].to_numpy() * 10).astype(np.int64)
+        table = np.array([f'{i // 10}.{i % 10}' for i in range(tenths.max() + 1)], dtype=object)
+        lines = lines + ',' + table[tenths]
+    return text + '\n'.join(lines.tolist()) + '\n'
+
+def encode_chunk(profiles, counts, start, end, seed_sequence, file_format):
+    """Generate a chunk and, for CSV, format it too so that work also runs in the worker"""
+    chunk = generate_chunk(profiles, counts, start, end, seed_sequence)
+    if file_format == 'csv':
+        return format_csv_chunk(chunk, header=start == 0)
+    return chunk
+
+def dataset_format(path, file_format=None):
+    """'csv' or 'parquet', from the explicit format or the file extension"""
+    file_format = file_format or ('parquet' if path.endswith(('.parquet', '.pq')) else 'csv')
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported format '{file_format}' (use csv or parquet)")
+    return file_format
+
+def iter_chunks(tasks, file_format, workers):
+    """Encoded chunks in row order, generated on `workers` processes when more than one"""
+    if workers <= 1 or len(tasks) == 1:
+        for task in tasks:
+            yield encode_chunk(*task, file_format)
+        return
+
+    # Keep a bounded window of chunks in flight so memory stays flat on huge datasets
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(encode_chunk, *task, file_format))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def write_scaled_dataset(path, rows=None, seed=42, chunk_rows=1_000_000, profiles=COUNTRY_PROFILES, counts=None,
+                         workers=1, file_format=None):
+    """Stream a generated dataset straight to a CSV or Parquet file, one chunk in memory per worker.
+
+    Either `rows` samples spread randomly over `profiles`, or exactly counts[i] samples of
+    profiles[i]. Every chunk draws from its own stream spawned from `seed`, so the file is
+    the same whatever the number of workers.
+    """
+    file_format = dataset_format(path, file_format)
+    total_rows = int(sum(counts)) if counts is not None else rows
+    chunks = plan_chunks(total_rows, chunk_rows)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(profiles, counts, start, end, seed_sequence) for (start, end), seed_sequence in zip(chunks, seed_sequences)]
+
+    if file_format == 'csv':
+        with open(path, 'w', newline='') as f:
+            for text in iter_chunks(tasks, file_format, workers):
+                f.write(text)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('Parquet output requires pyarrow (pip install pyarrow)')
+    writer = None
+    try:
+        for chunk in iter_chunks(tasks, file_format, workers):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+def create_scaled_dataset(rows=None, seed=42, chunk_rows=1_000_000, profiles=COUNTRY_PROFILES, counts=None):
+    """Generate in memory the same samples write_scaled_dataset() writes for these arguments"""
+    total_rows = int(sum(counts)) if counts is not None else rows
+    chunks = plan_chunks(total_rows, chunk_rows)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunks))
+    return pd.concat([generate_chunk(profiles, counts, start, end, seed_sequence)
+                      for (start, end), seed_sequence in zip(chunks, seed_sequences)], ignore_index=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a large synthetic intake dataset')
+    parser.add_argument('--rows', type=int, help='number of samples, spread randomly over the countries')
+    parser.add_argument('--countries', help="countries to include, optionally with counts: 'China=50000,USA,Norway=2000'")
+    parser.add_argument('--per-country', type=int, help='samples for each country without an explicit count')
+    parser.add_argument('--profiles', help='CSV of Region, Pollution_Level, Seafood_Base, Bottled_Water_Base to use instead of the built-in countries')
+    parser.add_argument('--output', default=None, help='CSV or .parquet path (default: synthetic_<rows>.csv)')
+    parser.add_argument('--format', choices=['csv', 'parquet'], help='output format (default: from the file extension)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000, help='samples per chunk; each chunk has its own seeded stream')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='processes generating chunks in parallel')
+    args = parser.parse_args(argv)
+
+    try:
+        profiles = load_country_profiles(args.profiles) if args.profiles else COUNTRY_PROFILES
+        profiles, counts = select_countries(args.countries, profiles, args.per_country)
+        if counts is None and args.rows is None:
+            raise ValueError('Give --rows, --per-country or per-country counts in --countries')
+        total_rows = sum(counts) if counts is not None else args.rows
+        output = args.output or f"synthetic_{total_rows}.{args.format or 'csv'}"
+        start = time.perf_counter()
+        write_scaled_dataset(output, args.rows, args.seed, args.chunk_rows, profiles, counts, args.workers, args.format)
+    except ValueError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+
+    seconds = time.perf_counter() - start
+    print(f"✅ Created '{output}' with {total_rows:,} samples from {len(profiles)} countries "
+          f"in {seconds:.2f}s ({total_rows / max(seconds, 1e-9):,.0f} rows/s)")
+    return 0
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    sys.exit(main())
+
+elif __name__ == "__main__":
     print("🌍 Creating global microplastic research dataset...")
     
     # Create comprehensive research dataset
@@ -0,0 +1,264 @@
+# jobs.py - Background analysis jobs on a bounded process pool
+
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running"""
+
+
+JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+
+def write_atomic(path, data):
+    """Replace a file's contents so readers in other processes never see a partial write"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class StageReporter:
+    """Picklable progress callback: records the current stage number in a shared dict (and file)"""
+
+    def __init__(self, job_id, progress, stage_path=None):
+        self.job_id = job_id
+        self.progress = progress
+        self.stage_path = stage_path
+
+    def __call__(self, stage):
+        self.progress[self.job_id] = stage
+        if self.stage_path:
+            write_atomic(self.stage_path, str(stage).encode('ascii'))
+
+
+class JobManager:
+    """Runs analysis jobs on a process pool and tracks their status, progress and results.
+
+    Workers are started lazily on the first submission with the 'spawn' start method,
+    so they never inherit the web server's threads or open sockets.
+
+    Failures raised as one of client_errors are recorded with error_kind 'input' (the
+    upload or options were at fault), any other failure as 'internal'.
+
+    With a shared_dir, job records, progress and rendered results are also written there,
+    so web server processes other than the one that accepted a job can report on it and
+    serve its result. Results are then rendered as soon as the job finishes with
+    render(cache_key, results), which returns the serialized payload.
+    """
+
+    def __init__(self, stages, max_workers=2, max_pending=16, max_finished=64, spool_dir=None, shared_dir=None,
+                 client_errors=()):
+        self.stages = stages
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.spool_dir = spool_dir or tempfile.gettempdir()
+        self.shared_dir = shared_dir
+        self.client_errors = client_errors
+        self.render = None
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._progress = None
+
+    def _ensure_pool(self):
+        """Start the worker pool and the shared progress dict (lock held)"""
+        if self._executor is None:
+            context = multiprocessing.get_context('spawn')
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def spool_path(self):
+        """A fresh path for saving an upload that a worker will read (and delete)"""
+        return os.path.join(self.spool_dir, f'microplastic-upload-{uuid.uuid4().hex}.csv')
+
+    def submit(self, fn, *args, cache_key=None):
+        """Queue fn(*args, reporter) on the pool and return the new job id"""
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job['state'] == 'queued')
+            if active >= self.max_pending:
+                raise JobQueueFull(f"Too many analyses in progress ({active}); try again shortly")
+
+            self._ensure_pool()
+            job_id = uuid.uuid4().hex
+            self._progress[job_id] = 0
+            self._jobs[job_id] = self._new_job(job_id, 'queued', cache_key)
+            self._write_shared(self._jobs[job_id])
+            stage_path = self._shared_path(job_id, 'stage') if self.shared_dir else None
+            future = self._executor.submit(fn, *args, StageReporter(job_id, self._progress, stage_path))
+            self._jobs[job_id]['future'] = future
+
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+        return job_id
+
+    def add_completed(self, payload, cache_key=None):
+        """Record a job whose serialized result is already known (e.g. a cache hit)"""
+        with self._lock:
+            job_id = uuid.uuid4().hex
+            job = self._new_job(job_id, 'done', cache_key)
+            job['payload'] = payload
+            job['stage'] = len(self.stages)
+            job['finished_at'] = job['submitted_at']
+            self._jobs[job_id] = job
+            self._write_shared(job)
+            self._prune()
+        return job_id
+
+    def _new_job(self, job_id, state, cache_key):
+        return {
+            'id': job_id,
+            'state': state,
+            'stage': 0,
+            'cache_key': cache_key,
+            'submitted_at': time.time(),
+            'finished_at': None,
+            'future': None,
+            'results': None,
+            'payload': None,
+            'error': None,
+            'error_kind': None
+        }
+
+    def _finish(self, job_id, future):
+        """Done-callback: move the outcome of a future into the job record"""
+        error = future.exception()
+        payload = None
+        if error is None and self.shared_dir and self.render:
+            # Other processes cannot render the results, so do it now and share the bytes
+            with self._lock:
+                job = self._jobs.get(job_id)
+                cache_key = job['cache_key'] if job else None
+            try:
+                payload = self.render(cache_key, future.result())
+            except Exception as e:
+                error = e
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if error is None:
+                job['state'] = 'done'
+                job['stage'] = len(self.stages)
+                if payload is None:
+                    job['results'] = future.result()
+                job['payload'] = payload
+            else:
+                job['state'] = 'failed'
+                job['stage'] = self._progress.get(job_id, 0)
+                job['error'] = str(error)
+                job['error_kind'] = 'input' if isinstance(error, self.client_errors) else 'internal'
+            job['finished_at'] = time.time()
+            job['future'] = None
+            self._progress.pop(job_id, None)
+            self._write_shared(job)
+            self._prune()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['state'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+            if self.shared_dir:
+                for kind in ('json', 'stage', 'payload'):
+                    try:
+                        os.remove(self._shared_path(job_id, kind))
+                    except FileNotFoundError:
+                        pass
+
+    def _shared_path(self, job_id, kind):
+        return os.path.join(self.shared_dir, f'{job_id}.{kind}')
+
+    def _write_shared(self, job):
+        """Publish a job's record (and its payload, once rendered) to the shared directory"""
+        if not self.shared_dir:
+            return
+        if job['payload'] is not None:
+            write_atomic(self._shared_path(job['id'], 'payload'), job['payload'])
+        record = {key: job[key] for key in ('id', 'state', 'stage', 'cache_key', 'submitted_at', 'finished_at', 'error', 'error_kind')}
+        write_atomic(self._shared_path(job['id'], 'json'), json.dumps(record).encode('utf-8'))
+
+    def _read_shared(self, job_id):
+        """A job accepted by another process, from the shared directory, or None"""
+        if not self.shared_dir or not JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._shared_path(job_id, 'json'), 'rb') as f:
+                job = dict({'error_kind': None}, **json.load(f), future=None, results=None, payload=None)
+        except FileNotFoundError:
+            return None
+        if job['state'] == 'done':
+            # Written before the record, so it is always there for a finished job
+            with open(self._shared_path(job_id, 'payload'), 'rb') as f:
+                job['payload'] = f.read()
+        elif job['state'] == 'queued':
+            try:
+                with open(self._shared_path(job_id, 'stage'), 'rb') as f:
+                    job['stage'] = int(f.read())
+            except (FileNotFoundError, ValueError):
+                pass
+        return job
+
+    def status(self, job_id):
+        """Public status of a job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job = dict(job)
+                if job['state'] == 'queued':
+                    job['stage'] = self._progress.get(job_id, 0)
+        if job is None:
+            job = self._read_shared(job_id)
+            if job is None:
+                return None
+
+        stage = job['stage']
+        # A job counts as running once its worker reports the first stage
+        state = 'running' if job['state'] == 'queued' and stage else job['state']
+        finished_at = job['finished_at'] or time.time()
+        return {
+            'job_id': job_id,
+            'state': state,
+            'stage': self.stages[stage - 1] if stage else None,
+            'stage_number': stage,
+            'stage_count': len(self.stages),
+            'progress': round(stage / len(self.stages), 3),
+            'elapsed_seconds': round(finished_at - job['submitted_at'], 3),
+            'error': job['error'],
+            'error_kind': job['error_kind']
+        }
+
+    def job(self, job_id):
+        """The internal job record (results, payload, cache key), or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._read_shared(job_id)
+
+    def store_payload(self, job_id, payload):
+        """Keep only the serialized result once it has been rendered"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['payload'] = payload
+                job['results'] = None
+
+    def shutdown(self):
+        """Stop the worker pool and the progress manager"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
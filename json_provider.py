@@ -0,0 +1,49 @@
+# json_provider.py - Flask JSON providers that serialize numpy values natively
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+
+def numpy_default(value):
+    """Convert a numpy scalar or array met during encoding; other types as Flask does"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return DefaultJSONProvider.default(value)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Standard library encoder that also accepts numpy scalars and arrays"""
+
+    default = staticmethod(numpy_default)
+
+
+class OrjsonProvider(NumpyJSONProvider):
+    """orjson encoder: numpy arrays and scalars are written by orjson's C code, not converted first.
+
+    Output differs from the standard library only in representation: non-ASCII text is
+    written as UTF-8 rather than \\u escapes, NaN/Infinity become null, and float32 values
+    get their shortest float32 digits (analysis results hold none; they are widened first).
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def json_provider_class():
+    """The fastest available provider"""
+    return OrjsonProvider if orjson is not None else NumpyJSONProvider
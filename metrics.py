@@ -0,0 +1,68 @@
+# metrics.py - In-process histograms exported in the Prometheus text format
+
+import threading
+
+# Bucket upper bounds for stage durations (seconds) and stage peak memory (bytes)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+MEMORY_BUCKETS = tuple(2 ** power for power in range(20, 34, 2))  # 1 MiB to 8 GiB
+
+
+def format_labels(labels):
+    """Render a label dict as {name="value",...}, escaping values as Prometheus requires"""
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_metric(name, help_text, kind, samples):
+    """Text-format lines for a metric given (suffix, labels, value) samples"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for suffix, labels, value in samples:
+        lines.append(f'{name}{suffix}{format_labels(labels)} {format_value(value)}')
+    return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                labels = dict(zip(self.label_names, key))
+                for bound, count in zip(self.buckets, series['buckets']):
+                    samples.append(('_bucket', {**labels, 'le': format_value(float(bound))}, count))
+                samples.append(('_bucket', {**labels, 'le': '+Inf'}, series['count']))
+                samples.append(('_sum', labels, series['sum']))
+                samples.append(('_count', labels, series['count']))
+        return format_metric(self.name, self.help_text, 'histogram', samples)
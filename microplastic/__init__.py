@@ -0,0 +1,18 @@
+# microplastic - Microplastic intake analysis library: pure stage functions over DataFrames and arrays
+
+from .aggregate import aggregate_by_region
+from .association import describe_consumption_pattern, find_consumption_patterns
+from .clustering import describe_clusters, fit_clusters, scale_features, select_clusters
+from .compact import country_page, decode_country_table
+from .constants import (ANALYSIS_STAGES, COUNTRY_RECOMMENDATIONS, FOOD_SOURCE_INFO, HEALTH_THRESHOLDS,
+                        MIN_CONFIDENCE, MIN_SUPPORT)
+from .errors import AnalysisInputError
+from .food import analyze_food_sources, describe_food_source
+from .insights import generate_global_insights
+from .intake import intake_frame
+from .pipeline import (analysis_options, analyze_csv, analyze_streaming, country_page_options,
+                       parse_plot_dpi, query_options, run_analysis)
+from .plotting import cluster_plot_spec, decode_plot_spec, render_cluster_plot
+from .risk import build_country_analyses, compute_risk_table, get_risk_level, summarize_risk_distribution
+from .stats import column_statistics
+from .store import DatasetStore
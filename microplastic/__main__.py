@@ -0,0 +1,124 @@
+# __main__.py - Command-line batch analyzer: python -m microplastic DATA_DIR_OR_GLOB ... -o OUTPUT_DIR
+
+import argparse
+import sys
+
+from .batch import analyze_merged, expand_inputs, run_batch
+from .constants import ANALYSIS_STAGES
+from .errors import AnalysisInputError
+from .pipeline import analysis_options
+from .plotting import PLOT_FORMATS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m microplastic',
+        description='Run the microplastic intake analysis over many data files (CSV, compressed CSV, Parquet, Arrow) without the web server.'
+    )
+    parser.add_argument('inputs', nargs='+', help='data files, directories of data files or glob patterns')
+    parser.add_argument('-o', '--output-dir', default='analysis_results', help='where to write <name>.json (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='parallel worker processes (default: CPU count)')
+    parser.add_argument('--plots', choices=list(PLOT_FORMATS), help='also render the cluster plot in this format')
+    parser.add_argument('--plot-dpi', help='plot resolution')
+    parser.add_argument('--mode', choices=['full', 'streaming'], help='streaming reads very large files in chunks')
+    parser.add_argument('--aggregate', choices=['none', 'region'], help='region collapses samples of the same Region into one row')
+    parser.add_argument('--aggregate-statistic', choices=['mean', 'median'], help='per-region value used with --aggregate region')
+    parser.add_argument('--clusters', help="number of population clusters, or 'auto'")
+    parser.add_argument('--cluster-backend', help='kmeans, minibatch, sampled or auto')
+    parser.add_argument('--n-init', help='k-means restarts')
+    parser.add_argument('--dtype', choices=['float64', 'float32'], help='float width of the intake matrix (float32 halves its memory)')
+    parser.add_argument('--sketch-error', help='rank error of the streaming quantile sketches (default about 0.013)')
+    parser.add_argument('--merge', metavar='NAME',
+                        help='analyze all inputs as partitions of one dataset (streaming) and write NAME.json')
+    parser.add_argument('--stage-workers',
+                        help='threads running independent stages of one analysis (default: 1, files already run in parallel)')
+    args = parser.parse_args(argv)
+
+    # Streaming mode keeps no per-sample rows, so it neither clusters nor plots
+    if args.mode == 'streaming' or args.merge:
+        streaming = '--merge' if args.merge else '--mode streaming'
+        if args.merge and args.mode == 'full':
+            parser.error('--merge always analyzes in streaming mode; drop --mode full')
+        ignored = [flag for flag, value in [
+            ('--clusters', args.clusters),
+            ('--cluster-backend', args.cluster_backend),
+            ('--n-init', args.n_init),
+            ('--plots', args.plots),
+            ('--plot-dpi', args.plot_dpi),
+            ('--dtype', args.dtype),
+            ('--stage-workers', args.stage_workers)
+        ] if value is not None]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} cannot be used with {streaming} (full mode only)")
+    return args
+
+
+def format_stages(stages):
+    return ', '.join(f'{name} {seconds:.3f}s' for name, seconds in stages.items())
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Same option names and validation as the /analyze form fields
+    values = {
+        name: value for name, value in [
+            ('mode', args.mode),
+            ('aggregate', args.aggregate),
+            ('aggregate_statistic', args.aggregate_statistic),
+            ('plot_dpi', args.plot_dpi),
+            ('clusters', args.clusters),
+            ('cluster_backend', args.cluster_backend),
+            ('n_init', args.n_init),
+            ('dtype', args.dtype),
+            ('sketch_error', args.sketch_error),
+            ('stage_workers', args.stage_workers or '1')
+        ] if value is not None
+    }
+    try:
+        analysis_options({**values, 'mode': 'streaming'} if args.merge else values)
+    except AnalysisInputError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print('error: no data files matched', file=sys.stderr)
+        return 2
+
+    if args.merge:
+        print(f'Analyzing {len(paths)} file(s) as one dataset into {args.output_dir}/{args.merge}.json')
+        summary = analyze_merged(paths, args.output_dir, args.merge, values, args.workers)
+        if summary['status'] != 'ok':
+            print(f"  FAILED  {summary['error']}")
+            return 1
+        print(f"  ok      {summary['seconds']:.3f}s")
+        return 0
+
+    print(f'Analyzing {len(paths)} file(s) into {args.output_dir}/')
+
+    def report(summary):
+        if summary['status'] == 'ok':
+            print(f"  ok      {summary['file']}  {summary['seconds']:.3f}s  ({format_stages(summary['stages'])})")
+        else:
+            print(f"  FAILED  {summary['file']}  {summary['error']}")
+
+    summaries = run_batch(paths, args.output_dir, values, args.plots, args.workers, report)
+
+    # Stage totals across all files show where a batch spends its time
+    totals = {}
+    for summary in summaries:
+        for name, seconds in summary['stages'].items():
+            totals[name] = totals.get(name, 0.0) + seconds
+    ordered = [name for name in ANALYSIS_STAGES + ['Render Plot'] if name in totals]
+    failed = sum(1 for summary in summaries if summary['status'] != 'ok')
+
+    print(f'\nStage totals over {len(summaries)} file(s):')
+    for name in ordered:
+        print(f'  {name:<30} {totals[name]:8.3f}s')
+    print(f'{len(summaries) - failed} succeeded, {failed} failed')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# aggregate.py - Collapse repeated samples of a country/region into one row before analysis
+
+import numpy as np
+import pandas as pd
+
+from .constants import FOOD_SOURCE_INFO
+
+AGGREGATE_MODES = ('none', 'region')
+AGGREGATE_STATISTICS = ('mean', 'median')
+
+
+def optional_float(value, ndigits=1):
+    """Rounded float, or None where undefined (e.g. the spread of a single sample)"""
+    return None if np.isnan(value) else float(round(np.float64(value), ndigits))
+
+
+def aggregate_by_region(df, statistic='mean'):
+    """Collapse samples to one row per Region holding each food's mean or median.
+
+    Every per-region statistic comes from one groupby over the food columns. Returns
+    (region_df, variation): the reduced table, regions in order of first appearance,
+    and the within-region variation report.
+    """
+    food_columns = [col for col in df.columns if col in FOOD_SOURCE_INFO]
+    grouped = df.groupby('Region', sort=False, dropna=False)[food_columns]
+    stats = grouped.agg(['mean', 'median', 'count', 'std']).swaplevel(axis=1)
+    region_df = stats[statistic][food_columns].reset_index()
+    variation = within_region_variation(df[food_columns], stats, grouped.size(), statistic)
+    return region_df, variation
+
+
+def within_region_variation(food_df, stats, sample_counts, statistic='mean'):
+    """Report how much samples of the same region differ, per region and per food.
+
+    variance_explained is the share of each food's total variance that lies between
+    regions (between-group over total sum of squares); the rest is within-region spread.
+    """
+    food_columns = list(food_df.columns)
+    means = stats['mean'][food_columns].to_numpy()
+    medians = stats['median'][food_columns].to_numpy()
+    counts = stats['count'][food_columns].to_numpy()
+    stds = stats['std'][food_columns].to_numpy()
+    sample_counts = sample_counts.to_numpy()
+
+    values = food_df.to_numpy(dtype=np.float64)
+    grand_mean = np.nanmean(values, axis=0)
+    total_ss = np.nansum((values - grand_mean) ** 2, axis=0)
+    between_ss = np.nansum(counts * (means - grand_mean) ** 2, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        explained = between_ss / total_ss
+
+    food_names = [FOOD_SOURCE_INFO[col]['name'] for col in food_columns]
+    regions = []
+    for i, region in enumerate(stats.index):
+        regions.append({
+            'country': region if not pd.isna(region) else 'Unknown',
+            'sample_count': int(sample_counts[i]),
+            'foods': {
+                name: {
+                    'mean': optional_float(means[i, j]),
+                    'median': optional_float(medians[i, j]),
+                    'std': optional_float(stds[i, j]),
+                    'count': int(counts[i, j])
+                }
+                for j, name in enumerate(food_names)
+            }
+        })
+
+    return {
+        'by': 'Region',
+        'statistic': statistic,
+        'input_samples': len(food_df),
+        'regions_analyzed': len(regions),
+        'variance_explained': {name: optional_float(explained[j], 3) for j, name in enumerate(food_names)},
+        'within_region': regions
+    }
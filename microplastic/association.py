@@ -0,0 +1,181 @@
+# association.py - Bitset association-rule mining over binarized intake columns
+
+from itertools import combinations
+
+import numpy as np
+
+from .constants import FOOD_SOURCE_INFO, MIN_CONFIDENCE, MIN_SUPPORT
+from .stats import column_statistics
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(bits):
+        """Number of set bits in a packed uint8 array"""
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+else:
+    _BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(bits):
+        """Number of set bits in a packed uint8 array"""
+        return int(_BYTE_POPCOUNT[bits].sum(dtype=np.int64))
+
+
+def pack_items(binary):
+    """Pack each column of a boolean (rows x items) matrix into its own uint8 bit array"""
+    return np.packbits(np.asarray(binary, dtype=bool).T, axis=1)
+
+
+def frequent_itemsets(binary, min_support):
+    """Level-wise apriori over packed column bits.
+
+    Returns {itemset: support} with itemsets as tuples of column indices, ordered by size
+    and then lexicographically (the order mlxtend's apriori produces).
+    """
+    row_count = len(binary)
+    if not row_count:
+        return {}
+    packed = pack_items(binary)
+
+    supports = {}
+    level = {}
+    for j, bits in enumerate(packed):
+        support = popcount(bits) / row_count
+        if support >= min_support:
+            level[(j,)] = bits
+            supports[(j,)] = support
+
+    while level:
+        next_level = {}
+        itemsets = list(level)
+        for i, first in enumerate(itemsets):
+            for second in itemsets[i + 1:]:
+                if first[:-1] != second[:-1]:
+                    break
+                candidate = first + second[-1:]
+                # Every subset of a frequent itemset must itself be frequent
+                if any(subset not in level for subset in combinations(candidate, len(candidate) - 1)):
+                    continue
+                bits = level[first] & packed[second[-1]]
+                support = popcount(bits) / row_count
+                if support >= min_support:
+                    next_level[candidate] = bits
+                    supports[candidate] = support
+        level = next_level
+
+    return supports
+
+
+class ItemsetCounter:
+    """Incremental support counts for every itemset over a fixed set of items.
+
+    Chunks of binarized rows can be added as they are read and counters from different
+    chunks or workers merged, so supports never need the whole dataset in memory.
+    """
+
+    def __init__(self, n_items):
+        self.n_items = n_items
+        self.row_count = 0
+        self.counts = np.zeros(1 << n_items, dtype=np.int64)
+
+    def update(self, binary):
+        """Count every itemset in a (rows x n_items) boolean chunk"""
+        packed = pack_items(binary)
+        bits = [None] * len(self.counts)
+        for mask in range(1, len(self.counts)):
+            # Extend the itemset without its highest item by that item
+            high = mask.bit_length() - 1
+            rest = mask ^ (1 << high)
+            bits[mask] = packed[high] if not rest else bits[rest] & packed[high]
+            self.counts[mask] += popcount(bits[mask])
+        self.row_count += len(binary)
+
+    def merge(self, other):
+        """Add the counts of another counter over the same items"""
+        if other.n_items != self.n_items:
+            raise ValueError("Cannot merge itemset counters over different items")
+        self.counts += other.counts
+        self.row_count += other.row_count
+
+    def state(self):
+        """JSON-serializable snapshot of the counts"""
+        return {'n_items': self.n_items, 'row_count': self.row_count, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        """Inverse of state()"""
+        counter = cls(state['n_items'])
+        counter.row_count = state['row_count']
+        counter.counts = np.asarray(state['counts'], dtype=np.int64)
+        return counter
+
+    def frequent_itemsets(self, min_support):
+        """{itemset: support} in the same form and order as frequent_itemsets()"""
+        if not self.row_count:
+            return {}
+        supports = {}
+        for size in range(1, self.n_items + 1):
+            for itemset in combinations(range(self.n_items), size):
+                # Apriori property: skip candidates with an infrequent subset
+                if size > 1 and any(subset not in supports for subset in combinations(itemset, size - 1)):
+                    continue
+                support = self.counts[sum(1 << j for j in itemset)] / self.row_count
+                if support >= min_support:
+                    supports[itemset] = float(support)
+        return supports
+
+
+def association_rules(supports, min_confidence):
+    """Rules antecedent -> consequent from frequent itemset supports, filtered by confidence.
+
+    Returns (antecedent, consequent, support, confidence) tuples of column-index tuples,
+    ordered by itemset (as in `supports`), then by antecedent size descending, then by
+    column order. mlxtend finds the same rules but in frozenset hash order.
+    """
+    candidates = []
+    for itemset in supports:
+        for size in range(len(itemset) - 1, 0, -1):
+            for antecedent in combinations(itemset, size):
+                candidates.append((itemset, antecedent))
+    if not candidates:
+        return []
+
+    itemset_support = np.array([supports[itemset] for itemset, _ in candidates])
+    antecedent_support = np.array([supports[antecedent] for _, antecedent in candidates])
+    confidence = itemset_support / antecedent_support
+
+    rules = []
+    for i in np.flatnonzero(confidence >= min_confidence).tolist():
+        itemset, antecedent = candidates[i]
+        consequent = tuple(j for j in itemset if j not in antecedent)
+        rules.append((antecedent, consequent, float(itemset_support[i]), float(confidence[i])))
+    return rules
+
+
+def describe_consumption_pattern(antecedent_items, consequent_items, confidence, support):
+    """Build a human-readable consumption pattern from an association rule"""
+    antecedents = [FOOD_SOURCE_INFO.get(item, {}).get('name', item) for item in antecedent_items]
+    consequents = [FOOD_SOURCE_INFO.get(item, {}).get('name', item) for item in consequent_items]
+    return {
+        'high_consumption_in': ', '.join(antecedents),
+        'often_leads_to_high': ', '.join(consequents),
+        'confidence': f"{confidence:.1%}",
+        'support': f"{support:.1%}",
+        'implication': f"Countries with high {', '.join(antecedents)} consumption often also have high {', '.join(consequents)} exposure"
+    }
+
+
+def describe_rules(rules, columns):
+    """Consumption patterns for (antecedent, consequent, support, confidence) index rules over columns"""
+    return [
+        describe_consumption_pattern([columns[j] for j in antecedent], [columns[j] for j in consequent], confidence, support)
+        for antecedent, consequent, support, confidence in rules
+    ]
+
+
+def find_consumption_patterns(numeric_df, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE, statistics=None):
+    """Association rules between foods consumed above their median, as consumption patterns"""
+    if statistics is None:
+        statistics = column_statistics(numeric_df)
+    # Samples above each column's median, mined as packed bitsets
+    binary = statistics['values'] > statistics['median']
+    rules = association_rules(frequent_itemsets(binary, min_support), min_confidence)
+    return describe_rules(rules, statistics['columns'])
@@ -0,0 +1,128 @@
+# batch.py - Offline analysis of many CSV files on a process pool
+
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .pipeline import analysis_options, analyze_csv, analyze_partitioned
+from .plotting import decode_plot_spec, render_cluster_plot
+from .timing import StageTimer
+
+# Extensions picked up from directories; the format itself is detected from the file's bytes
+UPLOAD_EXTENSIONS = ('.csv', '.csv.gz', '.csv.zst', '.parquet', '.arrow', '.feather', '.ipc')
+
+
+def expand_inputs(patterns):
+    """Data file paths for a list of files, directories and glob patterns, in order and without duplicates"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(path for path in glob.glob(os.path.join(pattern, '*')) if path.endswith(UPLOAD_EXTENSIONS))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def output_name(path):
+    """Base name for a data file's output files"""
+    name = os.path.basename(path)
+    for extension in UPLOAD_EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return os.path.splitext(name)[0]
+
+
+def analyze_file(path, output_dir, values, plot_format=None, search_workers=None):
+    """Analyze one data file and write <name>.json (and optionally <name>.<plot_format>) to output_dir.
+
+    Returns a summary with the status, output paths and per-stage timings; failures are
+    reported in the summary rather than raised so one bad file does not stop a batch.
+    """
+    start = time.perf_counter()
+    timer = StageTimer()
+    summary = {'file': path, 'status': 'ok', 'outputs': [], 'stages': {}, 'error': None}
+    try:
+        options = analysis_options(values)
+        results = analyze_csv(path, options, timer, search_workers)
+        timer.stop()
+        summary['stages'] = timer.timings()
+
+        plot_spec = results.pop('plot_spec', None)
+        results.pop('country_table', None)
+        name = output_name(path)
+        json_path = os.path.join(output_dir, f'{name}.json')
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        summary['outputs'].append(json_path)
+
+        if plot_format and plot_spec is not None:
+            render_start = time.perf_counter()
+            plot_path = os.path.join(output_dir, f'{name}.{plot_format}')
+            with open(plot_path, 'wb') as f:
+                f.write(render_cluster_plot(decode_plot_spec(plot_spec), plot_format, options['plot_dpi']))
+            summary['outputs'].append(plot_path)
+            summary['stages']['Render Plot'] = round(time.perf_counter() - render_start, 4)
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+        summary['stages'] = timer.timings()
+
+    summary['seconds'] = round(time.perf_counter() - start, 4)
+    return summary
+
+
+def run_batch(paths, output_dir, values=None, plot_format=None, workers=None, on_result=None):
+    """Analyze every path, in parallel when workers > 1, and return the summaries in input order.
+
+    on_result(summary) is called as each file finishes, e.g. to print progress.
+    """
+    values = values or {}
+    on_result = on_result or (lambda summary: None)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or multiprocessing.cpu_count(), len(paths)) or 1
+
+    if workers == 1:
+        summaries = []
+        for path in paths:
+            summaries.append(analyze_file(path, output_dir, values, plot_format))
+            on_result(summaries[-1])
+        return summaries
+
+    # Each file already has a worker, so the automatic k search runs in-process
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(analyze_file, path, output_dir, values, plot_format, 1) for path in paths]
+        for future in futures:
+            on_result(future.result())
+        return [future.result() for future in futures]
+
+
+def analyze_merged(paths, output_dir, name, values=None, workers=None):
+    """Analyze all paths as partitions of one dataset (streaming mode) and write <name>.json to output_dir.
+
+    Returns a summary like analyze_file(); the files are streamed on up to `workers`
+    processes and their statistics merged.
+    """
+    start = time.perf_counter()
+    summary = {'file': f'{len(paths)} partition(s)', 'status': 'ok', 'outputs': [], 'stages': {}, 'error': None}
+    try:
+        results = analyze_partitioned(paths, analysis_options({**(values or {}), 'mode': 'streaming'}), workers)
+        os.makedirs(output_dir, exist_ok=True)
+        json_path = os.path.join(output_dir, f'{name}.json')
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        summary['outputs'].append(json_path)
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+
+    summary['seconds'] = round(time.perf_counter() - start, 4)
+    return summary
@@ -0,0 +1,355 @@
+# clustering.py - K-means backends that scale to very large uploads
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from .constants import CLUSTER_N_INIT, FOOD_SOURCE_INFO, MAX_CLUSTERS
+from .intake import region_lookup
+
+CLUSTER_BACKENDS = ('auto', 'kmeans', 'minibatch', 'sampled')
+
+# Above this many rows 'auto' switches from full KMeans to MiniBatchKMeans
+LARGE_DATASET_ROWS = 200000
+
+# Rows used to fit the centroids in the 'sampled' backend before predicting every row
+FIT_SAMPLE_ROWS = 50000
+MINIBATCH_SIZE = 4096
+
+# Automatic k selection: candidate range and silhouette sample size (keeps scoring sub-quadratic)
+AUTO_K_MIN = 2
+AUTO_K_MAX = 8
+SILHOUETTE_SAMPLE_ROWS = 10000
+
+# Below this many rows the candidate fits are cheaper than starting worker processes
+PARALLEL_SEARCH_ROWS = 20000
+
+# Warm-started refits of online centroids: at most this many passes, stopping once no
+# centroid moves more than REFIT_TOLERANCE standard deviations
+REFIT_PASSES = 10
+REFIT_TOLERANCE = 1e-3
+
+
+def fit_clusters(features, n_clusters, n_init=10, backend='auto', large_rows=LARGE_DATASET_ROWS,
+                 sample_rows=FIT_SAMPLE_ROWS, random_state=42):
+    """Assign every row of `features` to one of n_clusters clusters.
+
+    Returns (labels, info) where info records the backend actually used and how long
+    fitting took, for reporting in the analysis response.
+    """
+    rows = len(features)
+    if backend == 'auto':
+        backend = 'kmeans' if rows <= large_rows else 'minibatch'
+
+    start = time.perf_counter()
+    fitted_rows = rows
+    if backend == 'kmeans':
+        model = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init)
+        labels = model.fit_predict(features)
+    elif backend == 'minibatch':
+        model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init,
+                                batch_size=min(MINIBATCH_SIZE, rows))
+        labels = model.fit_predict(features)
+    elif backend == 'sampled':
+        rng = np.random.default_rng(random_state)
+        fitted_rows = min(sample_rows, rows)
+        sample = np.sort(rng.choice(rows, size=fitted_rows, replace=False))
+        model = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=n_init)
+        model.fit(features[sample])
+        labels = model.predict(features)
+    else:
+        raise ValueError(f"Unknown clustering backend '{backend}'")
+
+    return labels, {
+        'backend': backend,
+        'n_clusters': int(n_clusters),
+        'n_init': int(n_init),
+        'rows': int(rows),
+        'fitted_rows': int(fitted_rows),
+        'fit_seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+def score_cluster_count(features, n_clusters, n_init=10, backend='auto', large_rows=LARGE_DATASET_ROWS,
+                        sample_rows=SILHOUETTE_SAMPLE_ROWS, random_state=42):
+    """Fit one candidate k and return (labels, info, score) with its inertia and sampled silhouette"""
+    labels, info = fit_clusters(features, n_clusters, n_init, backend, large_rows, random_state=random_state)
+
+    start = time.perf_counter()
+    counts = np.maximum(np.bincount(labels, minlength=n_clusters), 1)
+    centroids = np.column_stack([np.bincount(labels, weights=features[:, j], minlength=n_clusters)
+                                 for j in range(features.shape[1])]) / counts[:, None]
+    inertia = float(((features - centroids[labels]) ** 2).sum())
+    if len(np.unique(labels)) > 1:
+        silhouette = float(silhouette_score(features, labels, sample_size=min(sample_rows, len(features)),
+                                            random_state=random_state))
+    else:
+        silhouette = -1.0
+
+    return labels, info, {
+        'k': int(n_clusters),
+        'silhouette': round(silhouette, 4),
+        'inertia': round(inertia, 4),
+        'fit_seconds': info['fit_seconds'],
+        'score_seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+def elbow_cluster_count(scores):
+    """k at the sharpest bend of the inertia curve (largest second difference)"""
+    if len(scores) < 3:
+        return scores[0]['k']
+    inertia = np.array([score['inertia'] for score in scores])
+    bends = inertia[:-2] - 2 * inertia[1:-1] + inertia[2:]
+    return scores[int(np.argmax(bends)) + 1]['k']
+
+
+def select_clusters(features, k_min=AUTO_K_MIN, k_max=AUTO_K_MAX, n_init=10, backend='auto',
+                    large_rows=LARGE_DATASET_ROWS, max_workers=None, random_state=42):
+    """Search k_min..k_max and keep the clustering with the best sampled silhouette score.
+
+    Candidates are fitted on a process pool for large inputs. Returns (labels, info) like
+    fit_clusters, with a 'selection' block listing every candidate's scores and timings.
+    """
+    rows = len(features)
+    candidates = list(range(max(k_min, 2), min(k_max, rows - 1) + 1))
+    if not candidates:
+        # Too few rows for a silhouette score; fall back to a single fixed fit
+        return fit_clusters(features, min(k_min, rows), n_init, backend, large_rows, random_state=random_state)
+
+    start = time.perf_counter()
+    args = (n_init, backend, large_rows, SILHOUETTE_SAMPLE_ROWS, random_state)
+    workers = min(max_workers or multiprocessing.cpu_count(), len(candidates))
+    if rows < PARALLEL_SEARCH_ROWS:
+        workers = 1
+    if workers == 1:
+        outcomes = [score_cluster_count(features, k, *args) for k in candidates]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(score_cluster_count, features, k, *args) for k in candidates]
+            outcomes = [future.result() for future in futures]
+
+    scores = [score for _, _, score in outcomes]
+    # Ties go to the smaller k
+    best = max(range(len(outcomes)), key=lambda i: (scores[i]['silhouette'], -scores[i]['k']))
+    labels, info, _ = outcomes[best]
+    info = dict(info, selection={
+        'method': 'silhouette',
+        'selected_k': scores[best]['k'],
+        'elbow_k': elbow_cluster_count(scores),
+        'candidates': scores,
+        'workers': workers,
+        'search_seconds': round(time.perf_counter() - start, 4)
+    })
+    return labels, info
+
+
+def order_clusters(labels, totals, n_clusters=None):
+    """Renumber clusters by ascending mean total intake, so ids do not depend on the fit's arbitrary order"""
+    n_clusters = n_clusters or int(labels.max()) + 1
+    counts = np.bincount(labels, minlength=n_clusters)
+    sums = np.bincount(labels, weights=totals, minlength=n_clusters)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.inf)
+    ids = np.empty(n_clusters, dtype=labels.dtype)
+    ids[np.argsort(means, kind='stable')] = np.arange(n_clusters)
+    return ids[labels]
+
+
+class OnlineClusters:
+    """K-means centroids kept current as chunks of new samples arrive.
+
+    Centroids are held in intake units and compared in standardized units, so the scaler
+    can follow the data without invalidating them. The first fit numbers clusters by
+    ascending total intake; afterwards each chunk only moves the existing centroids
+    (mini-batch k-means with per-centroid learning rates), so ids stay stable. Rows that
+    arrive before there are enough to fit are held in `pending` and clustered by the first fit.
+    """
+
+    def __init__(self, n_clusters=MAX_CLUSTERS, n_init=CLUSTER_N_INIT, random_state=42):
+        self.n_clusters = n_clusters
+        self.n_init = n_init
+        self.random_state = random_state
+        self.centroids = None
+        self.counts = np.zeros(n_clusters, dtype=np.int64)
+        self.refit_passes = 0
+        self.pending = None
+        self._sums = None
+
+    @property
+    def fitted(self):
+        return self.centroids is not None
+
+    @staticmethod
+    def _filled(values, means):
+        """Missing values count as the column mean"""
+        return np.where(np.isnan(values), means, values).astype(np.float64)
+
+    @staticmethod
+    def _scale(values, means, stds):
+        return (values - means) / np.where(stds > 0, stds, 1)
+
+    def assign(self, values, means, stds):
+        """Nearest centroid of every row, in standardized units"""
+        values = self._filled(values, means)
+        scaled = self._scale(values, means, stds)
+        centroids = self._scale(self.centroids, means, stds)
+        distances = ((scaled[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        return np.argmin(distances, axis=1), values
+
+    def _cluster_sums(self, values, labels):
+        counts = np.bincount(labels, minlength=self.n_clusters)
+        sums = np.column_stack([np.bincount(labels, weights=values[:, j], minlength=self.n_clusters)
+                                for j in range(values.shape[1])])
+        return counts, sums
+
+    @property
+    def pending_rows(self):
+        return 0 if self.pending is None else len(self.pending)
+
+    def update(self, values, means, stds):
+        """Fold a chunk into the centroids and return its labels.
+
+        Before the first fit, the chunk is appended to the pending rows; once there are
+        at least n_clusters of them, they are fitted together and the labels cover the
+        pending rows first, then the chunk. While still too few to fit, returns None.
+        """
+        if not self.fitted:
+            if self.pending is not None:
+                values = np.vstack([self.pending, values])
+            if len(values) < self.n_clusters:
+                self.pending = np.asarray(values, dtype=np.float64) if len(values) else None
+                return None
+            self.pending = None
+            values = self._filled(values, means)
+            labels, _ = fit_clusters(self._scale(values, means, stds), self.n_clusters, self.n_init,
+                                     backend='sampled', random_state=self.random_state)
+            labels = order_clusters(labels, values.sum(axis=1), self.n_clusters)
+            self.counts, sums = self._cluster_sums(values, labels)
+            self.centroids = sums / np.maximum(self.counts, 1)[:, None]
+            return labels
+
+        labels, values = self.assign(values, means, stds)
+        counts, sums = self._cluster_sums(values, labels)
+        # Each centroid stays the mean of every row ever assigned to it
+        self.counts += counts
+        moved = counts > 0
+        self.centroids[moved] += (sums[moved] - counts[moved, None] * self.centroids[moved]) / self.counts[moved, None]
+        return labels
+
+    def start_pass(self):
+        """Begin one Lloyd iteration over the whole dataset, warm-started from the current centroids"""
+        self._sums = np.zeros_like(self.centroids)
+        self.counts = np.zeros(self.n_clusters, dtype=np.int64)
+
+    def add(self, values, means, stds):
+        """Assign a chunk within the current pass; returns its labels"""
+        labels, values = self.assign(values, means, stds)
+        counts, sums = self._cluster_sums(values, labels)
+        self.counts += counts
+        self._sums += sums
+        return labels
+
+    def finish_pass(self, stds):
+        """Move centroids to their members' means; returns the largest move in standard deviations"""
+        moved = self.counts > 0
+        centroids = self.centroids.copy()
+        centroids[moved] = self._sums[moved] / self.counts[moved, None]
+        shift = float(np.abs((centroids - self.centroids) / np.where(stds > 0, stds, 1)).max())
+        self.centroids = centroids
+        self.refit_passes += 1
+        self._sums = None
+        return shift
+
+    def state(self):
+        """JSON-serializable snapshot"""
+        return {
+            'n_clusters': self.n_clusters,
+            'n_init': self.n_init,
+            'random_state': self.random_state,
+            'centroids': self.centroids.tolist() if self.fitted else None,
+            'counts': self.counts.tolist(),
+            'refit_passes': self.refit_passes,
+            'pending': self.pending.tolist() if self.pending is not None else None
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Inverse of state()"""
+        clusters = cls(state['n_clusters'], state['n_init'], state['random_state'])
+        if state['centroids'] is not None:
+            clusters.centroids = np.asarray(state['centroids'], dtype=np.float64)
+        clusters.counts = np.asarray(state['counts'], dtype=np.int64)
+        clusters.refit_passes = state['refit_passes']
+        if state.get('pending') is not None:
+            clusters.pending = np.asarray(state['pending'], dtype=np.float64)
+        return clusters
+
+
+def scale_features(numeric_df):
+    """Standardize every numeric column to zero mean and unit variance
+
+    Missing values count as the column mean (zero once scaled), as in OnlineClusters.
+    """
+    scaled = StandardScaler().fit_transform(numeric_df)
+    missing = np.isnan(scaled)
+    if missing.any():
+        scaled[missing] = 0.0
+    return scaled
+
+
+def describe_clusters(df, numeric_df, labels):
+    """Describe each population cluster by the summed mean intake of its members"""
+    cluster_means = numeric_df.groupby(labels).mean()
+    food_columns = [col for col in numeric_df.columns if col in FOOD_SOURCE_INFO]
+    cluster_descriptions = []
+    if 'Region' in df.columns:
+        # One shared name object per region rather than a new string per member
+        country_codes, country_names = region_lookup(df['Region'])
+        regions = np.asarray(country_names, dtype=object)[country_codes]
+
+    for cluster_id, cluster_data in cluster_means.iterrows():
+        members = labels == cluster_id
+        cluster_countries = regions[members].tolist() if 'Region' in df.columns else []
+
+        avg_total = np.float64(sum([cluster_data[col] for col in food_columns]))
+        description = describe_cluster(cluster_id, avg_total, members.sum())
+        description['countries'] = cluster_countries
+        cluster_descriptions.append(description)
+
+    return cluster_descriptions
+
+
+def describe_cluster(cluster_id, avg_total, sample_count):
+    """Risk category and guidance for a cluster with the given mean total intake"""
+    if avg_total < 400:
+        risk_category = "Low Risk Population"
+        description = "Countries/regions with relatively low microplastic exposure across food sources."
+        health_impact = "Minimal immediate health concerns, maintain current practices."
+        policy_recommendation = "Continue monitoring and share best practices globally."
+    elif avg_total < 800:
+        risk_category = "Moderate Risk Population"
+        description = "Countries/regions with moderate exposure levels requiring attention."
+        health_impact = "Potential long-term health risks, preventive measures recommended."
+        policy_recommendation = "Implement targeted interventions and strengthen regulations."
+    else:
+        risk_category = "High Risk Population"
+        description = "Countries/regions with concerning exposure levels needing urgent action."
+        health_impact = "Significant health risks, immediate intervention required."
+        policy_recommendation = "Emergency response protocols and comprehensive policy reform."
+
+    return {
+        'cluster_id': int(cluster_id),
+        'risk_category': risk_category,
+        'description': description,
+        'health_impact': health_impact,
+        'policy_recommendation': policy_recommendation,
+        'average_intake': round(avg_total, 1),
+        'sample_count': int(sample_count)
+    }
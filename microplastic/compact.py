@@ -0,0 +1,125 @@
+# compact.py - Columnar country analyses with server-side paging for the compact response mode
+
+import hashlib
+import io
+
+import numpy as np
+
+from .constants import FOOD_SOURCE_INFO, RISK_COLORS, RISK_LEVELS, RISK_RECOMMENDATIONS
+from .risk import risk_level_codes, round_intake
+
+# Country analyses returned per page, and the most a client may ask for at once
+COUNTRY_PAGE_SIZE = 100
+MAX_COUNTRY_PAGE_SIZE = 5000
+COUNTRY_SORT_KEYS = ('total_intake', 'average_intake', 'country', 'sample_id', 'cluster')
+# Countries named on each compact cluster card (the full membership is in the country table)
+CLUSTER_TOP_COUNTRIES = 10
+
+# Per-row columns of a country table; the others are shared by every row
+ROW_COLUMNS = ('sample_id', 'country', 'total_intake', 'average_intake', 'risk', 'cluster', 'food_intake', 'food_risk')
+
+
+def country_table(risk_table, labels):
+    """Per-sample country analysis as columns of ids and numbers, ordered like build_country_analyses()"""
+    total_rounded = round_intake(risk_table['totals'])
+    order = np.argsort(-total_rounded, kind='stable')
+    return {
+        'sample_id': np.asarray(risk_table['sample_ids'], dtype=np.int64)[order],
+        # Codes into country_names, one entry per distinct region
+        'country': risk_table['country_codes'][order],
+        'country_names': np.array([str(name) for name in risk_table['country_names']], dtype=str),
+        'total_intake': total_rounded[order],
+        'average_intake': round_intake(risk_table['averages'])[order],
+        'risk': risk_table['risk_codes'][order].astype(np.int8),
+        'cluster': np.asarray(labels, dtype=np.int32)[order],
+        # One column per food source, in food_sources order
+        'food_intake': round_intake(risk_table['values'])[order],
+        'food_risk': risk_level_codes(risk_table['values'])[order].astype(np.int8),
+        'food_sources': np.array([FOOD_SOURCE_INFO[col]['name'] for col in risk_table['food_columns']], dtype=str),
+        'food_columns': np.array(risk_table['food_columns'], dtype=str)
+    }
+
+
+def country_table_id(payload):
+    """Content hash identifying an encoded country table (used in its URL)"""
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+def encode_country_table(table):
+    """Serialize a country table to bytes (uncompressed .npz)"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **table)
+    return buffer.getvalue()
+
+
+def decode_country_table(payload):
+    """Inverse of encode_country_table"""
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def compact_lookups(table):
+    """Shared values that compact rows refer to by index"""
+    # RISK_RECOMMENDATIONS repeats the high-risk tier for 'Very High'; list each tier once
+    tiers = []
+    tier_of_level = []
+    for recommendation in RISK_RECOMMENDATIONS:
+        if recommendation not in tiers:
+            tiers.append(recommendation)
+        tier_of_level.append(tiers.index(recommendation))
+    return {
+        'risk_levels': RISK_LEVELS,
+        'risk_colors': RISK_COLORS,
+        'risk_recommendation': tier_of_level,
+        'recommendations': tiers,
+        'food_sources': table['food_sources'].tolist()
+    }
+
+
+def compact_clusters(cluster_descriptions):
+    """Cluster descriptions naming a few member countries instead of listing every sample"""
+    compact = []
+    for cluster in cluster_descriptions:
+        cluster = dict(cluster)
+        countries = list(dict.fromkeys(cluster.pop('countries')))
+        cluster['top_countries'] = countries[:CLUSTER_TOP_COUNTRIES]
+        cluster['country_count'] = len(countries)
+        compact.append(cluster)
+    return compact
+
+
+def country_page(table, offset=0, limit=COUNTRY_PAGE_SIZE, sort='total_intake', descending=True, risk_codes=None):
+    """One page of a country table as columnar arrays, after filtering by risk level and sorting"""
+    rows = np.arange(len(table['sample_id']))
+    if risk_codes is not None:
+        rows = rows[np.isin(table['risk'][rows], risk_codes)]
+
+    # The table is stored highest total first, so the default order needs no sort
+    if not (sort == 'total_intake' and descending):
+        keys = table[sort][rows]
+        if sort == 'country' and 'country_names' in table:
+            # Order region codes by their names
+            keys = np.argsort(np.argsort(table['country_names'], kind='stable'), kind='stable')[keys]
+        # Rank the keys so one stable sort handles numbers and names in either direction
+        _, ranks = np.unique(keys, return_inverse=True)
+        rows = rows[np.argsort(-ranks if descending else ranks, kind='stable')]
+
+    page = rows[offset:offset + limit]
+    return {
+        'total': int(len(table['sample_id'])),
+        'matched': int(len(rows)),
+        'offset': offset,
+        'limit': limit,
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+        # Left as numpy arrays for the JSON encoder to write directly
+        'columns': page_columns(table, page)
+    }
+
+
+def page_columns(table, rows, names=ROW_COLUMNS):
+    """The given rows of a country table, with countries by name"""
+    columns = {name: table[name][rows] for name in names}
+    if 'country_names' in table:
+        columns['country'] = table['country_names'][columns['country']]
+    return columns
@@ -0,0 +1,98 @@
+# constants.py - Research thresholds, reference text and analysis parameters
+
+import numpy as np
+
+# Health risk thresholds (particles per gram/liter) based on research
+HEALTH_THRESHOLDS = {
+    'low': 50,
+    'moderate': 150,
+    'high': 300,
+    'very_high': 500
+}
+
+# Analysis parameters (clustering and association rule mining)
+MAX_CLUSTERS = 3
+CLUSTER_N_INIT = 10
+MIN_SUPPORT = 0.2
+MIN_CONFIDENCE = 0.6
+
+# Pipeline stages, numbered as in run_analysis(); reported as job progress
+ANALYSIS_STAGES = [
+    'Data Preparation',
+    'Global Insights',
+    'Country/Region Analysis',
+    'Population-Level Clustering',
+    'Food Source Global Analysis',
+    'Association Analysis',
+    'Create Visualization',
+    'Package Results'
+]
+
+# Country-specific health recommendations
+COUNTRY_RECOMMENDATIONS = {
+    'high_risk': {
+        'policy': 'Implement strict regulations on plastic waste management and water quality standards',
+        'public_health': 'Launch nationwide awareness campaigns about microplastic risks',
+        'individual': 'Prioritize filtered water access and fresh food distribution programs'
+    },
+    'moderate_risk': {
+        'policy': 'Strengthen environmental monitoring and plastic recycling programs',
+        'public_health': 'Educate consumers about safer food choices and water sources',
+        'individual': 'Promote local, sustainable food systems and plastic alternatives'
+    },
+    'low_risk': {
+        'policy': 'Maintain current environmental protections and continue monitoring',
+        'public_health': 'Share best practices with higher-risk regions',
+        'individual': 'Continue sustainable practices and support global initiatives'
+    }
+}
+
+# Food source information for research analysis
+FOOD_SOURCE_INFO = {
+    'Seafood_Intake': {
+        'name': 'Seafood',
+        'description': 'Fish, shellfish, and other marine foods',
+        'main_risk': 'Ocean pollution and marine plastic ingestion',
+        'global_solution': 'Reduce ocean plastic pollution, implement sustainable fishing practices',
+        'country_action': 'Monitor coastal water quality, regulate fishing in polluted areas'
+    },
+    'Bottled_Water_Intake': {
+        'name': 'Bottled Water',
+        'description': 'Commercial bottled drinking water',
+        'main_risk': 'Plastic bottle degradation and processing contamination',
+        'global_solution': 'Improve bottled water regulations, promote alternatives',
+        'country_action': 'Set microplastic limits for bottled water, improve tap water infrastructure'
+    },
+    'Salt_Intake': {
+        'name': 'Table Salt',
+        'description': 'Sea salt and processed salt products',
+        'main_risk': 'Ocean and environmental contamination during production',
+        'global_solution': 'Cleaner salt production methods, environmental protection',
+        'country_action': 'Monitor salt production facilities, establish quality standards'
+    },
+    'Sugar_Intake': {
+        'name': 'Sugar Products',
+        'description': 'Processed sugar and sweeteners',
+        'main_risk': 'Contamination during processing and packaging',
+        'global_solution': 'Improve food processing standards, reduce plastic packaging',
+        'country_action': 'Regulate food processing facilities, monitor contamination levels'
+    },
+    'Packaged_Food_Intake': {
+        'name': 'Packaged Foods',
+        'description': 'Pre-packaged and processed foods',
+        'main_risk': 'Plastic packaging migration and processing contamination',
+        'global_solution': 'Develop safer packaging materials, reduce plastic use',
+        'country_action': 'Set packaging standards, promote fresh food access'
+    }
+}
+
+# Risk levels in threshold order; np.digitize over RISK_BINS indexes into these
+RISK_BINS = np.array([HEALTH_THRESHOLDS['low'], HEALTH_THRESHOLDS['moderate'], HEALTH_THRESHOLDS['high']])
+RISK_LEVELS = ['Low', 'Moderate', 'High', 'Very High']
+RISK_COLORS = ['green', 'orange', 'red', 'darkred']
+RISK_RECOMMENDATIONS = [
+    COUNTRY_RECOMMENDATIONS['low_risk'],
+    COUNTRY_RECOMMENDATIONS['moderate_risk'],
+    COUNTRY_RECOMMENDATIONS['high_risk'],
+    COUNTRY_RECOMMENDATIONS['high_risk']
+]
@@ -0,0 +1,5 @@
+# errors.py - Exceptions shared by the stage modules and the pipeline
+
+
+class AnalysisInputError(Exception):
+    """An upload that cannot be analyzed; reported to the client as a 400"""
@@ -0,0 +1,43 @@
+# food.py - Global statistics per food source
+
+from .constants import FOOD_SOURCE_INFO
+from .risk import get_risk_level
+from .stats import column_statistics
+
+
+def describe_food_source(column, avg_intake, max_intake, min_intake, high_risk_countries):
+    """Build the global analysis entry for one food source column"""
+    food_info = FOOD_SOURCE_INFO[column]
+    risk_level, color = get_risk_level(avg_intake)
+    return {
+        'food_source': food_info['name'],
+        'global_average': float(round(avg_intake, 1)),
+        'highest_exposure': float(round(max_intake, 1)),
+        'lowest_exposure': float(round(min_intake, 1)),
+        'risk_level': risk_level,
+        'color': color,
+        'countries_at_risk': int(high_risk_countries),
+        'main_concern': food_info['main_risk'],
+        'global_solution': food_info['global_solution'],
+        'country_action': food_info['country_action']
+    }
+
+
+def analyze_food_sources(numeric_df, statistics=None):
+    """Per-food averages, extremes and samples above the 75th percentile, highest average first"""
+    if statistics is None:
+        statistics = column_statistics(numeric_df)
+    food_source_analysis = []
+
+    for j, column in enumerate(statistics['columns']):
+        if column in FOOD_SOURCE_INFO:
+            food_source_analysis.append(describe_food_source(
+                column,
+                statistics['mean'][j],
+                statistics['max'][j],
+                statistics['min'][j],
+                statistics['above_p75'][j]
+            ))
+
+    food_source_analysis.sort(key=lambda x: x['global_average'], reverse=True)
+    return food_source_analysis
@@ -0,0 +1,146 @@
+# formats.py - Upload format detection and column-pruned readers for CSV and columnar files
+
+import io
+import mmap
+import os
+
+import pandas as pd
+
+from .intake import intake_frame
+
+# Leading bytes of each binary format; anything else is read as plain CSV
+MAGIC_BYTES = [
+    (b'PAR1', 'parquet'),
+    (b'ARROW1', 'arrow'),            # Arrow IPC file, also Feather v2
+    (b'FEA1', 'feather_v1'),
+    (b'\xff\xff\xff\xff', 'arrow_stream'),
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd')
+]
+FORMAT_NAMES = {
+    'csv': 'CSV',
+    'gzip': 'Gzip-compressed CSV',
+    'zstd': 'Zstandard-compressed CSV',
+    'parquet': 'Parquet',
+    'arrow': 'Arrow IPC / Feather',
+    'arrow_stream': 'Arrow IPC stream',
+    'feather_v1': 'Feather v1'
+}
+# Formats parsed with pd.read_csv, and the compression each needs
+CSV_COMPRESSION = {'csv': None, 'gzip': 'gzip', 'zstd': 'zstd'}
+
+
+def detect_format(file):
+    """Identify an upload's format from its leading bytes, leaving the stream rewound"""
+    file.seek(0)
+    head = file.read(8)
+    file.seek(0)
+    for magic, name in MAGIC_BYTES:
+        if head.startswith(magic):
+            return name
+    return 'csv'
+
+
+def is_intake_column(name):
+    """Only the Region and *_Intake columns are read from an upload"""
+    return name == 'Region' or str(name).endswith('_Intake')
+
+
+def require_pyarrow(file_format):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f'{FORMAT_NAMES[file_format]} uploads require pyarrow to be installed on the server')
+
+
+def upload_buffer(file):
+    """Arrow buffer over an upload, memory-mapped when it is backed by a file on disk"""
+    import pyarrow as pa
+
+    try:
+        fileno = file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno = None
+    if fileno is not None and os.fstat(fileno).st_size > 0:
+        return pa.py_buffer(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+    file.seek(0)
+    return pa.py_buffer(file.read())
+
+
+def upload_columns(file, file_format):
+    """Column names of an upload, read from its header or schema only"""
+    if file_format in CSV_COMPRESSION:
+        file.seek(0)
+        columns = pd.read_csv(file, nrows=0, compression=CSV_COMPRESSION[file_format]).columns
+        file.seek(0)
+        return list(columns)
+    return arrow_source(file, file_format)[0]
+
+
+def open_parquet(file):
+    require_pyarrow('parquet')
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(pa.BufferReader(upload_buffer(file)))
+
+
+def arrow_source(file, file_format):
+    """(column names, reader) for a columnar upload; reader(columns) returns an Arrow table"""
+    require_pyarrow(file_format)
+    import pyarrow as pa
+
+    if file_format == 'parquet':
+        parquet_file = open_parquet(file)
+        return parquet_file.schema_arrow.names, lambda columns: parquet_file.read(columns=columns)
+    buffer = upload_buffer(file)
+    if file_format == 'feather_v1':
+        import pyarrow.feather as feather
+        table = feather.read_table(pa.BufferReader(buffer))
+    elif file_format == 'arrow':
+        table = pa.ipc.open_file(buffer).read_all()
+    else:
+        table = pa.ipc.open_stream(buffer).read_all()
+    # IPC data is read without copying from the buffer, so selecting afterwards costs nothing
+    return table.column_names, table.select
+
+
+def read_upload(file, file_format=None, dtype='float64'):
+    """Load an upload's Region and *_Intake columns into a DataFrame, whatever its format.
+
+    The result is in intake_frame() layout: intake columns in one `dtype` matrix and
+    Region as category codes.
+    """
+    file_format = file_format or detect_format(file)
+    if file_format in CSV_COMPRESSION:
+        # Parse straight into the compact types, so no per-row Region strings or wider floats are built
+        names = [name for name in upload_columns(file, file_format) if is_intake_column(name)]
+        dtypes = {name: 'category' if name == 'Region' else dtype for name in names}
+        try:
+            df = pd.read_csv(file, usecols=names, dtype=dtypes, compression=CSV_COMPRESSION[file_format])
+        except ValueError:
+            # A non-numeric intake column; read it as text, analysis then skips it
+            file.seek(0)
+            df = pd.read_csv(file, usecols=names, dtype={'Region': 'category'}, compression=CSV_COMPRESSION[file_format])
+        return intake_frame(df, dtype)
+    names, read_columns = arrow_source(file, file_format)
+    return intake_frame(read_columns([name for name in names if is_intake_column(name)]).to_pandas(), dtype)
+
+
+def iter_upload_chunks(file, file_format, columns, dtype, chunk_rows):
+    """Yield DataFrames of at most chunk_rows rows holding just `columns` of an upload"""
+    file.seek(0)
+    if file_format in CSV_COMPRESSION:
+        with pd.read_csv(file, usecols=columns, dtype=dtype, chunksize=chunk_rows,
+                         compression=CSV_COMPRESSION[file_format]) as reader:
+            yield from reader
+        return
+
+    if file_format == 'parquet':
+        # Row groups are decoded one batch at a time, so memory stays bounded
+        batches = open_parquet(file).iter_batches(batch_size=chunk_rows, columns=columns)
+    else:
+        _, read_columns = arrow_source(file, file_format)
+        batches = read_columns(columns).to_batches(max_chunksize=chunk_rows)
+    for batch in batches:
+        yield batch.to_pandas().astype(dtype)
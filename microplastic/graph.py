@@ -0,0 +1,49 @@
+# graph.py - Run pipeline stages as a small dependency graph, independent stages concurrently
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Default per-analysis stage workers; NumPy, pandas and scikit-learn release the GIL in
+# their heavy loops, so threads overlap the independent stages
+STAGE_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def run_stages(stages, workers=STAGE_WORKERS, report_stage=None, finish_stage=None):
+    """Run (name, stage number, fn, dependencies) stages; each is called as fn(outputs) once its dependencies are done.
+
+    Stages start in list order as soon as their dependencies allow, at most `workers` at
+    a time on a thread pool, so wall-clock time approaches the slowest chain of stages
+    rather than their sum. report_stage(number) is called as each stage starts and
+    finish_stage(number) as it ends. Returns {name: output}.
+    """
+    report_stage = report_stage or (lambda stage: None)
+    finish_stage = finish_stage or (lambda stage: None)
+    outputs = {}
+
+    if workers <= 1:
+        # The list is in dependency order, so running it as written is always valid
+        for name, number, fn, _ in stages:
+            report_stage(number)
+            outputs[name] = fn(outputs)
+            finish_stage(number)
+        return outputs
+
+    pending = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for stage in [stage for stage in pending if all(dep in outputs for dep in stage[3])]:
+                if len(running) >= workers:
+                    break
+                pending.remove(stage)
+                report_stage(stage[1])
+                running[pool.submit(stage[2], outputs)] = stage
+            if not running:
+                raise ValueError(f"Stages with unmet dependencies: {', '.join(stage[0] for stage in pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, number, _, _ = running.pop(future)
+                outputs[name] = future.result()
+                finish_stage(number)
+    return outputs
@@ -0,0 +1,43 @@
+# insights.py - Dataset-wide headline figures
+
+import numpy as np
+
+from .constants import FOOD_SOURCE_INFO
+from .risk import compute_risk_table
+from .stats import column_statistics
+
+
+def generate_global_insights(df, risk_table=None, statistics=None):
+    """Generate insights for the global dataset"""
+    if statistics is None:
+        statistics = column_statistics(df.select_dtypes(include=['number']))
+    if risk_table is None:
+        risk_table = compute_risk_table(df, statistics)
+
+    insights = {
+        'total_countries': len(df),
+        'global_avg_intake': float(round(statistics['totals'].mean(), 1)),
+        'highest_risk_country': '',
+        'lowest_risk_country': '',
+        'most_problematic_food': '',
+        'safest_food': ''
+    }
+
+    # Find highest and lowest risk countries (first maximum, last minimum as in a stable descending sort)
+    totals = risk_table['totals']
+    if len(totals):
+        insights['highest_risk_country'] = risk_table['countries'][int(np.argmax(totals))]
+        insights['lowest_risk_country'] = risk_table['countries'][len(totals) - 1 - int(np.argmin(totals[::-1]))]
+    else:
+        insights['highest_risk_country'] = 'Unknown'
+        insights['lowest_risk_country'] = 'Unknown'
+
+    # Find most problematic food source
+    means = dict(zip(statistics['columns'], statistics['mean'].tolist()))
+    food_averages = [(FOOD_SOURCE_INFO[col]['name'], means[col]) for col in risk_table['food_columns']]
+
+    food_averages.sort(key=lambda x: x[1], reverse=True)
+    insights['most_problematic_food'] = food_averages[0][0] if food_averages else 'Unknown'
+    insights['safest_food'] = food_averages[-1][0] if food_averages else 'Unknown'
+
+    return insights
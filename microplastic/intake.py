@@ -0,0 +1,56 @@
+# intake.py - Memory-compact layout of the intake table shared by every analysis stage
+
+import numpy as np
+import pandas as pd
+
+# Float widths the intake matrix can be held in; float32 halves it at ~7 significant digits
+INTAKE_DTYPES = ('float64', 'float32')
+
+
+def intake_frame(df, dtype='float64'):
+    """df with its numeric columns in one contiguous matrix of `dtype` and Region as category codes.
+
+    The matrix is a single (columns x rows) block, so every column is contiguous and
+    select_dtypes()/to_numpy() downstream return views of it instead of copies. Region
+    becomes integer codes into a lookup of the distinct names rather than one string
+    object per row. A frame already in this layout is returned unchanged.
+    """
+    numeric_df = df.select_dtypes(include=['number'])
+    columns = numeric_df.columns.tolist()
+    values = numeric_df.to_numpy(dtype=dtype)
+    shared = not columns or np.shares_memory(values, numeric_df[columns[0]].to_numpy())
+    has_region = 'Region' in df.columns
+    if shared and (not has_region or isinstance(df['Region'].dtype, pd.CategoricalDtype)):
+        return df
+
+    frame = pd.DataFrame(np.asfortranarray(values), index=df.index, columns=columns, copy=False)
+    for position, column in enumerate(df.columns):
+        if column not in frame.columns:
+            frame.insert(position, column, df[column].astype('category') if column == 'Region' else df[column])
+    return frame
+
+
+def intake_memory(df):
+    """Bytes held by an intake table, including the Region lookup"""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def region_lookup(regions):
+    """(codes, names) for a Region column: integer codes into the list of distinct names.
+
+    A missing region gets a code of its own, named NaN as in the column itself.
+    """
+    if isinstance(regions.dtype, pd.CategoricalDtype):
+        codes = regions.cat.codes.to_numpy().astype(np.int32)
+        names = regions.cat.categories.tolist()
+        if (codes < 0).any():
+            codes[codes < 0] = len(names)
+            names.append(np.nan)
+        return codes, names
+    codes, names = pd.factorize(regions, use_na_sentinel=False)
+    return codes.astype(np.int32), names.tolist()
+
+
+def region_names(codes, names):
+    """Per-row region names as a list sharing one object per distinct name"""
+    return np.asarray(names, dtype=object)[codes].tolist()
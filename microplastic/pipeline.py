@@ -0,0 +1,405 @@
+# pipeline.py - The full analysis pipeline and its options, independent of the web app
+
+import os
+
+import numpy as np
+
+from .aggregate import AGGREGATE_MODES, AGGREGATE_STATISTICS, aggregate_by_region
+from .association import association_rules, describe_rules, find_consumption_patterns
+from .clustering import (AUTO_K_MAX, CLUSTER_BACKENDS, LARGE_DATASET_ROWS, describe_clusters, fit_clusters,
+                         order_clusters, scale_features, select_clusters)
+from .compact import (COUNTRY_PAGE_SIZE, COUNTRY_SORT_KEYS, MAX_COUNTRY_PAGE_SIZE, compact_clusters, compact_lookups,
+                      country_page, country_table, country_table_id, encode_country_table)
+from .constants import (CLUSTER_N_INIT, FOOD_SOURCE_INFO, MAX_CLUSTERS, MIN_CONFIDENCE, MIN_SUPPORT, RISK_BINS,
+                        RISK_LEVELS)
+from .errors import AnalysisInputError
+from .food import analyze_food_sources, describe_food_source
+from .formats import read_upload
+from .graph import STAGE_WORKERS, run_stages
+from .insights import generate_global_insights
+from .intake import INTAKE_DTYPES, intake_frame, intake_memory
+from .plotting import PLOT_DPI, PLOT_DPI_RANGE, PLOT_FORMATS, cluster_plot_spec, encode_plot_spec, pca_coordinates, plot_id
+from .risk import build_country_analyses, compute_risk_table, risk_distribution, summarize_risk_distribution
+from .sketches import SKETCH_ERROR_RANGE, SKETCH_K, rank_error, sketch_k
+from .stats import column_statistics
+from .streaming import STREAMING_CHUNK_ROWS, analyze_partitions, analyze_stream
+
+
+def analysis_options(values):
+    """Validate per-request analysis options from form/query values"""
+    options = {
+        'mode': values.get('mode', 'full'),
+        'plot_format': values.get('plot_format', 'png').lower(),
+        'plot_dpi': values.get('plot_dpi', PLOT_DPI),
+        'include_pca': values.get('include_pca', '').lower() in ('1', 'true', 'yes'),
+        'compact': values.get('compact', '').lower() in ('1', 'true', 'yes'),
+        'aggregate': values.get('aggregate', 'none').lower(),
+        'aggregate_statistic': values.get('aggregate_statistic', 'mean').lower(),
+        'clusters': values.get('clusters', MAX_CLUSTERS),
+        'k_max': parse_int_option(values.get('k_max', AUTO_K_MAX), 'k_max', 2, 20),
+        'n_init': parse_int_option(values.get('n_init', CLUSTER_N_INIT), 'n_init', 1, 50),
+        'cluster_backend': values.get('cluster_backend', 'auto').lower(),
+        'cluster_threshold': parse_int_option(values.get('cluster_threshold', LARGE_DATASET_ROWS), 'cluster_threshold', 1, 10 ** 9),
+        'stage_workers': parse_int_option(values.get('stage_workers', STAGE_WORKERS), 'stage_workers', 1, 16),
+        'dtype': values.get('dtype', 'float64').lower(),
+        'sketch_error': values.get('sketch_error')
+    }
+    if options['mode'] not in ('full', 'streaming'):
+        raise AnalysisInputError(f"Unknown analysis mode '{options['mode']}'")
+    if options['plot_format'] not in PLOT_FORMATS:
+        raise AnalysisInputError(f"Unsupported plot format '{options['plot_format']}' (choose from {', '.join(PLOT_FORMATS)})")
+    if options['aggregate'] not in AGGREGATE_MODES:
+        raise AnalysisInputError(f"Unknown aggregation '{options['aggregate']}' (choose from {', '.join(AGGREGATE_MODES)})")
+    if options['aggregate_statistic'] not in AGGREGATE_STATISTICS:
+        raise AnalysisInputError(f"Unknown aggregate statistic '{options['aggregate_statistic']}' (choose from {', '.join(AGGREGATE_STATISTICS)})")
+    if options['aggregate'] != 'none' and options['mode'] == 'streaming':
+        raise AnalysisInputError("Aggregation by region is not available in streaming mode")
+    if options['dtype'] not in INTAKE_DTYPES:
+        raise AnalysisInputError(f"Unsupported dtype '{options['dtype']}' (choose from {', '.join(INTAKE_DTYPES)})")
+    if options['sketch_error'] is not None:
+        if options['mode'] != 'streaming':
+            raise AnalysisInputError("sketch_error applies to streaming mode only")
+        options['sketch_error'] = parse_float_option(options['sketch_error'], 'sketch_error', *SKETCH_ERROR_RANGE)
+    if options['cluster_backend'] not in CLUSTER_BACKENDS:
+        raise AnalysisInputError(f"Unknown clustering backend '{options['cluster_backend']}' (choose from {', '.join(CLUSTER_BACKENDS)})")
+    if str(options['clusters']).lower() == 'auto':
+        options['clusters'] = 'auto'
+    else:
+        options['clusters'] = parse_int_option(options['clusters'], 'clusters', 1, 20)
+    options['plot_dpi'] = parse_plot_dpi(options['plot_dpi'])
+    return options
+
+
+def country_page_options(values):
+    """Validate paging, sorting and risk-level filtering of a compact country table"""
+    risk_names = [name.strip().lower() for name in values.get('risk', '').split(',') if name.strip()]
+    levels = [level.lower() for level in RISK_LEVELS]
+    for name in risk_names:
+        if name not in levels:
+            raise AnalysisInputError(f"Unknown risk level '{name}' (choose from {', '.join(RISK_LEVELS)})")
+    options = {
+        'offset': parse_int_option(values.get('offset', 0), 'offset', 0, 10 ** 12),
+        'limit': parse_int_option(values.get('limit', COUNTRY_PAGE_SIZE), 'limit', 1, MAX_COUNTRY_PAGE_SIZE),
+        'sort': values.get('sort', 'total_intake'),
+        'descending': values.get('order', 'desc').lower() != 'asc',
+        'risk_codes': [levels.index(name) for name in risk_names] or None
+    }
+    if options['sort'] not in COUNTRY_SORT_KEYS:
+        raise AnalysisInputError(f"Unknown sort key '{options['sort']}' (choose from {', '.join(COUNTRY_SORT_KEYS)})")
+    if values.get('order', 'desc').lower() not in ('asc', 'desc'):
+        raise AnalysisInputError("order must be 'asc' or 'desc'")
+    return options
+
+
+def query_options(values):
+    """Validate a drill-down query of a country table: region, range and top-N of a food or total"""
+    options = {
+        'region': values.get('region') or None,
+        'by': values.get('by') or None,
+        'minimum': None,
+        'maximum': None,
+        'top': None,
+        'offset': parse_int_option(values.get('offset', 0), 'offset', 0, 10 ** 12),
+        'limit': parse_int_option(values.get('limit', COUNTRY_PAGE_SIZE), 'limit', 1, MAX_COUNTRY_PAGE_SIZE)
+    }
+    if values.get('min') not in (None, ''):
+        options['minimum'] = parse_float_option(values['min'], 'min', -np.inf, np.inf)
+    if values.get('max') not in (None, ''):
+        options['maximum'] = parse_float_option(values['max'], 'max', -np.inf, np.inf)
+    if values.get('top') not in (None, ''):
+        options['top'] = parse_int_option(values['top'], 'top', 1, 10 ** 12)
+    if options['by'] is None and (options['minimum'] is not None or options['maximum'] is not None):
+        raise AnalysisInputError("min and max need a 'by' column")
+    return options
+
+
+def parse_int_option(value, name, minimum, maximum):
+    """Parse an integer request option, rejecting values outside [minimum, maximum]"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise AnalysisInputError(f"Invalid {name} '{value}'")
+    if not minimum <= number <= maximum:
+        raise AnalysisInputError(f"{name} must be between {minimum} and {maximum}")
+    return number
+
+
+def parse_float_option(value, name, minimum, maximum):
+    """Parse a float request option, rejecting values outside [minimum, maximum]"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise AnalysisInputError(f"Invalid {name} '{value}'")
+    if not minimum <= number <= maximum:
+        raise AnalysisInputError(f"{name} must be between {minimum} and {maximum}")
+    return number
+
+
+def parse_plot_dpi(value):
+    """Parse a requested plot resolution within PLOT_DPI_RANGE"""
+    return parse_int_option(value, 'plot dpi', *PLOT_DPI_RANGE)
+
+
+def cluster_populations(scaled_features, options, search_workers=None):
+    """Cluster the scaled samples as requested by options; returns (labels, clustering info)"""
+    if options['clusters'] == 'auto':
+        # Search a range of k in parallel and keep the best silhouette score
+        return select_clusters(
+            scaled_features,
+            k_max=options['k_max'],
+            n_init=options['n_init'],
+            backend=options['cluster_backend'],
+            large_rows=options['cluster_threshold'],
+            max_workers=search_workers
+        )
+    return fit_clusters(
+        scaled_features, min(options['clusters'], len(scaled_features)),
+        n_init=options['n_init'],
+        backend=options['cluster_backend'],
+        large_rows=options['cluster_threshold']
+    )
+
+
+def run_analysis(df, report_stage=None, options=None, search_workers=None):
+    """Run the full population analysis pipeline on a DataFrame and return the results dict.
+
+    After data preparation, stages 2-7 form a dependency graph (only the plot needs the
+    clustering) and run concurrently on options['stage_workers'] threads.
+    The PCA plot itself is not rendered; results carry its encoded spec under 'plot_spec'.
+    The encoded country table for paging and queries is under 'country_table'; with
+    options['compact'], country analyses come as one columnar page of it.
+    """
+    report_stage = report_stage or (lambda stage: None)
+    options = options or analysis_options({})
+
+    # --- 1. Data Preparation ---
+    report_stage(1)
+    # One contiguous intake matrix and Region codes; the stages below work on views of it
+    df = intake_frame(df, options['dtype'])
+    # Select only the numeric columns for analysis
+    numeric_df = df.select_dtypes(include=['number'])
+
+    if numeric_df.empty:
+        raise AnalysisInputError("No numeric data found in CSV for analysis")
+
+    aggregation = None
+    if options['aggregate'] == 'region':
+        if 'Region' not in df.columns:
+            raise AnalysisInputError("Aggregation by region needs a Region column")
+        # Every later stage then scales with the number of regions, not samples
+        df, aggregation = aggregate_by_region(df, options['aggregate_statistic'])
+        df = intake_frame(df, options['dtype'])
+        numeric_df = df.select_dtypes(include=['number'])
+
+    # Column statistics in one pass, then per-sample totals and risk levels, shared by the later stages
+    statistics = column_statistics(numeric_df)
+    risk_table = compute_risk_table(df, statistics)
+
+    # --- 2. Global Insights ---
+    def global_insights(outputs):
+        return generate_global_insights(df, risk_table, statistics)
+
+    # --- 3. Country/Region Analysis ---
+    def country_analyses(outputs):
+        # Sorted by risk (highest first); compact responses build a columnar table once clusters are known
+        return None if options['compact'] else build_country_analyses(risk_table)
+
+    # --- 4. Population-Level Clustering ---
+    def population_clusters(outputs):
+        scaled_features = scale_features(numeric_df)
+        clusters, clustering_info = cluster_populations(scaled_features, options, search_workers)
+        # Lowest-intake cluster first, so ids stay put when the data changes a little between runs
+        clusters = order_clusters(clusters, risk_table['totals'])
+        return scaled_features, clusters, clustering_info, describe_clusters(df, numeric_df, clusters)
+
+    # --- 5. Food Source Global Analysis ---
+    def food_sources(outputs):
+        return analyze_food_sources(numeric_df, statistics)
+
+    # --- 6. Association Analysis (Food Consumption Patterns) ---
+    def consumption_patterns(outputs):
+        return find_consumption_patterns(numeric_df, MIN_SUPPORT, MIN_CONFIDENCE, statistics)
+
+    # --- 7. Create Visualization ---
+    def visualization(outputs):
+        scaled_features, clusters, _, cluster_descriptions = outputs['population_clusters']
+        # Only the coordinates are kept here; the image is rendered on demand
+        return cluster_plot_spec(
+            scaled_features, clusters, cluster_descriptions,
+            risk_table['countries'] if 'Region' in df.columns else None
+        )
+
+    outputs = run_stages([
+        ('global_insights', 2, global_insights, ()),
+        ('country_analyses', 3, country_analyses, ()),
+        ('population_clusters', 4, population_clusters, ()),
+        ('food_sources', 5, food_sources, ()),
+        ('consumption_patterns', 6, consumption_patterns, ()),
+        ('visualization', 7, visualization, ('population_clusters',))
+    ], options['stage_workers'], report_stage, getattr(report_stage, 'finish', None))
+    _, clusters, clustering_info, cluster_descriptions = outputs['population_clusters']
+    plot_spec = outputs['visualization']
+
+    # --- 8. Package Results ---
+    report_stage(8)
+    results = {
+        "global_insights": outputs['global_insights'],
+        "country_analyses": outputs['country_analyses'],
+        "population_clusters": cluster_descriptions,
+        "food_source_analysis": outputs['food_sources'],
+        "consumption_patterns": outputs['consumption_patterns'],
+        "visualization_id": plot_id(plot_spec),
+        "clustering": clustering_info,
+        "research_summary": {
+            "total_samples": len(df),
+            "risk_distribution": summarize_risk_distribution(risk_table)
+        }
+    }
+    results["memory"] = {"dtype": options['dtype'], "intake_bytes": intake_memory(df)}
+    if options['include_pca']:
+        results["pca_coordinates"] = pca_coordinates(plot_spec)
+    if aggregation is not None:
+        results["aggregation"] = aggregation
+    # The full table is kept server-side for paging and drill-down queries
+    table = country_table(risk_table, clusters)
+    if options['compact']:
+        # Rows refer to lookups by index
+        results["country_analyses"] = country_page(table)
+        results["population_clusters"] = compact_clusters(cluster_descriptions)
+        results["lookups"] = compact_lookups(table)
+    results["country_table"] = encode_country_table(table)
+    results["country_table_id"] = country_table_id(results["country_table"])
+
+    results["plot_spec"] = encode_plot_spec(plot_spec)
+    return results
+
+
+def stream_results(stats):
+    """Global, food source and pattern sections from analyze_stream()-style statistics"""
+    columns = stats['columns']
+
+    food_averages = sorted(
+        [(FOOD_SOURCE_INFO[col]['name'], mean) for col, mean in zip(columns, stats['means'].tolist())],
+        key=lambda x: x[1], reverse=True
+    )
+    global_insights = {
+        'total_countries': stats['row_count'],
+        'global_avg_intake': float(round(stats['global_avg_intake'], 1)),
+        'highest_risk_country': stats['highest_risk_country'] or 'Unknown',
+        'lowest_risk_country': stats['lowest_risk_country'] or 'Unknown',
+        'most_problematic_food': food_averages[0][0],
+        'safest_food': food_averages[-1][0]
+    }
+
+    food_source_analysis = [
+        describe_food_source(col, stats['means'][j], stats['maximums'][j], stats['minimums'][j], stats['above_p75'][j])
+        for j, col in enumerate(columns)
+    ]
+    food_source_analysis.sort(key=lambda x: x['global_average'], reverse=True)
+
+    rules = association_rules(stats['itemsets'].frequent_itemsets(MIN_SUPPORT), MIN_CONFIDENCE)
+
+    return {
+        "global_insights": global_insights,
+        "country_analyses": [],
+        "population_clusters": [],
+        "food_source_analysis": food_source_analysis,
+        "consumption_patterns": describe_rules(rules, columns),
+        "research_summary": {
+            "total_samples": stats['row_count'],
+            "risk_distribution": risk_distribution(stats['risk_counts'])
+        },
+        "quantile_estimates": quantile_estimates(stats)
+    }
+
+
+def quantile_estimates(stats):
+    """Error bounds of the sketched medians and 75th percentiles behind the streamed outputs"""
+    error = rank_error(stats['sketch_k'])
+    # Samples on either side of a threshold within its rank error may be counted on the wrong side
+    count_error = int(np.ceil(error * stats['row_count']))
+    foods = []
+    for j, col in enumerate(stats['columns']):
+        foods.append({
+            'food_source': FOOD_SOURCE_INFO[col]['name'],
+            'median': float(round(stats['medians'][j], 2)),
+            'median_range': [float(round(bound, 2)) for bound in stats['quantile_bounds'][0.5][j]],
+            'percentile_75': float(round(stats['percentile_75'][j], 2)),
+            'percentile_75_range': [float(round(bound, 2)) for bound in stats['quantile_bounds'][0.75][j]],
+            'countries_at_risk_error': count_error
+        })
+    return {
+        'method': 'kll_sketch',
+        'sketch_k': stats['sketch_k'],
+        'rank_error': round(error, 5),
+        'foods': foods
+    }
+
+
+def sketch_size(options):
+    """Quantile sketch size for the requested sketch_error, or the default size"""
+    return sketch_k(options['sketch_error']) if options and options.get('sketch_error') else SKETCH_K
+
+
+def analyze_streaming(file, options=None):
+    """Analyze an upload in bounded memory by streaming it in chunks.
+
+    Per-sample outputs (country list, clusters, plot) need the whole dataset in memory,
+    so streaming mode returns the global, food source and pattern sections only.
+    Percentiles come from mergeable quantile sketches; 'quantile_estimates' reports
+    their error bounds.
+    """
+    stats = analyze_stream(file, list(FOOD_SOURCE_INFO), RISK_BINS, STREAMING_CHUNK_ROWS, sketch_size(options))
+    results = stream_results(stats)
+    results["ingestion"] = {
+        "mode": "streaming",
+        "format": stats['format'],
+        "chunk_rows": stats['chunk_rows'],
+        "chunks": stats['chunk_count']
+    }
+    return results
+
+
+def analyze_partitioned(paths, options=None, workers=None):
+    """Analyze a dataset split across several files as one, streaming each on a worker process.
+
+    Returns the same sections as analyze_streaming(), from merged per-file statistics.
+    """
+    try:
+        stats = analyze_partitions(paths, list(FOOD_SOURCE_INFO), RISK_BINS, STREAMING_CHUNK_ROWS,
+                                   sketch_size(options), workers)
+    except ImportError as e:
+        raise AnalysisInputError(str(e))
+    results = stream_results(stats)
+    results["ingestion"] = {
+        "mode": "partitioned",
+        "partitions": len(paths),
+        "chunk_rows": stats['chunk_rows'],
+        "chunks": stats['chunk_count']
+    }
+    return results
+
+
+def analyze_csv(file, options=None, report_stage=None, search_workers=None):
+    """Analyze an upload path or file object with the given analysis options.
+
+    Besides CSV, uploads may be gzip/zstd-compressed CSV, Parquet or Arrow IPC/Feather,
+    recognized by their leading bytes.
+    """
+    report_stage = report_stage or (lambda stage: None)
+    options = options or analysis_options({})
+    if isinstance(file, (str, os.PathLike)):
+        # A real file lets columnar formats be memory-mapped instead of read
+        with open(file, 'rb') as f:
+            return analyze_csv(f, options, report_stage, search_workers)
+
+    report_stage(1)
+    try:
+        if options['mode'] == 'streaming':
+            # Very large uploads can be streamed in chunks instead of loaded whole
+            return analyze_streaming(file, options)
+        df = read_upload(file, dtype=options['dtype'])
+    except ImportError as e:
+        # Optional readers (pyarrow, zstandard) missing on this server
+        raise AnalysisInputError(str(e))
+    return run_analysis(df, report_stage, options, search_workers)
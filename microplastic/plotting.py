@@ -0,0 +1,122 @@
+# plotting.py - PCA cluster plot rendering with matplotlib's object-oriented Agg API
+
+import hashlib
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from sklearn.decomposition import PCA
+
+# Supported output formats and their content types
+PLOT_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp'
+}
+PLOT_DPI = 150
+PLOT_DPI_RANGE = (50, 300)
+CLUSTER_COLORS = ['green', 'orange', 'red']
+
+# Points are labelled with their country only on small plots; per-point annotations dominate render time
+PLOT_LABEL_LIMIT = 100
+
+
+def build_plot_spec(principal_components, cluster_positions, legend_labels, countries=None):
+    """Collect everything needed to draw the cluster plot later, as plain arrays.
+
+    cluster_positions gives, for every point, the index of its cluster in legend_labels.
+    """
+    return {
+        'pc1': np.asarray(principal_components[:, 0], dtype=np.float32),
+        'pc2': np.asarray(principal_components[:, 1], dtype=np.float32),
+        'cluster': np.asarray(cluster_positions, dtype=np.int16),
+        'legend': np.array(legend_labels, dtype=str),
+        'countries': np.array([str(country) for country in countries], dtype=str) if countries is not None else np.array([], dtype=str)
+    }
+
+
+def cluster_plot_spec(scaled_features, labels, cluster_descriptions, countries=None):
+    """Project the scaled features onto two principal components and build the cluster plot spec"""
+    principal_components = PCA(n_components=2).fit_transform(scaled_features)
+
+    # Plot series follow the order of cluster_descriptions
+    cluster_positions = np.zeros(int(labels.max()) + 1 if len(labels) else 0, dtype=np.int16)
+    for i, cluster_desc in enumerate(cluster_descriptions):
+        cluster_positions[cluster_desc['cluster_id']] = i
+    return build_plot_spec(
+        principal_components,
+        cluster_positions[labels],
+        [f"{desc['risk_category']} (n={desc['sample_count']})" for desc in cluster_descriptions],
+        countries
+    )
+
+
+def plot_id(spec):
+    """Content hash identifying a plot spec (used in its URL)"""
+    digest = hashlib.sha256()
+    for name in ('pc1', 'pc2', 'cluster', 'legend', 'countries'):
+        digest.update(name.encode('ascii'))
+        digest.update(np.ascontiguousarray(spec[name]).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def encode_plot_spec(spec):
+    """Serialize a plot spec to bytes (uncompressed .npz)"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **spec)
+    return buffer.getvalue()
+
+
+def decode_plot_spec(payload):
+    """Inverse of encode_plot_spec"""
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def pca_coordinates(spec):
+    """Raw PCA coordinates in columnar form so clients can draw the chart themselves"""
+    return {
+        'pc1': spec['pc1'].tolist(),
+        'pc2': spec['pc2'].tolist(),
+        'cluster': spec['cluster'].tolist(),
+        'legend': spec['legend'].tolist(),
+        'countries': spec['countries'].tolist()
+    }
+
+
+def render_cluster_plot(spec, fmt='png', dpi=PLOT_DPI):
+    """Render the PCA cluster scatter plot and return the encoded image bytes"""
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    pc1, pc2, cluster = spec['pc1'], spec['pc2'], spec['cluster']
+    point_count = len(pc1)
+    label_points = 0 < len(spec['countries']) and point_count <= PLOT_LABEL_LIMIT
+
+    # One scatter call per cluster; rasterize large point clouds so SVG output stays small
+    for i, legend_label in enumerate(spec['legend'].tolist()):
+        members = cluster == i
+        ax.scatter(pc1[members], pc2[members],
+                   c=CLUSTER_COLORS[i % len(CLUSTER_COLORS)],
+                   label=legend_label,
+                   s=120, alpha=0.7, edgecolors='black', linewidth=1,
+                   rasterized=point_count > PLOT_LABEL_LIMIT)
+
+    if label_points:
+        for country, x, y in zip(spec['countries'].tolist(), pc1.tolist(), pc2.tolist()):
+            ax.annotate(country, (x, y),
+                        xytext=(5, 5), textcoords='offset points',
+                        fontsize=8, alpha=0.8)
+
+    ax.set_title('Global Microplastic Exposure Risk Analysis', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Dietary Pattern Component 1', fontsize=12)
+    ax.set_ylabel('Dietary Pattern Component 2', fontsize=12)
+    ax.legend(title='Population Risk Groups', title_fontsize=12, bbox_to_anchor=(1.05, 1))
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
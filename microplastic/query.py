@@ -0,0 +1,118 @@
+# query.py - Region and per-food sorted indexes over a country table for drill-down queries
+
+import numpy as np
+
+from .compact import ROW_COLUMNS, page_columns
+from .errors import AnalysisInputError
+
+# Numeric country table columns that can be ranged over or ranked besides the foods
+QUERY_TOTALS = ('total_intake', 'average_intake')
+
+
+def query_key(name):
+    """Normalized spelling of a food or column name: 'Bottled_Water_Intake' and 'bottled water' match"""
+    return str(name).strip().lower().replace('_', ' ').removesuffix(' intake')
+
+
+def build_index(table):
+    """Region -> row offsets and descending sorted orders of every food and total, for a country table.
+
+    Rows of region r are region_rows[region_offsets[r]:region_offsets[r + 1]], in table
+    order. Each key has a table-wide order and a region-major one whose slice for region r
+    lies at the same offsets, both highest first with ties in table order and NaN last, so a
+    value range, also within one region, is a slice found by binary search.
+    """
+    n_rows = len(table['country'])
+    if 'country_names' in table:
+        names, codes = table['country_names'], table['country']
+    else:
+        # Tables written before region codes hold the names themselves
+        names, codes = np.unique(table['country'], return_inverse=True)
+    region_rows = np.argsort(codes, kind='stable').astype(np.int32)
+    region_offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(names)))])
+
+    values = {name: table[name] for name in QUERY_TOTALS}
+    keys = {query_key(name): name for name in QUERY_TOTALS}
+    food_columns = table['food_columns'] if 'food_columns' in table else table['food_sources']
+    for j, (column, food) in enumerate(zip(food_columns.tolist(), table['food_sources'].tolist())):
+        values[food] = table['food_intake'][:, j]
+        keys[query_key(column)] = keys[query_key(food)] = food
+
+    orders = {}
+    sorted_values = {}
+    region_orders = {}
+    region_sorted = {}
+    for name, column in values.items():
+        # Ascending stable sorts of the negated values: highest first, ties in table order, NaN last
+        negated = -np.asarray(column, dtype=np.float64)
+        orders[name] = np.argsort(negated, kind='stable').astype(np.int32)
+        sorted_values[name] = negated[orders[name]]
+        # Regrouping the sorted order by region keeps each region's rows sorted
+        region_orders[name] = orders[name][np.argsort(codes[orders[name]], kind='stable')]
+        region_sorted[name] = negated[region_orders[name]]
+    return {
+        'rows': n_rows,
+        'regions': {str(name): code for code, name in enumerate(names.tolist())},
+        'region_rows': region_rows,
+        'region_offsets': region_offsets,
+        'keys': keys,
+        'orders': orders,
+        'sorted': sorted_values,
+        'region_orders': region_orders,
+        'region_sorted': region_sorted
+    }
+
+
+def value_range(negated, minimum=None, maximum=None):
+    """(start, stop) of the values within [minimum, maximum] in an ascending array of negated values"""
+    start = 0 if maximum is None else np.searchsorted(negated, -maximum, side='left')
+    stop = np.searchsorted(negated, np.inf if minimum is None else -minimum, side='right')
+    return int(start), int(max(start, stop))
+
+
+def query_rows(index, region=None, by=None, minimum=None, maximum=None, top=None):
+    """Table rows matching a region and/or a [minimum, maximum] range of `by`, best first.
+
+    Region lookups keep table order (highest total first); ranges and top-N come
+    highest `by` first, ties in table order. Returns (rows, name of the ranking key or None).
+    """
+    lower, upper = 0, index['rows']
+    if region is not None:
+        code = index['regions'].get(region)
+        if code is None:
+            return np.empty(0, dtype=np.int32), None
+        lower, upper = int(index['region_offsets'][code]), int(index['region_offsets'][code + 1])
+    if by is None:
+        rows = np.arange(index['rows']) if region is None else index['region_rows'][lower:upper]
+        return (rows[:top] if top is not None else rows), None
+
+    name = index['keys'].get(query_key(by))
+    if name is None:
+        raise AnalysisInputError(f"Unknown query key '{by}' (choose from {', '.join(index['orders'])})")
+    if region is None:
+        order, values = index['orders'][name], index['sorted'][name]
+    else:
+        # The region's slice of the region-major order, itself sorted by the key
+        order = index['region_orders'][name][lower:upper]
+        values = index['region_sorted'][name][lower:upper]
+    start, stop = value_range(values, minimum, maximum)
+    ranked = order[start:stop]
+    return (ranked[:top] if top is not None else ranked), name
+
+
+def query_table(table, index, region=None, by=None, minimum=None, maximum=None, top=None, offset=0, limit=100,
+                columns=ROW_COLUMNS):
+    """One page of the rows matching a query, as columnar arrays like country_page()"""
+    rows, name = query_rows(index, region, by, minimum, maximum, top)
+    return {
+        'total': index['rows'],
+        'matched': int(len(rows)),
+        'offset': offset,
+        'limit': limit,
+        'region': region,
+        'by': name,
+        'min': minimum,
+        'max': maximum,
+        'top': top,
+        'columns': page_columns(table, rows[offset:offset + limit], columns)
+    }
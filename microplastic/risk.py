@@ -0,0 +1,159 @@
+# risk.py - Per-sample risk levels and the country/region analysis
+
+import numpy as np
+
+from .constants import FOOD_SOURCE_INFO, HEALTH_THRESHOLDS, RISK_BINS, RISK_COLORS, RISK_LEVELS, RISK_RECOMMENDATIONS
+from .intake import region_lookup, region_names
+
+
+def get_risk_level(value):
+    """Determine risk level based on microplastic intake value"""
+    if value < HEALTH_THRESHOLDS['low']:
+        return 'Low', 'green'
+    elif value < HEALTH_THRESHOLDS['moderate']:
+        return 'Moderate', 'orange'
+    elif value < HEALTH_THRESHOLDS['high']:
+        return 'High', 'red'
+    else:
+        return 'Very High', 'darkred'
+
+
+def risk_level_codes(values):
+    """Vectorized get_risk_level: map intake values to indexes into RISK_LEVELS/RISK_COLORS"""
+    return np.digitize(values, RISK_BINS)
+
+
+def round_intake(values, ndigits=1):
+    """Vectorized round() matching Python's correctly-rounded float semantics"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+
+    # np.round can land on the other side of a .5 boundary; defer those few values to round()
+    scaled = values * 10.0 ** ndigits
+    distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    near_half = np.flatnonzero(distance <= 1e-9 * np.maximum(np.abs(scaled), 1.0))
+    flat_rounded = rounded.reshape(-1)
+    flat_values = values.reshape(-1)
+    for i in near_half.tolist():
+        flat_rounded[i] = round(float(flat_values[i]), ndigits)
+    return rounded
+
+
+def compute_risk_table(df, statistics=None):
+    """Compute per-sample totals, averages and risk levels for every row at once
+
+    statistics, from column_statistics() over the numeric columns, saves converting and
+    summing the intake columns again. Blank cells count as zero intake in the totals, as
+    in streaming mode, so a sample with a missing column is still ranked by the rest.
+    """
+    numeric_df = df.select_dtypes(include=['number'])
+    food_columns = [col for col in numeric_df.columns if col in FOOD_SOURCE_INFO]
+
+    if statistics is not None and food_columns == statistics['columns']:
+        values = statistics['values']
+        totals = statistics['totals']
+    else:
+        values = numeric_df[food_columns].to_numpy(dtype=np.float64)
+        # Accumulate column by column so totals match a left-to-right sum() exactly
+        totals = np.zeros(len(df))
+        for j in range(len(food_columns)):
+            column = values[:, j]
+            totals = totals + np.where(np.isnan(column), 0.0, column)
+    if not food_columns:
+        raise ValueError("No food intake columns found in CSV for analysis")
+    averages = totals / len(food_columns)
+
+    sample_ids = np.asarray(df.index) + 1
+    if 'Region' in df.columns:
+        country_codes, country_names = region_lookup(df['Region'])
+    else:
+        country_codes = np.arange(len(df), dtype=np.int32)
+        country_names = [f'Sample {idx}' for idx in sample_ids.tolist()]
+
+    return {
+        'food_columns': food_columns,
+        'values': values,
+        'totals': totals,
+        'averages': averages,
+        'risk_codes': risk_level_codes(averages),
+        # Per-row names share one object per region; the codes index country_names
+        'countries': region_names(country_codes, country_names),
+        'country_codes': country_codes,
+        'country_names': country_names,
+        'sample_ids': sample_ids
+    }
+
+
+def analyze_country_risk(country_data):
+    """Analyze risk level for a specific country/region"""
+    food_values = [country_data[col] for col in country_data.index if col in FOOD_SOURCE_INFO]
+    total_intake = sum(food_values)
+    avg_intake = total_intake / len(food_values)
+
+    code = int(risk_level_codes(avg_intake))
+    return {
+        'average_intake': round(avg_intake, 1),
+        'total_intake': round(total_intake, 1),
+        'risk_level': RISK_LEVELS[code],
+        'color': RISK_COLORS[code],
+        'recommendations': RISK_RECOMMENDATIONS[code]
+    }
+
+
+def build_country_analyses(risk_table):
+    """Build the per-country analysis list, sorted by total intake (highest first)"""
+    food_names = np.array([FOOD_SOURCE_INFO[col]['name'] for col in risk_table['food_columns']], dtype=object)
+    food_levels = round_intake(risk_table['values'])
+    food_codes = risk_level_codes(risk_table['values'])
+
+    # Stable descending sorts reproduce sorted(..., reverse=True) tie ordering
+    breakdown_order = np.argsort(-food_levels, axis=1, kind='stable')
+    sorted_names = food_names[breakdown_order].tolist()
+    sorted_levels = np.take_along_axis(food_levels, breakdown_order, axis=1).tolist()
+    sorted_codes = np.take_along_axis(food_codes, breakdown_order, axis=1).tolist()
+
+    total_rounded = round_intake(risk_table['totals'])
+    average_rounded = round_intake(risk_table['averages']).tolist()
+    risk_codes = risk_table['risk_codes'].tolist()
+    countries = risk_table['countries']
+    sample_ids = risk_table['sample_ids'].tolist()
+    row_order = np.argsort(-total_rounded, kind='stable').tolist()
+    total_rounded = total_rounded.tolist()
+
+    country_analyses = []
+    for i in row_order:
+        code = risk_codes[i]
+        country_analyses.append({
+            'average_intake': average_rounded[i],
+            'total_intake': total_rounded[i],
+            'risk_level': RISK_LEVELS[code],
+            'color': RISK_COLORS[code],
+            'recommendations': RISK_RECOMMENDATIONS[code],
+            'country': countries[i],
+            'sample_id': sample_ids[i],
+            'food_breakdown': [
+                {
+                    'food_source': name,
+                    'intake_level': level,
+                    'risk_level': RISK_LEVELS[food_code],
+                    'color': RISK_COLORS[food_code]
+                }
+                for name, level, food_code in zip(sorted_names[i], sorted_levels[i], sorted_codes[i])
+            ]
+        })
+
+    return country_analyses
+
+
+def summarize_risk_distribution(risk_table):
+    """Count samples per risk group for the research summary"""
+    return risk_distribution(np.bincount(risk_table['risk_codes'], minlength=len(RISK_LEVELS)))
+
+
+def risk_distribution(counts):
+    """Group per-level sample counts (indexed like RISK_LEVELS) into the summary buckets"""
+    return {
+        "high_risk": int(counts[2] + counts[3]),
+        "moderate_risk": int(counts[1]),
+        "low_risk": int(counts[0])
+    }
@@ -0,0 +1,57 @@
+# stats.py - Fused per-column descriptive statistics shared by the analysis stages
+
+import numpy as np
+
+# Quantiles taken from a single partition of each column: minimum, median, 75th percentile, maximum
+STAT_QUANTILES = (0.0, 0.5, 0.75, 1.0)
+
+
+def column_statistics(numeric_df):
+    """Mean, min, max, median, p75, count above p75 and row totals for every numeric column at once.
+
+    The columns are read as one contiguous column-major float array (a view when the
+    frame is in intake_frame() layout, float32 kept as is); one partition per column then
+    yields the extremes and both quantiles, matching pandas' mean(), min(), max(),
+    median() and quantile(0.75) (NaNs skipped). Sums accumulate in float64. Computed
+    once per analysis and passed to every stage that needs these figures.
+    """
+    columns = numeric_df.columns.tolist()
+    values = numeric_df.to_numpy()
+    if values.dtype not in (np.float32, np.float64):
+        values = values.astype(np.float64)
+    # Row j is column j, contiguous, so each reduction below streams through memory once
+    by_column = np.ascontiguousarray(values.T)
+    missing = np.isnan(by_column)
+    has_missing = bool(missing.any())
+    counts = by_column.shape[1] - missing.sum(axis=1) if has_missing else np.full(len(columns), by_column.shape[1])
+
+    if by_column.shape[1] == 0:
+        quantiles = np.full((len(STAT_QUANTILES), len(columns)), np.nan)
+        means = np.full(len(columns), np.nan)
+    elif has_missing:
+        quantiles = np.nanquantile(by_column, STAT_QUANTILES, axis=1)
+        means = np.nansum(by_column, axis=1, dtype=np.float64) / counts
+    else:
+        quantiles = np.quantile(by_column, STAT_QUANTILES, axis=1)
+        means = by_column.sum(axis=1, dtype=np.float64) / counts
+    # Reported in float64 whatever the matrix width, so rounding them matches Python floats
+    minimums, medians, p75, maximums = np.asarray(quantiles, dtype=np.float64)
+
+    # Accumulate column by column so totals match a left-to-right sum() exactly
+    totals = np.zeros(len(values))
+    for row in (np.where(missing, 0.0, by_column) if has_missing else by_column):
+        totals = totals + row
+
+    return {
+        'columns': columns,
+        'values': values,
+        'count': counts,
+        'mean': means,
+        'min': minimums,
+        'max': maximums,
+        'median': medians,
+        'p75': p75,
+        'above_p75': (by_column > p75[:, None]).sum(axis=1),
+        'totals': totals
+    }
+
@@ -0,0 +1,504 @@
+# store.py - Persistent datasets grown by appended uploads, with incrementally maintained statistics
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import optional_float
+from .association import ItemsetCounter
+from .clustering import REFIT_PASSES, REFIT_TOLERANCE, OnlineClusters, describe_cluster
+from .compact import CLUSTER_TOP_COUNTRIES, COUNTRY_PAGE_SIZE
+from .constants import FOOD_SOURCE_INFO, MAX_CLUSTERS, RISK_BINS
+from .errors import AnalysisInputError
+from .formats import detect_format
+from .pipeline import stream_results
+from .query import build_index, query_table
+from .streaming import STREAMING_CHUNK_ROWS, RunningStats, intake_columns, read_intake_chunks, stream_summary
+
+DATASET_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]{0,63}')
+# Batches are stored exactly as uploaded, named by their detected format
+BATCH_EXTENSIONS = {
+    'csv': '.csv',
+    'gzip': '.csv.gz',
+    'zstd': '.csv.zst',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'arrow_stream': '.arrows',
+    'feather_v1': '.feather'
+}
+# Region table columns in query() pages
+REGION_QUERY_COLUMNS = ('country', 'sample_count', 'total_intake', 'average_intake', 'food_intake')
+
+
+def dataset_directory(root, name):
+    """Directory of a named dataset under root; names are restricted so they cannot escape it"""
+    if not DATASET_NAME.fullmatch(name):
+        raise AnalysisInputError(f"Invalid dataset name '{name}' (letters, digits, '.', '_' and '-', up to 64 characters)")
+    return os.path.join(root, name)
+
+
+class RegionStats:
+    """Per-region sample counts and per-column count, sum, sum of squares, min and max"""
+
+    def __init__(self, columns):
+        n_columns = len(columns)
+        self.columns = list(columns)
+        self.regions = {}
+        self.sample_counts = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros((0, n_columns), dtype=np.int64)
+        self.sums = np.zeros((0, n_columns))
+        self.sums_of_squares = np.zeros((0, n_columns))
+        self.minimums = np.zeros((0, n_columns))
+        self.maximums = np.zeros((0, n_columns))
+
+    def _rows(self, names):
+        """Row of each region, adding rows for regions not seen before"""
+        new = [name for name in names if name not in self.regions]
+        if new:
+            n_new, n_columns = len(new), len(self.columns)
+            for name in new:
+                self.regions[name] = len(self.regions)
+            self.sample_counts = np.concatenate([self.sample_counts, np.zeros(n_new, dtype=np.int64)])
+            self.counts = np.vstack([self.counts, np.zeros((n_new, n_columns), dtype=np.int64)])
+            self.sums = np.vstack([self.sums, np.zeros((n_new, n_columns))])
+            self.sums_of_squares = np.vstack([self.sums_of_squares, np.zeros((n_new, n_columns))])
+            self.minimums = np.vstack([self.minimums, np.full((n_new, n_columns), np.inf)])
+            self.maximums = np.vstack([self.maximums, np.full((n_new, n_columns), -np.inf)])
+        return [self.regions[name] for name in names]
+
+    @staticmethod
+    def _codes(regions, rows):
+        """Per-row codes into the returned region names; missing regions are 'Unknown'"""
+        if regions is None:
+            return np.zeros(rows, dtype=np.int64), ['Unknown']
+        codes = regions.cat.codes.to_numpy()
+        names = [str(name) for name in regions.cat.categories] + ['Unknown']
+        return np.where(codes < 0, len(names) - 1, codes), names
+
+    def lookup(self, regions, rows):
+        """Row of every sample's region (regions already added by update())"""
+        codes, names = self._codes(regions, rows)
+        present = np.unique(codes)
+        index = np.zeros(len(names), dtype=np.int64)
+        index[present] = [self.regions[names[code]] for code in present.tolist()]
+        return index[codes]
+
+    def update(self, regions, values):
+        """Add one chunk of values with its categorical Region labels (or None: all 'Unknown')"""
+        codes, names = self._codes(regions, len(values))
+
+        # One grouped pass over the chunk, regions in order of first appearance
+        frame = pd.DataFrame(values.astype(np.float64))
+        grouped = frame.groupby(codes, sort=False)
+        stats = grouped.agg(['count', 'sum', 'min', 'max'])
+        squares = (frame ** 2).groupby(codes, sort=False).sum()
+        rows = self._rows([names[code] for code in stats.index])
+
+        self.sample_counts[rows] += grouped.size().to_numpy()
+        self.counts[rows] += stats.xs('count', axis=1, level=1).to_numpy()
+        self.sums[rows] += stats.xs('sum', axis=1, level=1).to_numpy()
+        self.sums_of_squares[rows] += squares.to_numpy()
+        self.minimums[rows] = np.fmin(self.minimums[rows], stats.xs('min', axis=1, level=1).to_numpy())
+        self.maximums[rows] = np.fmax(self.maximums[rows], stats.xs('max', axis=1, level=1).to_numpy())
+
+    def summary(self):
+        """Per-region sample count and per-food count, mean, standard deviation, min and max"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums / self.counts
+            stds = np.sqrt(np.maximum(self.sums_of_squares / self.counts - means ** 2, 0))
+        food_names = [FOOD_SOURCE_INFO[col]['name'] for col in self.columns]
+        return [
+            {
+                'country': region,
+                'sample_count': int(self.sample_counts[i]),
+                'foods': {
+                    name: {
+                        'count': int(self.counts[i, j]),
+                        'mean': optional_float(means[i, j]),
+                        'std': optional_float(stds[i, j]),
+                        'min': optional_float(self.minimums[i, j]) if self.counts[i, j] else None,
+                        'max': optional_float(self.maximums[i, j]) if self.counts[i, j] else None
+                    }
+                    for j, name in enumerate(food_names)
+                }
+            }
+            for region, i in self.regions.items()
+        ]
+
+    def table(self):
+        """One row per region in country table form, highest total mean intake first.
+
+        food_intake holds each food's mean, total_intake their sum and average_intake
+        their mean (rounded to 0.1 as in results()), so a region table can be indexed and
+        queried like a country table.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums / self.counts
+        # Regions without samples of any food have no total, and sort last
+        totals = np.where(self.counts.any(axis=1), np.nansum(means, axis=1), np.nan)
+        averages = totals / np.maximum((self.counts > 0).sum(axis=1), 1)
+        rows = np.argsort(-totals, kind='stable')
+        return {
+            'country': np.arange(len(rows), dtype=np.int32),
+            'country_names': np.array(list(self.regions), dtype=str)[rows],
+            'sample_count': self.sample_counts[rows],
+            'total_intake': np.round(totals[rows], 1),
+            'average_intake': np.round(averages[rows], 1),
+            'food_intake': np.round(means[rows], 1),
+            'food_sources': np.array([FOOD_SOURCE_INFO[col]['name'] for col in self.columns]),
+            'food_columns': np.array(self.columns)
+        }
+
+    def state(self):
+        """JSON-serializable snapshot"""
+        return {
+            'columns': self.columns,
+            'regions': list(self.regions),
+            'sample_counts': self.sample_counts.tolist(),
+            'counts': self.counts.tolist(),
+            'sums': self.sums.tolist(),
+            'sums_of_squares': self.sums_of_squares.tolist(),
+            'minimums': self.minimums.tolist(),
+            'maximums': self.maximums.tolist()
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Inverse of state()"""
+        stats = cls(state['columns'])
+        n_columns = len(stats.columns)
+        stats.regions = {name: i for i, name in enumerate(state['regions'])}
+        stats.sample_counts = np.asarray(state['sample_counts'], dtype=np.int64)
+        stats.counts = np.asarray(state['counts'], dtype=np.int64).reshape(-1, n_columns)
+        for name in ('sums', 'sums_of_squares', 'minimums', 'maximums'):
+            setattr(stats, name, np.asarray(state[name], dtype=np.float64).reshape(-1, n_columns))
+        return stats
+
+
+class DatasetStore:
+    """A dataset on disk: the upload batches appended to it and running statistics over all of them.
+
+    An append reads only the new batch (in chunks, twice) and saves the updated statistics,
+    so results are served without re-reading history. The itemset and above-75th-percentile
+    counts of each batch are taken against the medians and percentiles current when it was
+    appended; recompute() re-reads every batch to make them exact again. Population
+    clusters are kept as online k-means centroids with stable ids. A lock file
+    serializes writers across threads and worker processes.
+    """
+
+    def __init__(self, directory, chunk_rows=STREAMING_CHUNK_ROWS):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.name = os.path.basename(os.path.normpath(directory))
+        self.batch_dir = os.path.join(directory, 'batches')
+        self.state_path = os.path.join(directory, 'state.json')
+        self._state = None
+        self._state_stamp = None
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    @contextmanager
+    def _locked(self, exclusive=True):
+        """Hold the dataset's file lock, with the in-memory state reloaded if another process changed it"""
+        os.makedirs(self.batch_dir, exist_ok=True)
+        with open(os.path.join(self.directory, 'lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._reload()
+                yield self._state
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            self._state, self._state_stamp = self._empty_state(), None
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._state_stamp:
+            return
+        with open(self.state_path) as f:
+            saved = json.load(f)
+        self._state = {
+            'columns': saved['columns'],
+            'stats': RunningStats.from_state(saved['stats']),
+            'regions': RegionStats.from_state(saved['regions']),
+            'itemsets': ItemsetCounter.from_state(saved['itemsets']),
+            'above_p75': np.asarray(saved['above_p75'], dtype=np.int64),
+            'clusters': OnlineClusters.from_state(saved['clusters']),
+            'cluster_regions': np.asarray(saved['cluster_regions'], dtype=np.int64).reshape(saved['clusters']['n_clusters'], -1),
+            'pending_regions': np.asarray(saved.get('pending_regions', []), dtype=np.int64),
+            'batches': saved['batches'],
+            'appends_since_recompute': saved['appends_since_recompute'],
+            'recomputed_at': saved['recomputed_at'],
+            'updated_at': saved['updated_at']
+        }
+        self._state_stamp = stamp
+
+    @staticmethod
+    def _empty_state(columns=None):
+        return {
+            'columns': columns,
+            'stats': RunningStats(columns, RISK_BINS) if columns else None,
+            'regions': RegionStats(columns) if columns else None,
+            'itemsets': ItemsetCounter(len(columns)) if columns else None,
+            'above_p75': np.zeros(len(columns), dtype=np.int64) if columns else None,
+            'clusters': OnlineClusters(),
+            # Samples of each region assigned to each cluster (clusters x regions)
+            'cluster_regions': np.zeros((MAX_CLUSTERS, 0), dtype=np.int64),
+            # Region rows of the samples waiting for the first cluster fit
+            'pending_regions': np.empty(0, dtype=np.int64),
+            'batches': [],
+            'appends_since_recompute': 0,
+            'recomputed_at': None,
+            'updated_at': None
+        }
+
+    def _save(self):
+        state = self._state
+        state['updated_at'] = time.time()
+        saved = {
+            'columns': state['columns'],
+            'stats': state['stats'].state(),
+            'regions': state['regions'].state(),
+            'itemsets': state['itemsets'].state(),
+            'above_p75': state['above_p75'].tolist(),
+            'clusters': state['clusters'].state(),
+            'cluster_regions': state['cluster_regions'].tolist(),
+            'pending_regions': state['pending_regions'].tolist(),
+            'batches': state['batches'],
+            'appends_since_recompute': state['appends_since_recompute'],
+            'recomputed_at': state['recomputed_at'],
+            'updated_at': state['updated_at']
+        }
+        # Write to a temp file first so readers never see a partial state
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(saved, f)
+        os.replace(tmp_path, self.state_path)
+        stat = os.stat(self.state_path)
+        self._state_stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def _read_batches(self, batches):
+        """(regions, values) chunks of stored batches, in the dataset's column order"""
+        for batch in batches:
+            with open(os.path.join(self.batch_dir, batch['file']), 'rb') as f:
+                yield from read_intake_chunks(f, batch['format'], self._state['columns'], batch['has_region'], self.chunk_rows)
+
+    def _count_cluster_regions(self, region_rows, labels):
+        """Add samples, given their region rows, to the clusters x regions counts"""
+        state = self._state
+        counts = state['cluster_regions']
+        n_regions = len(state['regions'].regions)
+        if counts.shape[1] < n_regions:
+            counts = np.hstack([counts, np.zeros((len(counts), n_regions - counts.shape[1]), dtype=np.int64)])
+        counts += np.bincount(labels * n_regions + region_rows, minlength=counts.size).reshape(counts.shape)
+        state['cluster_regions'] = counts
+
+    def _accumulate(self, batches, update_clusters=True):
+        """Both passes of analyze_stream() over batches, added to the current state.
+
+        With update_clusters, the second pass also moves the online centroids towards each chunk.
+        """
+        state = self._state
+        rows = 0
+        for regions, values in self._read_batches(batches):
+            state['stats'].update(regions, values)
+            state['regions'].update(regions, values)
+            rows += len(values)
+
+        stats = state['stats']
+        medians = stats.quantiles(0.5)
+        percentile_75 = stats.quantiles(0.75)
+        means, stds = stats.means(), stats.stds()
+        for regions, values in self._read_batches(batches):
+            state['itemsets'].update(values > medians)
+            state['above_p75'] += (values > percentile_75).sum(axis=0)
+            if update_clusters:
+                self._update_clusters(regions, values, means, stds)
+        return rows
+
+    def _update_clusters(self, regions, values, means, stds):
+        """Move the online centroids towards a chunk and count its samples' regions per cluster"""
+        state = self._state
+        region_rows = state['regions'].lookup(regions, len(values))
+        if not state['clusters'].fitted:
+            # Rows held back until the first fit are labelled by it, ahead of this chunk
+            region_rows = np.concatenate([state['pending_regions'], region_rows])
+        labels = state['clusters'].update(values, means, stds)
+        if labels is None:
+            state['pending_regions'] = region_rows
+        else:
+            state['pending_regions'] = np.empty(0, dtype=np.int64)
+            self._count_cluster_regions(region_rows, labels)
+
+    def _refit_clusters(self, batches):
+        """Lloyd passes over every batch, starting from the saved centroids so cluster ids are kept"""
+        state = self._state
+        clusters = state['clusters']
+        means, stds = state['stats'].means(), state['stats'].stds()
+        if not clusters.fitted:
+            for regions, values in self._read_batches(batches):
+                self._update_clusters(regions, values, means, stds)
+                if clusters.fitted:
+                    break
+            if not clusters.fitted:
+                return
+        for _ in range(REFIT_PASSES):
+            clusters.start_pass()
+            state['cluster_regions'] = np.zeros((clusters.n_clusters, 0), dtype=np.int64)
+            for regions, values in self._read_batches(batches):
+                labels = clusters.add(values, means, stds)
+                self._count_cluster_regions(state['regions'].lookup(regions, len(values)), labels)
+            if clusters.finish_pass(stds) < REFIT_TOLERANCE:
+                break
+
+    def append(self, file):
+        """Store an upload as a new batch and fold it into the running statistics"""
+        file_format = detect_format(file)
+        columns, has_region = intake_columns(file, file_format, list(FOOD_SOURCE_INFO))
+        if not columns:
+            raise AnalysisInputError("No food intake columns found in the upload")
+
+        with self._locked() as state:
+            if state['columns'] is None:
+                self._state = state = self._empty_state(columns)
+            elif set(columns) != set(state['columns']):
+                raise AnalysisInputError(f"Uploads to dataset '{self.name}' must have the columns {', '.join(state['columns'])}")
+
+            batch = {
+                'file': f"{len(state['batches']) + 1:06d}{BATCH_EXTENSIONS[file_format]}",
+                'format': file_format,
+                'has_region': has_region,
+                'appended_at': time.time()
+            }
+            path = os.path.join(self.batch_dir, batch['file'])
+            file.seek(0)
+            with open(path, 'wb') as out:
+                shutil.copyfileobj(file, out)
+            try:
+                batch['rows'] = self._accumulate([batch])
+            except Exception:
+                # Drop the half-applied batch and fall back to the saved state
+                os.remove(path)
+                self._state_stamp = None
+                raise
+
+            state['batches'].append(batch)
+            state['appends_since_recompute'] += 1
+            self._save()
+            return dict(batch)
+
+    def recompute(self):
+        """Rebuild every statistic from all stored batches, with exact itemset and percentile counts.
+
+        Clusters are refitted over all samples starting from the current centroids.
+        """
+        with self._locked() as state:
+            if state['columns'] is None:
+                raise AnalysisInputError(f"Dataset '{self.name}' has no samples yet")
+            batches = state['batches']
+            self._state = self._empty_state(state['columns'])
+            self._state['batches'] = batches
+            if state['clusters'].fitted:
+                # Pending rows are re-read from the batches, so an unfitted model starts over
+                self._state['clusters'] = state['clusters']
+            try:
+                self._accumulate(batches, update_clusters=False)
+                self._refit_clusters(batches)
+            except Exception:
+                self._state_stamp = None
+                raise
+            self._state['recomputed_at'] = time.time()
+            self._save()
+
+    def query(self, region=None, by=None, minimum=None, maximum=None, top=None, offset=0, limit=COUNTRY_PAGE_SIZE):
+        """One page of the dataset's regions matching a drill-down query, ranged over per-region food means.
+
+        Built from the saved per-region statistics (see RegionStats.table()), so no batch is re-read.
+        """
+        with self._locked(exclusive=False) as state:
+            if state['columns'] is None:
+                raise AnalysisInputError(f"Dataset '{self.name}' has no samples yet")
+            table = state['regions'].table()
+        page = query_table(table, build_index(table), region, by, minimum, maximum, top, offset, limit,
+                           REGION_QUERY_COLUMNS)
+        page['food_sources'] = table['food_sources']
+        return page
+
+    def results(self):
+        """Global, food source and pattern sections plus per-food and per-region statistics, from the saved state"""
+        with self._locked(exclusive=False) as state:
+            if state['columns'] is None:
+                raise AnalysisInputError(f"Dataset '{self.name}' has no samples yet")
+            stats = state['stats']
+            results = stream_results(stream_summary(stats, state['itemsets'], state['above_p75']))
+
+            medians = stats.quantiles(0.5)
+            percentile_75 = stats.quantiles(0.75)
+            means = stats.means()
+            stds = stats.stds()
+            results["dataset"] = {
+                "name": self.name,
+                "rows": stats.row_count,
+                "batches": len(state['batches']),
+                "last_batch": state['batches'][-1] if state['batches'] else None,
+                "columns": state['columns'],
+                # Non-zero: itemset and percentile counts are approximate until the next recompute
+                "appends_since_recompute": state['appends_since_recompute'],
+                "recomputed_at": state['recomputed_at'],
+                "updated_at": state['updated_at'],
+                "food_statistics": {
+                    FOOD_SOURCE_INFO[col]['name']: {
+                        'count': int(stats.counts[j]),
+                        'mean': optional_float(means[j]),
+                        'std': optional_float(stds[j]),
+                        'min': optional_float(stats.minimums[j]) if stats.counts[j] else None,
+                        'max': optional_float(stats.maximums[j]) if stats.counts[j] else None,
+                        'median': optional_float(medians[j]),
+                        'percentile_75': optional_float(percentile_75[j])
+                    }
+                    for j, col in enumerate(state['columns'])
+                },
+                "regions": state['regions'].summary()
+            }
+            results["population_clusters"] = self._cluster_descriptions()
+            results["clustering"] = {
+                "backend": "online",
+                "n_clusters": state['clusters'].n_clusters,
+                "fitted": state['clusters'].fitted,
+                "rows": int(state['clusters'].counts.sum()),
+                "pending_rows": state['clusters'].pending_rows,
+                "refit_passes": state['clusters'].refit_passes
+            }
+            return results
+
+    def _cluster_descriptions(self):
+        """Cluster cards from the centroids, naming the regions with most samples in each"""
+        state = self._state
+        clusters = state['clusters']
+        if not clusters.fitted:
+            return []
+        regions = list(state['regions'].regions)
+        food_names = [FOOD_SOURCE_INFO[col]['name'] for col in state['columns']]
+        descriptions = []
+        for cluster_id, centroid in enumerate(clusters.centroids):
+            region_counts = state['cluster_regions'][cluster_id]
+            members = np.flatnonzero(region_counts)
+            members = members[np.argsort(-region_counts[members], kind='stable')]
+            description = describe_cluster(cluster_id, float(centroid.sum()), clusters.counts[cluster_id])
+            description['centroid'] = {name: optional_float(value) for name, value in zip(food_names, centroid)}
+            description['top_countries'] = [regions[i] for i in members[:CLUSTER_TOP_COUNTRIES].tolist()]
+            description['country_count'] = len(members)
+            descriptions.append(description)
+        return descriptions
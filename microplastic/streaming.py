@@ -0,0 +1,295 @@
+# streaming.py - Chunked two-pass ingestion for very large intake uploads
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .association import ItemsetCounter
+from .formats import detect_format, iter_upload_chunks, upload_columns
+from .sketches import SKETCH_K, QuantileSketch
+
+# Rows read per chunk; peak memory follows this rather than the file size
+STREAMING_CHUNK_ROWS = 100000
+
+
+def intake_columns(file, file_format, food_columns):
+    """Return the food columns present in the upload (in file order) and whether it has a Region column"""
+    header = upload_columns(file, file_format)
+    return [col for col in header if col in food_columns], 'Region' in header
+
+
+def read_intake_chunks(file, file_format, columns, has_region, chunk_rows=STREAMING_CHUNK_ROWS):
+    """Yield (regions, values) per chunk with float32 intake values and a categorical Region"""
+    dtype = {col: np.float32 for col in columns}
+    usecols = list(columns)
+    if has_region:
+        dtype['Region'] = 'category'
+        usecols.append('Region')
+
+    for chunk in iter_upload_chunks(file, file_format, usecols, dtype, chunk_rows):
+        regions = chunk['Region'] if has_region else None
+        yield regions, chunk[columns].to_numpy(dtype=np.float32)
+
+
+class RunningStats:
+    """First-pass statistics over intake chunks: sums, extremes, risk counts and quantile sketches.
+
+    Chunks can be added one at a time, so the statistics of a dataset that grows over
+    time are kept current without re-reading earlier rows, and statistics of separate
+    partitions (files, processes) can be merged. sketch_k sets the quantile sketches'
+    size and so their rank error.
+    """
+
+    def __init__(self, columns, risk_bins, sketch_k=SKETCH_K):
+        n_columns = len(columns)
+        self.columns = list(columns)
+        self.risk_bins = np.asarray(risk_bins)
+        self.row_count = 0
+        self.chunk_count = 0
+        self.sums = np.zeros(n_columns)
+        self.sums_of_squares = np.zeros(n_columns)
+        self.counts = np.zeros(n_columns, dtype=np.int64)
+        self.minimums = np.full(n_columns, np.inf)
+        self.maximums = np.full(n_columns, -np.inf)
+        self.sketches = [QuantileSketch(k=sketch_k) for _ in columns]
+        self.risk_counts = np.zeros(len(risk_bins) + 1, dtype=np.int64)
+        self.total_sum = 0.0
+        # (total, region, sample number) of the extreme rows
+        self.highest = (-np.inf, None, None)
+        self.lowest = (np.inf, None, None)
+
+    def update(self, regions, values):
+        """Add one chunk of (rows x columns) float values with its Region labels (or None)"""
+        self.chunk_count += 1
+        valid = ~np.isnan(values)
+        self.sums += np.where(valid, values, 0).sum(axis=0, dtype=np.float64)
+        self.sums_of_squares += np.square(np.where(valid, values, 0), dtype=np.float64).sum(axis=0)
+        self.counts += valid.sum(axis=0)
+        if len(values):
+            self.minimums = np.minimum(self.minimums, np.where(valid, values, np.inf).min(axis=0))
+            self.maximums = np.maximum(self.maximums, np.where(valid, values, -np.inf).max(axis=0))
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(values[:, j])
+
+        totals = np.nansum(values, axis=1, dtype=np.float64)
+        self.total_sum += totals.sum()
+        self.risk_counts += np.bincount(np.digitize(totals / len(self.columns), self.risk_bins),
+                                        minlength=len(self.risk_counts))
+
+        # Highest keeps the first maximum, lowest the last minimum (stable descending order)
+        if len(totals):
+            top = int(np.argmax(totals))
+            bottom = len(totals) - 1 - int(np.argmin(totals[::-1]))
+            if totals[top] > self.highest[0]:
+                self.highest = (float(totals[top]), self.region(regions, top), self.row_count + top + 1)
+            if totals[bottom] <= self.lowest[0]:
+                self.lowest = (float(totals[bottom]), self.region(regions, bottom), self.row_count + bottom + 1)
+        self.row_count += len(values)
+
+    def merge(self, other):
+        """Fold in the statistics of another partition whose rows follow this one's"""
+        self.sums += other.sums
+        self.sums_of_squares += other.sums_of_squares
+        self.counts += other.counts
+        self.minimums = np.minimum(self.minimums, other.minimums)
+        self.maximums = np.maximum(self.maximums, other.maximums)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        self.risk_counts += other.risk_counts
+        self.total_sum += other.total_sum
+
+        # Sample numbers of the other partition continue after this one's rows
+        def shifted(extreme):
+            total, region, row = extreme
+            return total, region, row + self.row_count if row is not None else None
+        if other.highest[0] > self.highest[0]:
+            self.highest = shifted(other.highest)
+        if other.lowest[0] <= self.lowest[0]:
+            self.lowest = shifted(other.lowest)
+        self.row_count += other.row_count
+        self.chunk_count += other.chunk_count
+        return self
+
+    @staticmethod
+    def region(regions, row):
+        """Region of a row in the current chunk, or None when there is no Region column"""
+        return regions.iloc[row] if regions is not None else None
+
+    @staticmethod
+    def label(extreme):
+        """Name of an extreme row: its region, or its sample number when there is no Region column"""
+        _, region, row = extreme
+        return region if region is not None or row is None else f'Sample {row}'
+
+    def means(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sums / self.counts
+
+    def stds(self):
+        """Population standard deviation per column"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = self.sums_of_squares / self.counts - self.means() ** 2
+        return np.sqrt(np.maximum(variance, 0))
+
+    def quantiles(self, q):
+        """Sketched quantile q of every column"""
+        return np.array([sketch.quantile(q) for sketch in self.sketches])
+
+    def global_avg_intake(self):
+        return self.total_sum / self.row_count if self.row_count else float('nan')
+
+    def state(self):
+        """JSON-serializable snapshot"""
+        return {
+            'columns': self.columns,
+            'risk_bins': self.risk_bins.tolist(),
+            'row_count': self.row_count,
+            'chunk_count': self.chunk_count,
+            'sums': self.sums.tolist(),
+            'sums_of_squares': self.sums_of_squares.tolist(),
+            'counts': self.counts.tolist(),
+            'minimums': self.minimums.tolist(),
+            'maximums': self.maximums.tolist(),
+            'sketches': [sketch.state() for sketch in self.sketches],
+            'risk_counts': self.risk_counts.tolist(),
+            'total_sum': self.total_sum,
+            'highest': list(self.highest),
+            'lowest': list(self.lowest)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Inverse of state()"""
+        stats = cls(state['columns'], state['risk_bins'], state['sketches'][0]['k'] if state['sketches'] else SKETCH_K)
+        stats.row_count = state['row_count']
+        stats.chunk_count = state['chunk_count']
+        stats.sums = np.asarray(state['sums'], dtype=np.float64)
+        stats.sums_of_squares = np.asarray(state['sums_of_squares'], dtype=np.float64)
+        stats.counts = np.asarray(state['counts'], dtype=np.int64)
+        stats.minimums = np.asarray(state['minimums'], dtype=np.float64)
+        stats.maximums = np.asarray(state['maximums'], dtype=np.float64)
+        stats.sketches = [QuantileSketch.from_state(sketch) for sketch in state['sketches']]
+        stats.risk_counts = np.asarray(state['risk_counts'], dtype=np.int64)
+        stats.total_sum = state['total_sum']
+        # Older snapshots stored (total, label) pairs
+        stats.highest = (tuple(state['highest']) + (None,))[:3]
+        stats.lowest = (tuple(state['lowest']) + (None,))[:3]
+        return stats
+
+
+def stream_summary(stats, itemsets, above_p75, file_format=None, chunk_rows=None):
+    """The dict analyze_stream() returns, from first-pass statistics and second-pass counts"""
+    return {
+        'columns': stats.columns,
+        'format': file_format,
+        'row_count': stats.row_count,
+        'chunk_count': stats.chunk_count,
+        'chunk_rows': chunk_rows,
+        'global_avg_intake': stats.global_avg_intake(),
+        'highest_risk_country': stats.label(stats.highest),
+        'lowest_risk_country': stats.label(stats.lowest),
+        'risk_counts': stats.risk_counts,
+        'means': stats.means(),
+        'minimums': stats.minimums,
+        'maximums': stats.maximums,
+        'medians': stats.quantiles(0.5),
+        'percentile_75': stats.quantiles(0.75),
+        'quantile_bounds': {q: [sketch.quantile_bounds(q) for sketch in stats.sketches] for q in (0.5, 0.75)},
+        'sketch_k': stats.sketches[0].k if stats.sketches else None,
+        'above_p75': above_p75,
+        'itemsets': itemsets
+    }
+
+
+def stream_statistics(file, file_format, columns, has_region, risk_bins, chunk_rows=STREAMING_CHUNK_ROWS, sketch_k=SKETCH_K):
+    """Pass 1: running statistics and quantile sketches over an upload's chunks"""
+    stats = RunningStats(columns, risk_bins, sketch_k)
+    for regions, values in read_intake_chunks(file, file_format, columns, has_region, chunk_rows):
+        stats.update(regions, values)
+    return stats
+
+
+def stream_counts(file, file_format, columns, has_region, medians, percentile_75, chunk_rows=STREAMING_CHUNK_ROWS):
+    """Pass 2: itemsets of samples above the medians, and samples above the 75th percentiles"""
+    itemsets = ItemsetCounter(len(columns))
+    above_p75 = np.zeros(len(columns), dtype=np.int64)
+    for _, values in read_intake_chunks(file, file_format, columns, has_region, chunk_rows):
+        itemsets.update(values > medians)
+        above_p75 += (values > percentile_75).sum(axis=0)
+    return itemsets, above_p75
+
+
+def analyze_stream(file, food_columns, risk_bins, chunk_rows=STREAMING_CHUNK_ROWS, sketch_k=SKETCH_K):
+    """Accumulate global insights and per-food statistics over an upload chunk by chunk.
+
+    The first pass collects running sums, min/max, risk counts and quantile sketches;
+    the second pass binarizes each chunk against the sketched medians to count itemsets
+    and counts samples above the sketched 75th percentile.
+    """
+    file_format = detect_format(file)
+    columns, has_region = intake_columns(file, file_format, food_columns)
+    if not columns:
+        raise ValueError("No food intake columns found in the upload for analysis")
+
+    stats = stream_statistics(file, file_format, columns, has_region, risk_bins, chunk_rows, sketch_k)
+    itemsets, above_p75 = stream_counts(file, file_format, columns, has_region,
+                                        stats.quantiles(0.5), stats.quantiles(0.75), chunk_rows)
+    return stream_summary(stats, itemsets, above_p75, file_format, chunk_rows)
+
+
+def partition_statistics(path, columns, risk_bins, chunk_rows, sketch_k):
+    """stream_statistics() of one partition file (run in a worker process)"""
+    with open(path, 'rb') as file:
+        file_format = detect_format(file)
+        has_region = intake_columns(file, file_format, columns)[1]
+        return stream_statistics(file, file_format, columns, has_region, risk_bins, chunk_rows, sketch_k)
+
+
+def partition_counts(path, columns, medians, percentile_75, chunk_rows):
+    """stream_counts() of one partition file (run in a worker process)"""
+    with open(path, 'rb') as file:
+        file_format = detect_format(file)
+        has_region = intake_columns(file, file_format, columns)[1]
+        return stream_counts(file, file_format, columns, has_region, medians, percentile_75, chunk_rows)
+
+
+def analyze_partitions(paths, food_columns, risk_bins, chunk_rows=STREAMING_CHUNK_ROWS, sketch_k=SKETCH_K, workers=None):
+    """analyze_stream() over a dataset split across several files, one worker process per file at a time.
+
+    Each partition is streamed on its own and the per-partition statistics, sketches and
+    itemset counts are merged, in path order, as if the files were one upload. Only
+    food columns present in every file are analyzed.
+    """
+    columns = None
+    for path in paths:
+        with open(path, 'rb') as file:
+            present = intake_columns(file, detect_format(file), food_columns)[0]
+        columns = present if columns is None else [col for col in columns if col in present]
+    if not columns:
+        raise ValueError("No food intake columns common to every partition")
+
+    workers = min(workers or multiprocessing.cpu_count(), len(paths))
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        run = pool.map
+    else:
+        pool = None
+        run = map
+    try:
+        stats = None
+        for partition in run(partial(partition_statistics, columns=columns, risk_bins=risk_bins, chunk_rows=chunk_rows, sketch_k=sketch_k), paths):
+            stats = partition if stats is None else stats.merge(partition)
+
+        medians, percentile_75 = stats.quantiles(0.5), stats.quantiles(0.75)
+        itemsets = ItemsetCounter(len(columns))
+        above_p75 = np.zeros(len(columns), dtype=np.int64)
+        counts = partial(partition_counts, columns=columns, medians=medians, percentile_75=percentile_75, chunk_rows=chunk_rows)
+        for partition_itemsets, partition_above in run(counts, paths):
+            itemsets.merge(partition_itemsets)
+            above_p75 += partition_above
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return stream_summary(stats, itemsets, above_p75, 'partitioned', chunk_rows)
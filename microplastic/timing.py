@@ -0,0 +1,102 @@
+# timing.py - Per-stage wall-clock and memory measurement of the analysis pipeline
+
+import time
+import tracemalloc
+
+from .constants import ANALYSIS_STAGES
+
+
+class StageTimer:
+    """report_stage callback that records when each pipeline stage starts.
+
+    Pass it wherever the pipeline accepts report_stage, call stop() once the analysis
+    returns, then read the seconds spent per stage from timings(). A stage ends where the
+    next one starts unless finish(stage) marks its end, as for stages that run concurrently. With trace_memory,
+    the peak Python heap growth of each stage is also measured with tracemalloc; that
+    slows the analysis down and tracemalloc is process-wide, so concurrent analyses in
+    other threads are counted too.
+    """
+
+    def __init__(self, stages=ANALYSIS_STAGES, trace_memory=False):
+        self.stages = stages
+        self.trace_memory = trace_memory
+        self._starts = {}
+        self._ends = {}
+        self._end = None
+        self._current = None
+        self._memory_base = 0
+        self._memory_start = None
+        self._peaks = {}
+        self._request_peak = 0
+        self._started_tracing = False
+
+    def __call__(self, stage):
+        # A stage may be reported more than once (e.g. data preparation); keep its first start
+        if stage in self._starts:
+            return
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._close_memory()
+            self._memory_base = tracemalloc.get_traced_memory()[0]
+            if self._memory_start is None:
+                self._memory_start = self._memory_base
+            tracemalloc.reset_peak()
+        self._current = stage
+        self._starts[stage] = time.perf_counter()
+
+    def finish(self, stage):
+        self._ends.setdefault(stage, time.perf_counter())
+
+    def _close_memory(self):
+        """Record the peak heap growth of the running stage"""
+        if self._current is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            self._peaks[self._current] = max(0, peak - self._memory_base)
+            self._request_peak = max(self._request_peak, peak - self._memory_start)
+
+    def stop(self):
+        self._end = time.perf_counter()
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._close_memory()
+            if self._started_tracing:
+                tracemalloc.stop()
+        self._current = None
+
+    def timings(self):
+        """{stage name: seconds} for every stage that ran, in pipeline order"""
+        end = self._end if self._end is not None else time.perf_counter()
+        marks = sorted(self._starts.items())
+        timings = {}
+        for i, (stage, start) in enumerate(marks):
+            finish = marks[i + 1][1] if i + 1 < len(marks) else end
+            finish = self._ends.get(stage, finish)
+            timings[self.stages[stage - 1]] = round(finish - start, 4)
+        return timings
+
+    def elapsed(self):
+        """Wall-clock seconds from the first stage's start to stop(), however much the stages overlapped"""
+        if not self._starts:
+            return 0.0
+        end = self._end if self._end is not None else time.perf_counter()
+        return round(end - min(self._starts.values()), 4)
+
+    def peak_memory(self):
+        """{stage name: peak bytes allocated above the stage's starting heap} (trace_memory only)"""
+        return {self.stages[stage - 1]: peak for stage, peak in sorted(self._peaks.items())}
+
+    def request_peak_memory(self):
+        """Peak bytes allocated above the heap at the first stage, over the whole analysis (trace_memory only)"""
+        return self._request_peak if self._memory_start is not None else None
+
+    def report(self):
+        """Per-stage seconds, plus peak memory when traced, as a list in pipeline order"""
+        peaks = self.peak_memory()
+        report = []
+        for name, seconds in self.timings().items():
+            entry = {'stage': name, 'stage_number': self.stages.index(name) + 1, 'seconds': seconds}
+            if name in peaks:
+                entry['peak_memory_bytes'] = peaks[name]
+            report.append(entry)
+        return report
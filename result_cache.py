@@ -0,0 +1,183 @@
+# result_cache.py - Content-addressed cache of serialized /analyze results
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Block size used when hashing uploads so large files are never read whole
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def hash_upload(file):
+    """SHA-256 of an uploaded file's bytes, leaving the stream rewound for parsing"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b''):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def pack_entry(payload, attachments):
+    """One cache entry of a payload and the (cache name, key, bytes) attachments it links to"""
+    header = json.dumps([[name, key, len(data)] for name, key, data in attachments]).encode('utf-8')
+    return len(header).to_bytes(8, 'big') + header + b''.join(data for _, _, data in attachments) + payload
+
+
+def unpack_entry(entry):
+    """Inverse of pack_entry(): (payload, attachments)"""
+    header_end = 8 + int.from_bytes(entry[:8], 'big')
+    attachments = []
+    offset = header_end
+    for name, key, size in json.loads(entry[8:header_end]):
+        attachments.append((name, key, entry[offset:offset + size]))
+        offset += size
+    return entry[offset:], attachments
+
+
+class ResultCache:
+    """Two-tier result cache: an in-memory LRU backed by an optional size-bounded disk directory.
+
+    Disk entries are named <key><extension>, the extension naming the payload type; with an
+    empty extension the keys carry their own (e.g. 'id.150.png').
+    """
+
+    def __init__(self, max_entries=32, disk_dir=None, max_disk_bytes=512 * 1024 * 1024, extension='.json'):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.extension = extension
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash, params):
+        """Combine the upload hash with the analysis parameters into one cache key"""
+        encoded = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(content_hash.encode('ascii') + b':' + encoded).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}{self.extension}')
+
+    def get(self, key):
+        """Return the cached payload bytes for a key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters['hits'] += 1
+                self.counters['memory_hits'] += 1
+                return self._memory[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    payload = f.read()
+                os.utime(path)  # Mark as recently used for eviction
+            except OSError:
+                payload = None
+            if payload is not None:
+                with self._lock:
+                    self.counters['hits'] += 1
+                    self.counters['disk_hits'] += 1
+                    self._remember(key, payload)
+                return payload
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def touch(self, key):
+        """Mark an entry as recently used without reading it; False if it is not cached"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return True
+        if self.disk_dir:
+            try:
+                os.utime(self._disk_path(key))
+                return True
+            except OSError:
+                pass
+        return False
+
+    def put(self, key, payload):
+        """Store payload bytes under a key in both tiers"""
+        with self._lock:
+            self._remember(key, payload)
+
+        if self.disk_dir:
+            # Write to a temp file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_disk()
+
+    def _remember(self, key, payload):
+        """Insert into the memory tier, dropping least recently used entries (lock held)"""
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _disk_entries(self):
+        """(mtime, size, path) for every entry in the disk tier"""
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(self.extension) and not entry.name.endswith('.tmp'):
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict_disk(self):
+        """Delete least recently used disk entries until the tier fits max_disk_bytes"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.counters['evictions'] += 1
+
+    def clear(self):
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            for _, _, path in self._disk_entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Hit/miss counters and current tier sizes"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = sum(len(payload) for payload in self._memory.values())
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        if self.disk_dir:
+            entries = self._disk_entries()
+            stats['disk_entries'] = len(entries)
+            stats['disk_bytes'] = sum(size for _, size, _ in entries)
+        return stats
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Production Server for Global Microplastic Research Analyzer
+===========================================================
+
+Runs app.py under gunicorn (or waitress where gunicorn is unavailable, e.g. on
+Windows) instead of the single-process Flask development server:
+
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 4
+
+The app and its heavy dependencies (pandas, scikit-learn, matplotlib, pyarrow) are
+imported once in the gunicorn master before the workers are forked, so every worker
+starts warm. With more than one worker, caches and background job records are kept
+in shared directories so any worker can answer for results another one produced.
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Plots are only ever rendered off-screen; fix the backend before matplotlib is imported
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+SERVERS = ('auto', 'gunicorn', 'waitress')
+# Imported up front so the first request in each worker does not pay for them
+WARM_IMPORTS = ('sklearn.cluster', 'sklearn.decomposition', 'sklearn.metrics', 'pyarrow', 'pyarrow.parquet',
+                'pyarrow.feather', 'zstandard')
+# Analyses of large uploads can take minutes; gunicorn's default 30 s would kill the worker
+DEFAULT_TIMEOUT = 600
+
+
+def share_state_between_workers(workers):
+    """Point the result/plot/table caches and job records at shared directories (before app is imported).
+
+    Returns the temporary directory created for them, if any, to be removed on shutdown.
+    """
+    if workers <= 1:
+        return None
+    shared_root = os.path.join(tempfile.gettempdir(), f'microplastic-server-{os.getpid()}')
+    os.environ.setdefault('MICROPLASTIC_CACHE_DIR', os.path.join(shared_root, 'cache'))
+    os.environ.setdefault('MICROPLASTIC_JOB_DIR', os.path.join(shared_root, 'jobs'))
+    return shared_root
+
+
+def load_app():
+    """Import the Flask app and warm the optional heavy modules; returns (app, seconds taken)"""
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import app
+    for name in WARM_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    return app.app, time.perf_counter() - start
+
+
+def run_gunicorn(wsgi_app, bind, workers, threads, timeout, shared_root=None):
+    from gunicorn.app.base import BaseApplication
+
+    class PreloadedApplication(BaseApplication):
+        """gunicorn application serving an app object that is already imported"""
+
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread' if threads > 1 else 'sync')
+            self.cfg.set('timeout', timeout)
+            self.cfg.set('preload_app', True)
+            self.cfg.set('accesslog', '-')
+            if shared_root:
+                self.cfg.set('on_exit', lambda server: shutil.rmtree(shared_root, ignore_errors=True))
+
+        def load(self):
+            return wsgi_app
+
+    PreloadedApplication().run()
+
+
+def run_waitress(wsgi_app, bind, workers, threads):
+    from waitress import serve
+
+    if workers > 1:
+        print('ℹ️  waitress runs a single process; serving with threads only')
+    serve(wsgi_app, listen=bind, threads=threads)
+
+
+def choose_server(name):
+    """The requested server, or for 'auto' gunicorn where it runs (not Windows) and waitress otherwise"""
+    if name != 'auto':
+        return name
+    if sys.platform != 'win32':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return 'waitress'
+    except ImportError:
+        raise SystemExit('No production server installed: pip install gunicorn (Linux/macOS) or waitress')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the microplastic analyzer with a production WSGI server.')
+    parser.add_argument('--bind', default=os.environ.get('MICROPLASTIC_BIND', '127.0.0.1:8000'),
+                        help='host:port to listen on (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('MICROPLASTIC_WORKERS', multiprocessing.cpu_count())),
+                        help='worker processes (default: the CPU count)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('MICROPLASTIC_THREADS', 4)),
+                        help='threads per worker (default: %(default)s)')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help='seconds before a busy worker is restarted (gunicorn)')
+    parser.add_argument('--server', choices=SERVERS, default='auto')
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error('--workers and --threads must be at least 1')
+
+    server = choose_server(args.server)
+    shared_root = share_state_between_workers(args.workers if server == 'gunicorn' else 1)
+    wsgi_app, seconds = load_app()
+    print(f'🌍 Serving on {args.bind} with {server}: {args.workers if server == "gunicorn" else 1} worker(s) x '
+          f'{args.threads} thread(s); app loaded in {seconds:.2f}s')
+    if server == 'gunicorn':
+        run_gunicorn(wsgi_app, args.bind, args.workers, args.threads, args.timeout, shared_root)
+    else:
+        run_waitress(wsgi_app, args.bind, args.workers, args.threads)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
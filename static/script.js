@@ -3,12 +3,14 @@
 document.addEventListener('DOMContentLoaded', () => {
     const analyzeBtn = document.getElementById('analyzeBtn');
     const fileInput = document.getElementById('csvFileInput');
+    const streamingModeInput = document.getElementById('streamingModeInput');
+    const aggregateRegionInput = document.getElementById('aggregateRegionInput');
     const loader = document.getElementById('loader');
     const resultsDiv = document.getElementById('results');
 
     analyzeBtn.addEventListener('click', async () => {
         if (fileInput.files.length === 0) {
-            showAlert('Please select a CSV file first.', 'warning');
+            showAlert('Please select a data file first.', 'warning');
             return;
         }
 
@@ -19,22 +21,20 @@ document.addEventListener('DOMContentLoaded', () => {
 
         const formData = new FormData();
         formData.append('file', fileInput.files[0]);
+        // Country analyses come back as a first page of columns; further pages are fetched on demand
+        formData.append('compact', '1');
+        if (streamingModeInput && streamingModeInput.checked) {
+            formData.append('mode', 'streaming');
+        } else if (aggregateRegionInput && aggregateRegionInput.checked) {
+            formData.append('aggregate', 'region');
+        }
 
         try {
-            const response = await fetch('/analyze', {
-                method: 'POST',
-                body: formData,
-            });
-
-            if (!response.ok) {
-                throw new Error('Analysis failed. Please check your file format and try again.');
-            }
-
-            const data = await response.json();
+            const data = await runAnalysisJob(formData);
 
             // Display all results
             displayGlobalOverview(data.global_insights, data.research_summary);
-            displayCountryAnalysis(data.country_analyses);
+            displayCountryAnalysis(data);
             displayPopulationClusters(data.population_clusters);
             displayFoodSourceAnalysis(data.food_source_analysis);
             displayConsumptionPatterns(data.consumption_patterns);
@@ -56,6 +56,60 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Submit the upload as a background job and poll until its results are ready
+    async function runAnalysisJob(formData) {
+        const submitResponse = await fetch('/jobs', {
+            method: 'POST',
+            body: formData,
+        });
+        const job = await submitResponse.json();
+        if (!submitResponse.ok) {
+            throw new Error(job.error || 'Analysis failed. Please check your file format and try again.');
+        }
+
+        updateProgress(null);
+        while (true) {
+            const statusResponse = await fetch(job.status_url);
+            const status = await statusResponse.json();
+            if (!statusResponse.ok) {
+                throw new Error(status.error || 'Lost track of the analysis job.');
+            }
+            updateProgress(status);
+
+            if (status.state === 'done') {
+                break;
+            }
+            if (status.state === 'failed') {
+                throw new Error(status.error || 'Analysis failed. Please check your file format and try again.');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+
+        const resultResponse = await fetch(job.result_url);
+        const data = await resultResponse.json();
+        if (!resultResponse.ok) {
+            throw new Error(data.error || 'Analysis failed. Please check your file format and try again.');
+        }
+        return data;
+    }
+
+    function updateProgress(status) {
+        const statusText = document.getElementById('loaderStatus');
+        const progressBar = document.getElementById('loaderProgress');
+        if (!statusText || !progressBar) {
+            return;
+        }
+        if (!status || !status.stage) {
+            statusText.textContent = status && status.state === 'queued'
+                ? 'Waiting for an available analysis worker...'
+                : 'Processing country comparisons and generating insights...';
+            progressBar.style.width = '0%';
+            return;
+        }
+        statusText.textContent = `Step ${status.stage_number} of ${status.stage_count}: ${status.stage}`;
+        progressBar.style.width = `${Math.round(status.progress * 100)}%`;
+    }
+
     function showAlert(message, type) {
         const alertDiv = document.createElement('div');
         alertDiv.className = `alert alert-${type} alert-dismissible fade show`;
@@ -130,71 +184,172 @@ document.addEventListener('DOMContentLoaded', () => {
         `;
     }
 
-    function displayCountryAnalysis(countries) {
+    // Paging state of the compact country table
+    const countryView = { url: null, lookups: null, offset: 0, sort: 'total_intake', order: 'desc', risk: '' };
+
+    function displayCountryAnalysis(data) {
         const container = document.getElementById('countryAnalysis');
-        let html = '';
+        if (Array.isArray(data.country_analyses)) {
+            // Full (non-compact) responses and streaming mode list the analyses directly
+            container.innerHTML = data.country_analyses.map(renderCountryCard).join('');
+            return;
+        }
 
-        countries.forEach(country => {
-            html += `
-                <div class="card country-card risk-${country.risk_level.toLowerCase().replace(' ', '-')} mb-3">
-                    <div class="card-body">
-                        <div class="row align-items-center">
-                            <div class="col-md-3">
-                                <h5 class="mb-1">${country.country}</h5>
-                                <span class="badge" style="background-color: ${country.color}">
-                                    ${country.risk_level} Risk
-                                </span>
-                            </div>
-                            <div class="col-md-2">
-                                <strong>Total Intake:</strong><br>
-                                ${country.total_intake} particles/gram
-                            </div>
-                            <div class="col-md-3">
-                                <strong>Policy Recommendation:</strong><br>
-                                <small class="text-muted">${country.recommendations.policy}</small>
-                            </div>
-                            <div class="col-md-4">
-                                <strong>Top Risk Foods:</strong><br>
-                                <small class="text-muted">
-                                    ${country.food_breakdown.slice(0, 2).map(food => 
-                                        `${food.food_source}: ${food.intake_level}`
-                                    ).join(', ')}
-                                </small>
-                            </div>
+        countryView.url = data.countries_url;
+        countryView.lookups = data.lookups;
+        container.innerHTML = `
+            <div class="row g-2 mb-3 align-items-center">
+                <div class="col-md-4">
+                    <select class="form-select form-select-sm" id="countrySort">
+                        <option value="total_intake:desc">Highest total intake first</option>
+                        <option value="total_intake:asc">Lowest total intake first</option>
+                        <option value="country:asc">Country/region name (A-Z)</option>
+                        <option value="cluster:asc">Population cluster</option>
+                    </select>
+                </div>
+                <div class="col-md-4">
+                    <select class="form-select form-select-sm" id="countryRisk">
+                        <option value="">All risk levels</option>
+                        ${data.lookups.risk_levels.map(level => `<option value="${level}">${level} risk only</option>`).join('')}
+                    </select>
+                </div>
+                <div class="col-md-4 text-md-end">
+                    <small class="text-muted" id="countryCount"></small>
+                </div>
+            </div>
+            <div id="countryCards"></div>
+            <div class="text-center">
+                <button class="btn btn-outline-primary btn-sm" type="button" id="loadMoreCountries">Load more</button>
+            </div>
+        `;
+        document.getElementById('countrySort').addEventListener('change', reloadCountries);
+        document.getElementById('countryRisk').addEventListener('change', reloadCountries);
+        document.getElementById('loadMoreCountries').addEventListener('click', () => loadCountryPage(false));
+        showCountryPage(data.country_analyses, true);
+    }
+
+    function reloadCountries() {
+        const [sort, order] = document.getElementById('countrySort').value.split(':');
+        countryView.sort = sort;
+        countryView.order = order;
+        countryView.risk = document.getElementById('countryRisk').value;
+        countryView.offset = 0;
+        loadCountryPage(true);
+    }
+
+    async function loadCountryPage(replace) {
+        const params = new URLSearchParams({ offset: countryView.offset, sort: countryView.sort, order: countryView.order });
+        if (countryView.risk) {
+            params.set('risk', countryView.risk);
+        }
+        try {
+            const response = await fetch(`${countryView.url}?${params}`);
+            const page = await response.json();
+            if (!response.ok) {
+                throw new Error(page.error || 'Could not load more countries.');
+            }
+            showCountryPage(page, replace);
+        } catch (error) {
+            showAlert('An error occurred: ' + error.message, 'danger');
+        }
+    }
+
+    function showCountryPage(page, replace) {
+        const cards = document.getElementById('countryCards');
+        const html = countryRows(page, countryView.lookups).map(renderCountryCard).join('');
+        if (replace) {
+            cards.innerHTML = html;
+        } else {
+            cards.insertAdjacentHTML('beforeend', html);
+        }
+        countryView.offset = page.offset + page.columns.sample_id.length;
+        document.getElementById('countryCount').textContent = `Showing ${countryView.offset} of ${page.matched} samples`;
+        document.getElementById('loadMoreCountries').style.display = countryView.offset < page.matched ? 'inline-block' : 'none';
+    }
+
+    // Expand a columnar page into the per-country objects renderCountryCard() expects
+    function countryRows(page, lookups) {
+        const columns = page.columns;
+        return columns.sample_id.map((sampleId, i) => {
+            const risk = columns.risk[i];
+            const foodBreakdown = lookups.food_sources.map((name, j) => ({
+                food_source: name,
+                intake_level: columns.food_intake[i][j],
+                risk_level: lookups.risk_levels[columns.food_risk[i][j]],
+                color: lookups.risk_colors[columns.food_risk[i][j]]
+            }));
+            foodBreakdown.sort((a, b) => b.intake_level - a.intake_level);
+            return {
+                sample_id: sampleId,
+                country: columns.country[i],
+                total_intake: columns.total_intake[i],
+                average_intake: columns.average_intake[i],
+                risk_level: lookups.risk_levels[risk],
+                color: lookups.risk_colors[risk],
+                recommendations: lookups.recommendations[lookups.risk_recommendation[risk]],
+                food_breakdown: foodBreakdown
+            };
+        });
+    }
+
+    function renderCountryCard(country) {
+        return `
+            <div class="card country-card risk-${country.risk_level.toLowerCase().replace(' ', '-')} mb-3">
+                <div class="card-body">
+                    <div class="row align-items-center">
+                        <div class="col-md-3">
+                            <h5 class="mb-1">${country.country}</h5>
+                            <span class="badge" style="background-color: ${country.color}">
+                                ${country.risk_level} Risk
+                            </span>
                         </div>
-                        <div class="mt-2">
-                            <button class="btn btn-sm btn-outline-primary" type="button" data-bs-toggle="collapse" 
-                                    data-bs-target="#country-${country.sample_id}" aria-expanded="false">
-                                View Detailed Breakdown
-                            </button>
+                        <div class="col-md-2">
+                            <strong>Total Intake:</strong><br>
+                            ${country.total_intake} particles/gram
                         </div>
-                        <div class="collapse mt-3" id="country-${country.sample_id}">
-                            <div class="row">
-                                <div class="col-md-6">
-                                    <h6>Food Source Breakdown:</h6>
-                                    ${country.food_breakdown.map(food => `
-                                        <div class="d-flex justify-content-between">
-                                            <span>${food.food_source}:</span>
-                                            <span class="text-${food.color === 'green' ? 'success' : food.color === 'orange' ? 'warning' : 'danger'}">
-                                                ${food.intake_level} (${food.risk_level})
-                                            </span>
-                                        </div>
-                                    `).join('')}
-                                </div>
-                                <div class="col-md-6">
-                                    <h6>Public Health Actions:</h6>
-                                    <p><small>${country.recommendations.public_health}</small></p>
-                                    <h6>Individual Actions:</h6>
-                                    <p><small>${country.recommendations.individual}</small></p>
-                                </div>
+                        <div class="col-md-3">
+                            <strong>Policy Recommendation:</strong><br>
+                            <small class="text-muted">${country.recommendations.policy}</small>
+                        </div>
+                        <div class="col-md-4">
+                            <strong>Top Risk Foods:</strong><br>
+                            <small class="text-muted">
+                                ${country.food_breakdown.slice(0, 2).map(food => 
+                                    `${food.food_source}: ${food.intake_level}`
+                                ).join(', ')}
+                            </small>
+                        </div>
+                    </div>
+                    <div class="mt-2">
+                        <button class="btn btn-sm btn-outline-primary" type="button" data-bs-toggle="collapse" 
+                                data-bs-target="#country-${country.sample_id}" aria-expanded="false">
+                            View Detailed Breakdown
+                        </button>
+                    </div>
+                    <div class="collapse mt-3" id="country-${country.sample_id}">
+                        <div class="row">
+                            <div class="col-md-6">
+                                <h6>Food Source Breakdown:</h6>
+                                ${country.food_breakdown.map(food => `
+                                    <div class="d-flex justify-content-between">
+                                        <span>${food.food_source}:</span>
+                                        <span class="text-${food.color === 'green' ? 'success' : food.color === 'orange' ? 'warning' : 'danger'}">
+                                            ${food.intake_level} (${food.risk_level})
+                                        </span>
+                                    </div>
+                                `).join('')}
+                            </div>
+                            <div class="col-md-6">
+                                <h6>Public Health Actions:</h6>
+                                <p><small>${country.recommendations.public_health}</small></p>
+                                <h6>Individual Actions:</h6>
+                                <p><small>${country.recommendations.individual}</small></p>
                             </div>
                         </div>
                     </div>
                 </div>
-            `;
-        });
-
-        container.innerHTML = html;
+            </div>
+        `;
     }
 
     function displayPopulationClusters(clusters) {
@@ -215,7 +370,8 @@ document.addEventListener('DOMContentLoaded', () => {
                         <p class="card-text">${cluster.description}</p>
                         <div class="row">
                             <div class="col-md-6">
-                                <strong>Countries/Regions:</strong> ${cluster.countries.join(', ') || 'Various samples'}
+                                <strong>Countries/Regions:</strong> ${(cluster.countries || cluster.top_countries).join(', ') || 'Various samples'}${
+                                    cluster.country_count > cluster.top_countries?.length ? ` and ${cluster.country_count - cluster.top_countries.length} more` : ''}
                             </div>
                             <div class="col-md-6">
                                 <strong>Avg. Intake:</strong> ${cluster.average_intake} particles/gram
@@ -407,6 +563,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function displayVisualization(plotUrl) {
         const container = document.getElementById('clusterVisualization');
+        if (!plotUrl) {
+            container.innerHTML = '<p class="text-muted">Cluster visualization is not available in streaming mode.</p>';
+            return;
+        }
         container.innerHTML = `<img src="${plotUrl}" class="img-fluid rounded" alt="Global Risk Distribution Visualization">`;
     }
 });
\ No newline at end of file
@@ -0,0 +1,53 @@
+# Aggregate-by-Region mode: one row per region, then the usual analysis of the reduced table
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from create_sample_data import create_scaled_dataset
+from microplastic import AnalysisInputError, analysis_options, run_analysis
+from microplastic.aggregate import aggregate_by_region
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+FOODS = ['Seafood_Intake', 'Bottled_Water_Intake', 'Salt_Intake', 'Sugar_Intake', 'Packaged_Food_Intake']
+
+
+@pytest.mark.parametrize('statistic', ['mean', 'median'])
+def test_regions_match_groupby(statistic):
+    df = create_scaled_dataset(3000, seed=4)
+    region_df, variation = aggregate_by_region(df, statistic)
+    expected = df.groupby('Region', sort=False)[FOODS].agg(statistic).reset_index()
+    pd.testing.assert_frame_equal(region_df, expected)
+    assert region_df['Region'].tolist() == df['Region'].unique().tolist()
+    assert variation['input_samples'] == 3000 and variation['regions_analyzed'] == len(expected)
+    assert sum(region['sample_count'] for region in variation['within_region']) == 3000
+
+
+def test_variance_explained():
+    df = create_scaled_dataset(3000, seed=4)
+    _, variation = aggregate_by_region(df)
+    values = df['Salt_Intake']
+    region_means = df.groupby('Region')['Salt_Intake'].transform('mean')
+    between = ((region_means - values.mean()) ** 2).sum() / ((values - values.mean()) ** 2).sum()
+    assert variation['variance_explained']['Table Salt'] == round(between, 3)
+    assert all(0 <= share <= 1 for share in variation['variance_explained'].values())
+
+
+def test_aggregated_analysis_is_the_analysis_of_region_means():
+    df = pd.read_csv(DATA)
+    aggregated = run_analysis(df, options=analysis_options({'aggregate': 'region'}))
+    region_df = df.groupby('Region', sort=False)[FOODS].mean().reset_index()
+    direct = run_analysis(region_df, options=analysis_options({}))
+    for section in ('global_insights', 'research_summary', 'country_analyses', 'food_source_analysis'):
+        assert aggregated[section] == direct[section]
+    assert aggregated['aggregation']['regions_analyzed'] == df['Region'].nunique()
+
+
+def test_missing_regions_and_streaming():
+    df = pd.read_csv(DATA)
+    df.loc[[0, 1], 'Region'] = np.nan
+    _, variation = aggregate_by_region(df)
+    assert variation['within_region'][0] == dict(variation['within_region'][0], country='Unknown', sample_count=2)
+    with pytest.raises(AnalysisInputError):
+        analysis_options({'aggregate': 'region', 'mode': 'streaming'})
@@ -0,0 +1,184 @@
+# HTTP behavior of the Flask app through its test client
+import io
+import os
+
+import pytest
+
+import app as server
+from microplastic.constants import RISK_LEVELS
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+@pytest.fixture
+def client():
+    for cache in (server.result_cache, server.plot_cache, server.image_cache, server.table_cache):
+        cache.clear()
+    server.table_indexes.clear()
+    return server.app.test_client()
+
+
+def analyze(client, **fields):
+    with open(DATA, 'rb') as f:
+        upload = f.read()
+    fields = {'file': (io.BytesIO(upload), 'data.csv'), **fields}
+    return client.post('/analyze', data=fields, content_type='multipart/form-data')
+
+
+def test_cache_hit_restores_evicted_plot(client):
+    first = analyze(client)
+    assert first.headers['X-Cache'] == 'MISS'
+    url = first.get_json()['visualization_url']
+
+    # Fill the plot cache until the spec is pushed out
+    for i in range(server.plot_cache.max_entries):
+        server.plot_cache.put(f'filler-{i}', b'')
+    assert client.get(url).status_code == 404
+
+    second = analyze(client)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json()['visualization_url'] == url
+    plot = client.get(url)
+    assert plot.status_code == 200 and plot.mimetype == 'image/png'
+
+
+def test_images_do_not_evict_specs(client):
+    url = analyze(client).get_json()['visualization_url']
+    for i in range(server.image_cache.max_entries + 1):
+        server.image_cache.put(f'filler-{i}.150.png', b'')
+    assert client.get(url).status_code == 200
+
+
+def test_cache_hit_restores_evicted_country_table(client):
+    first = analyze(client, compact='1').get_json()
+    for i in range(server.table_cache.max_entries):
+        server.table_cache.put(f'filler-{i}', b'')
+    server.table_indexes.clear()  # the decoded copy would otherwise still answer queries
+    assert client.get(first['countries_url']).status_code == 404
+
+    second = analyze(client, compact='1')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert client.get(first['countries_url']).get_json() == first['country_analyses']
+    assert client.get(first['query_url'] + '?region=China').status_code == 200
+
+
+def test_dataset_stores_stay_bounded(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'DATASET_DIR', str(tmp_path))
+    monkeypatch.setattr(server, 'DATASET_STORE_ENTRIES', 2)
+    server.dataset_stores.clear()
+    for i in range(5):
+        assert client.get(f'/datasets/missing-{i}').status_code == 404
+    assert not server.dataset_stores
+
+    with open(DATA, 'rb') as f:
+        upload = f.read()
+    for i in range(3):
+        response = client.post(f'/datasets/survey-{i}/samples', data={'file': (io.BytesIO(upload), 'data.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+    assert len(server.dataset_stores) == 2
+    # An evicted dataset is reopened from its directory
+    assert client.get('/datasets/survey-0').get_json()['dataset']['rows'] == 60
+
+
+def test_corrupt_dataset_state_is_a_json_error(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'DATASET_DIR', str(tmp_path))
+    server.dataset_stores.clear()
+    os.makedirs(tmp_path / 'broken')
+    (tmp_path / 'broken' / 'state.json').write_text('{not json')
+    response = client.get('/datasets/broken')
+    assert response.status_code == 500
+    assert response.get_json()['error'].startswith('Read failed:')
+
+
+def test_dataset_region_query(client, tmp_path, monkeypatch):
+    import pandas as pd
+    monkeypatch.setattr(server, 'DATASET_DIR', str(tmp_path))
+    server.dataset_stores.clear()
+    with open(DATA, 'rb') as f:
+        client.post('/datasets/survey/samples', data={'file': (f, 'data.csv')}, content_type='multipart/form-data')
+    means = pd.read_csv(DATA).groupby('Region')['Seafood_Intake'].mean().round(1)
+
+    page = client.get('/datasets/survey/query?by=Seafood_Intake&top=3').get_json()
+    assert page['by'] == 'Seafood' and page['matched'] == 3
+    assert page['columns']['country'] == means.sort_values(ascending=False, kind='stable').index[:3].tolist()
+
+    china = client.get('/datasets/survey/query?region=China').get_json()['columns']
+    assert china['country'] == ['China'] and china['food_intake'][0][0] == means['China']
+
+    ranged = client.get('/datasets/survey/query?by=seafood&min=200&max=300').get_json()['columns']
+    assert sorted(ranged['country']) == sorted(means[(means >= 200) & (means <= 300)].index)
+
+    assert client.get('/datasets/survey/query?by=rice').status_code == 400
+    assert client.get('/datasets/unknown/query').status_code == 404
+
+
+def test_country_pages_cover_the_full_list(client):
+    full = analyze(client).get_json()['country_analyses']
+    first = analyze(client, compact='1').get_json()
+    url = first['countries_url']
+
+    sample_ids = []
+    for offset in range(0, 60, 25):
+        page = client.get(f'{url}?offset={offset}&limit=25').get_json()
+        assert (page['total'], page['matched'], page['offset']) == (60, 60, offset)
+        sample_ids += page['columns']['sample_id']
+    assert sample_ids == [entry['sample_id'] for entry in full]
+
+    page = client.get(f'{url}?sort=country&order=asc&limit=5000').get_json()
+    assert page['columns']['country'] == sorted(entry['country'] for entry in full)
+
+    page = client.get(f'{url}?risk=very%20high,low&sort=average_intake&order=asc&limit=5000').get_json()
+    selected = [entry for entry in full if entry['risk_level'] in ('Very High', 'Low')]
+    assert page['matched'] == len(selected)
+    assert page['columns']['average_intake'] == sorted(entry['average_intake'] for entry in selected)
+    assert {RISK_LEVELS[code] for code in page['columns']['risk']} == {'Very High', 'Low'}
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=5001', 'offset=-1', 'limit=ten', 'sort=color',
+                                   'order=up', 'risk=extreme'])
+def test_country_page_validation(client, query):
+    url = analyze(client, compact='1').get_json()['countries_url']
+    response = client.get(f'{url}?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_unknown_country_table(client):
+    assert client.get('/countries/0123456789abcdef').status_code == 404
+
+
+def test_timings_and_metrics(client, monkeypatch):
+    count_line = 'microplastic_analysis_duration_seconds_count{mode="full"}'
+
+    def analyses_counted():
+        lines = client.get('/metrics').get_data(as_text=True).splitlines()
+        return next((int(line.split()[-1]) for line in lines if line.startswith(count_line)), 0)
+
+    before = analyses_counted()
+    response = analyze(client, timings='memory')
+    # A measured run is not served from or stored in the result cache
+    assert response.headers['X-Cache'] == 'BYPASS'
+    results = response.get_json()
+    assert [entry['stage_number'] for entry in results['timings']] == sorted(
+        entry['stage_number'] for entry in results['timings'])
+    assert all(entry['seconds'] >= 0 and 'peak_memory_bytes' in entry for entry in results['timings'])
+    assert results['memory']['peak_bytes'] > 0
+    assert analyses_counted() == before + 1
+
+    assert analyze(client, timings='bogus').status_code == 400
+    monkeypatch.setattr(server, 'PROFILING_ENABLED', False)
+    assert analyze(client, profile='1').status_code == 400
+
+
+def test_plot_urls(client):
+    url = analyze(client).get_json()['visualization_url']
+    plot = client.get(url)
+    assert plot.status_code == 200 and 'immutable' in plot.headers['Cache-Control']
+    assert client.get(url, headers={'If-None-Match': plot.headers['ETag']}).status_code == 304
+    assert client.get(url.replace('.png', '.svg') + '?dpi=72').mimetype == 'image/svg+xml'
+    assert server.image_cache.stats()['memory_entries'] == 2
+
+    assert client.get(url + '?dpi=5000').status_code == 400
+    assert client.get(url.replace('.png', '.gif')).status_code == 404
+    assert client.get('/plots/0123456789abcdef.png').status_code == 404
@@ -0,0 +1,71 @@
+# Bitset association-rule miner against mlxtend, and incremental itemset counting
+import numpy as np
+import pandas as pd
+import pytest
+
+from microplastic.association import ItemsetCounter, association_rules, frequent_itemsets
+
+mlxtend = pytest.importorskip('mlxtend.frequent_patterns')
+
+
+def random_binary(seed, rows=400, items=5):
+    rng = np.random.default_rng(seed)
+    # Correlated columns so that multi-item rules exist
+    base = rng.random(rows)
+    return (rng.random((rows, items)) * 0.6 + base[:, None] * 0.4) > 0.5
+
+
+def rule_map(rules):
+    return {(frozenset(antecedent), frozenset(consequent)): (support, confidence)
+            for antecedent, consequent, support, confidence in rules}
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_rules_match_mlxtend(seed):
+    binary = random_binary(seed)
+    columns = list(range(binary.shape[1]))
+    frame = pd.DataFrame(binary, columns=columns)
+    expected_itemsets = mlxtend.apriori(frame, min_support=0.1, use_colnames=True)
+    expected_rules = mlxtend.association_rules(expected_itemsets, metric='confidence', min_threshold=0.5)
+
+    supports = frequent_itemsets(binary, 0.1)
+    assert {frozenset(itemset): support for itemset, support in supports.items()} == pytest.approx(
+        dict(zip(expected_itemsets['itemsets'], expected_itemsets['support'])))
+
+    rules = rule_map(association_rules(supports, 0.5))
+    expected = {(row.antecedents, row.consequents): (row.support, row.confidence)
+                for row in expected_rules.itertuples()}
+    assert rules.keys() == expected.keys()
+    for key, (support, confidence) in expected.items():
+        assert rules[key] == pytest.approx((support, confidence))
+
+
+def test_rule_order():
+    supports = frequent_itemsets(random_binary(0), 0.1)
+    rules = association_rules(supports, 0.0)
+    order = list(supports)
+    keys = [(order.index(tuple(sorted(a + c))), -len(a), a) for a, c, _, _ in rules]
+    assert keys == sorted(keys)
+
+
+def test_itemset_counter_merge_and_state():
+    binary = random_binary(3)
+    whole = ItemsetCounter(binary.shape[1])
+    whole.update(binary)
+    assert whole.frequent_itemsets(0.1) == pytest.approx(frequent_itemsets(binary, 0.1))
+
+    merged = ItemsetCounter(binary.shape[1])
+    for chunk in np.array_split(binary, 3):
+        part = ItemsetCounter(binary.shape[1])
+        part.update(chunk)
+        merged.merge(part)
+    assert merged.row_count == whole.row_count
+    assert np.array_equal(merged.counts, whole.counts)
+
+    restored = ItemsetCounter.from_state(merged.state())
+    assert restored.row_count == merged.row_count
+    assert np.array_equal(restored.counts, merged.counts)
+    assert list(restored.frequent_itemsets(0.1)) == list(frequent_itemsets(binary, 0.1))
+
+    with pytest.raises(ValueError):
+        merged.merge(ItemsetCounter(binary.shape[1] + 1))
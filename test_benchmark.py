@@ -0,0 +1,54 @@
+# Benchmark suite: scales, cached datasets, runners and the baseline comparison
+import json
+import os
+import sys
+
+import pandas as pd
+
+import benchmark
+
+
+def test_parse_scales():
+    assert benchmark.parse_scales('1e3, 1e4,250000,') == [1000, 10000, 250000]
+
+
+def test_datasets_are_generated_once(tmp_path):
+    path = benchmark.dataset_path(str(tmp_path), 500, seed=3)
+    assert os.path.basename(path) == 'synthetic_500_seed3.csv'
+    assert len(pd.read_csv(path)) == 500
+    modified = os.path.getmtime(path)
+    assert benchmark.dataset_path(str(tmp_path), 500, seed=3) == path
+    assert os.path.getmtime(path) == modified
+
+
+def test_runners_report_stages(tmp_path):
+    path = benchmark.dataset_path(str(tmp_path), 300, seed=1)
+    for runner in (benchmark.run_direct, benchmark.run_http):
+        for mode in ('full', 'streaming'):
+            measured = runner(path, mode)
+            assert measured['seconds'] > 0
+            assert measured['stages'] and all(stage['seconds'] >= 0 for stage in measured['stages'])
+
+
+def result(rows, seconds, mode='full', path='direct'):
+    return {'rows': rows, 'mode': mode, 'path': path, 'seconds': seconds}
+
+
+def test_compare_counts_regressions():
+    baseline = {'environment': {'commit': 'abc123'}, 'results': [result(1000, 1.0), result(1000, 1.0, path='http')]}
+    current = [result(1000, 1.05), result(1000, 1.5, path='http'), result(10000, 9.0)]
+    assert benchmark.compare(current, baseline, tolerance=0.10) == 1
+    assert benchmark.compare(current, baseline, tolerance=0.60) == 0
+
+
+def test_main_writes_results_and_flags_regressions(tmp_path, monkeypatch):
+    output = tmp_path / 'results.json'
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'environment': {}, 'results': [result(200, 1e-9, mode='streaming')]}))
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', '--scales', '200', '--modes', 'streaming', '--paths', 'direct',
+                                      '--data-dir', str(tmp_path / 'data'), '--output', str(output),
+                                      '--compare', str(baseline)])
+    assert benchmark.main() == 1
+    report = json.loads(output.read_text())
+    assert [(entry['rows'], entry['mode'], entry['path']) for entry in report['results']] == [(200, 'streaming', 'direct')]
+    assert report['results'][0]['runs'] and 'environment' in report
@@ -0,0 +1,62 @@
+# Command-line batch analyzer: per-file and merged outputs, and option conflicts
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from microplastic import analysis_options, analyze_csv
+from microplastic.__main__ import main
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+def test_batch_writes_one_result_per_file(tmp_path, capsys):
+    frame = pd.read_csv(DATA)
+    for name, part in [('north', frame[:30]), ('south', frame[30:])]:
+        part.to_csv(tmp_path / f'{name}.csv', index=False)
+    out = tmp_path / 'out'
+
+    assert main([str(tmp_path / '*.csv'), '-o', str(out), '-j', '1', '--plots', 'svg']) == 0
+    assert sorted(os.listdir(out)) == ['north.json', 'north.svg', 'south.json', 'south.svg']
+    with open(out / 'south.json') as f:
+        written = json.load(f)
+    expected = analyze_csv(str(tmp_path / 'south.csv'), analysis_options({'stage_workers': '1'}))
+    assert written['global_insights'] == expected['global_insights']
+    assert written['research_summary']['total_samples'] == 30
+    assert '2 succeeded, 0 failed' in capsys.readouterr().out
+
+
+def test_batch_reports_failed_files(tmp_path):
+    (tmp_path / 'broken.csv').write_text('Region,Unknown\nChina,1\n')
+    assert main([str(tmp_path / 'broken.csv'), '-o', str(tmp_path / 'out'), '-j', '1']) == 1
+    assert not os.path.exists(tmp_path / 'out' / 'broken.json')
+
+
+def test_merge_matches_streaming_the_whole_file(tmp_path):
+    frame = pd.read_csv(DATA)
+    parts = [tmp_path / 'part0.csv', tmp_path / 'part1.csv']
+    frame[:25].to_csv(parts[0], index=False)
+    frame[25:].to_csv(parts[1], index=False)
+
+    assert main([str(part) for part in parts] + ['-o', str(tmp_path), '--merge', 'survey', '-j', '1']) == 0
+    with open(tmp_path / 'survey.json') as f:
+        merged = json.load(f)
+    whole = analyze_csv(DATA, analysis_options({'mode': 'streaming'}))
+    for section in ('global_insights', 'research_summary'):
+        assert merged[section] == whole[section]
+    assert merged['ingestion']['partitions'] == 2
+
+
+@pytest.mark.parametrize('flags', [
+    ['--mode', 'streaming', '--clusters', 'auto'],
+    ['--mode', 'streaming', '--n-init', '5'],
+    ['--merge', 'survey', '--plots', 'png'],
+    ['--merge', 'survey', '--mode', 'full'],
+])
+def test_full_mode_options_conflict_with_streaming(tmp_path, flags, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main([DATA, '-o', str(tmp_path)] + flags)
+    assert exit_info.value.code == 2
+    assert 'error:' in capsys.readouterr().err
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,108 @@
+# Clustering: k-means backends, automatic k, and ids that follow ascending average intake for every analysis
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from microplastic import analysis_options, run_analysis
+from microplastic import AnalysisInputError
+from microplastic import clustering
+from microplastic.clustering import elbow_cluster_count, fit_clusters, order_clusters, select_clusters
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+def test_order_clusters_by_mean_total():
+    labels = np.array([2, 2, 0, 1, 1, 0])
+    totals = np.array([10.0, 12.0, 50.0, 1.0, 3.0, 70.0])
+    # Cluster 1 (mean 2) becomes 0, cluster 2 (mean 11) becomes 1, cluster 0 (mean 60) becomes 2
+    assert order_clusters(labels, totals).tolist() == [1, 1, 2, 0, 0, 2]
+    # An empty cluster sorts last
+    assert order_clusters(np.array([1, 1]), np.array([5.0, 6.0]), n_clusters=3).tolist() == [0, 0]
+
+
+def test_default_analysis_numbering():
+    results = run_analysis(pd.read_csv(DATA), options=analysis_options({}))
+    clusters = results['population_clusters']
+    assert [cluster['cluster_id'] for cluster in clusters] == [0, 1, 2]
+    averages = [cluster['average_intake'] for cluster in clusters]
+    assert averages == sorted(averages)
+    # Pinned numbering of the bundled dataset's default (k = 3) clustering
+    assert [cluster['sample_count'] for cluster in clusters] == [26, 16, 18]
+    assert [cluster['risk_category'] for cluster in clusters] == [
+        'Low Risk Population', 'Moderate Risk Population', 'High Risk Population']
+    assert 'China' in clusters[2]['countries'] and 'New Zealand' in clusters[0]['countries']
+
+
+def blobs(rows_per_blob=300, centers=((0, 0, 0), (8, 0, 0), (0, 8, 0), (0, 0, 8)), seed=0):
+    """Well separated Gaussian blobs and each row's blob"""
+    rng = np.random.default_rng(seed)
+    features = np.concatenate([rng.normal(center, 0.5, (rows_per_blob, len(center))) for center in centers])
+    return features, np.repeat(np.arange(len(centers)), rows_per_blob)
+
+
+def same_partition(labels, truth):
+    """True when labels group the rows exactly as truth does, whatever the numbering"""
+    pairs = set(zip(labels.tolist(), truth.tolist()))
+    return len(pairs) == len(set(labels.tolist())) == len(set(truth.tolist()))
+
+
+@pytest.mark.parametrize('backend', ['kmeans', 'minibatch', 'sampled'])
+def test_backends_find_separated_clusters(backend):
+    features, truth = blobs()
+    labels, info = fit_clusters(features, 4, n_init=3, backend=backend, sample_rows=400)
+    assert same_partition(labels, truth)
+    assert info['backend'] == backend and info['rows'] == len(features)
+    assert info['fitted_rows'] == (400 if backend == 'sampled' else len(features))
+
+
+def test_auto_backend_switches_on_size():
+    features, _ = blobs()
+    assert fit_clusters(features, 4, n_init=1, large_rows=len(features))[1]['backend'] == 'kmeans'
+    assert fit_clusters(features, 4, n_init=1, large_rows=len(features) - 1)[1]['backend'] == 'minibatch'
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        fit_clusters(blobs()[0], 4, backend='spectral')
+    with pytest.raises(AnalysisInputError):
+        analysis_options({'cluster_backend': 'spectral'})
+
+
+def test_auto_k_finds_the_blobs():
+    features, truth = blobs()
+    labels, info = select_clusters(features, k_min=2, k_max=6, n_init=3)
+    selection = info['selection']
+    assert selection['selected_k'] == info['n_clusters'] == 4
+    assert [score['k'] for score in selection['candidates']] == [2, 3, 4, 5, 6]
+    assert same_partition(labels, truth)
+    assert selection['elbow_k'] in range(2, 7)
+
+
+def test_parallel_search_matches_serial(monkeypatch):
+    features, _ = blobs(rows_per_blob=100)
+    serial_labels, serial = select_clusters(features, k_max=4, n_init=2, max_workers=1)
+    monkeypatch.setattr(clustering, 'PARALLEL_SEARCH_ROWS', 0)
+    parallel_labels, parallel = select_clusters(features, k_max=4, n_init=2, max_workers=2)
+    assert parallel['selection']['workers'] == 2
+    assert parallel_labels.tolist() == serial_labels.tolist()
+    # Timings aside, every candidate scores the same
+    for fast, slow in zip(parallel['selection']['candidates'], serial['selection']['candidates']):
+        assert (fast['k'], fast['silhouette'], fast['inertia']) == (slow['k'], slow['silhouette'], slow['inertia'])
+
+
+def test_elbow_and_small_inputs():
+    scores = [{'k': k, 'inertia': inertia} for k, inertia in zip(range(2, 7), [100.0, 60.0, 20.0, 18.0, 17.0])]
+    assert elbow_cluster_count(scores) == 4
+    assert elbow_cluster_count(scores[:2]) == 2
+    # Two rows cannot be scored; one fixed fit instead
+    labels, info = select_clusters(np.array([[0.0, 1.0], [5.0, 6.0]]))
+    assert 'selection' not in info and len(labels) == 2
+
+
+def test_auto_k_through_the_analysis():
+    results = run_analysis(pd.read_csv(DATA), options=analysis_options({'clusters': 'auto', 'k_max': '5'}))
+    selection = results['clustering']['selection']
+    assert [score['k'] for score in selection['candidates']] == [2, 3, 4, 5]
+    assert len(results['population_clusters']) == selection['selected_k']
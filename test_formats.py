@@ -0,0 +1,77 @@
+# Upload formats: every supported encoding of the same samples analyzes identically
+import gzip
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from microplastic import analysis_options, analyze_csv
+from microplastic.formats import detect_format, read_upload
+
+pa = pytest.importorskip('pyarrow')
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+SECTIONS = ('global_insights', 'research_summary', 'food_source_analysis', 'consumption_patterns')
+
+
+def encode(df, file_format):
+    """The samples of df in one upload format, as bytes"""
+    if file_format == 'csv':
+        return df.to_csv(index=False).encode()
+    if file_format == 'gzip':
+        return gzip.compress(df.to_csv(index=False).encode())
+    if file_format == 'zstd':
+        buffer = io.BytesIO()
+        df.to_csv(buffer, index=False, compression='zstd')
+        return buffer.getvalue()
+    buffer = io.BytesIO()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, buffer)
+    elif file_format == 'feather_v1':
+        import pyarrow.feather as feather
+        feather.write_feather(df, buffer, version=1)
+    elif file_format == 'arrow':
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def samples():
+    df = pd.read_csv(DATA)
+    # Columns other than Region and *_Intake are not read
+    df.insert(1, 'Notes', 'field survey')
+    return df
+
+
+@pytest.fixture(scope='module')
+def expected(samples):
+    upload = io.BytesIO(encode(samples, 'csv'))
+    return {mode: analyze_csv(upload, analysis_options({'mode': mode})) for mode in ('full', 'streaming')}
+
+
+# pyarrow still reads Feather v1 but warns that it is deprecated
+@pytest.mark.filterwarnings('ignore:Feather V1:DeprecationWarning')
+@pytest.mark.parametrize('file_format', ['gzip', 'zstd', 'parquet', 'arrow', 'arrow_stream', 'feather_v1'])
+def test_formats_match_csv(samples, expected, file_format, tmp_path):
+    data = encode(samples, file_format)
+    assert detect_format(io.BytesIO(data)) == file_format
+
+    frame = read_upload(io.BytesIO(data))
+    assert 'Notes' not in frame.columns and len(frame) == len(samples)
+
+    path = tmp_path / f'upload.{file_format}'
+    path.write_bytes(data)
+    for mode in ('full', 'streaming'):
+        # Files on disk are memory-mapped, streams are read
+        for upload in (io.BytesIO(data), str(path)):
+            results = analyze_csv(upload, analysis_options({'mode': mode}))
+            for section in SECTIONS:
+                assert results[section] == expected[mode][section]
+    assert results['ingestion']['format'] == file_format
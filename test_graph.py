@@ -0,0 +1,54 @@
+# Stage graph: independent stages run concurrently, results do not depend on the worker count
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from microplastic import analysis_options, run_analysis
+from microplastic.graph import run_stages
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+def test_dependencies_and_concurrency():
+    both_running = threading.Barrier(2, timeout=5)
+
+    def side(name):
+        def run(outputs):
+            both_running.wait()  # deadlocks unless the two sides run at once
+            return outputs['base'] + name
+        return run
+
+    started, finished = [], []
+    stages = [
+        ('base', 1, lambda outputs: 'x', ()),
+        ('left', 2, side('L'), ('base',)),
+        ('right', 3, side('R'), ('base',)),
+        ('join', 4, lambda outputs: outputs['left'] + outputs['right'], ('left', 'right')),
+    ]
+    outputs = run_stages(stages, workers=2, report_stage=started.append, finish_stage=finished.append)
+    assert outputs['join'] == 'xLxR'
+    assert started[0] == finished[0] == 1 and started[-1] == finished[-1] == 4
+
+
+def test_serial_runs_in_list_order():
+    order = []
+    stages = [(name, number, lambda outputs, name=name: order.append(name), ()) for number, name in enumerate('abc', 1)]
+    run_stages(stages, workers=1)
+    assert order == ['a', 'b', 'c']
+
+
+def test_unmet_dependencies():
+    with pytest.raises(ValueError, match='orphan'):
+        run_stages([('orphan', 1, lambda outputs: None, ('missing',))], workers=2)
+
+
+def test_stage_workers_do_not_change_results():
+    df = pd.read_csv(DATA)
+    serial = run_analysis(df, options=analysis_options({'stage_workers': '1', 'include_pca': '1'}))
+    parallel = run_analysis(df, options=analysis_options({'stage_workers': '4', 'include_pca': '1'}))
+    for results in (serial, parallel):
+        results['clustering'].pop('fit_seconds')
+    assert parallel == serial
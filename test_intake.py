@@ -0,0 +1,43 @@
+# Compact intake layout: one contiguous matrix, Region codes, and the same analysis either way
+import os
+
+import numpy as np
+import pandas as pd
+
+from microplastic import analysis_options, run_analysis
+from microplastic.intake import intake_frame, intake_memory, region_lookup, region_names
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+def test_numeric_columns_share_one_matrix():
+    df = pd.read_csv(DATA)
+    frame = intake_frame(df, 'float32')
+    assert frame.columns.tolist() == df.columns.tolist()
+    assert isinstance(frame['Region'].dtype, pd.CategoricalDtype)
+    values = frame.select_dtypes(include=['number']).to_numpy()
+    assert values.dtype == np.float32 and values.flags['F_CONTIGUOUS']
+    assert np.shares_memory(values, frame['Seafood_Intake'].to_numpy())
+    np.testing.assert_array_equal(values, df.select_dtypes(include=['number']).to_numpy(dtype=np.float32))
+    assert intake_frame(frame, 'float32') is frame
+    assert intake_memory(frame) < intake_memory(df)
+
+
+def test_region_lookup_keeps_missing_regions():
+    regions = pd.Series(['USA', None, 'China', 'USA'])
+    for column in (regions, regions.astype('category')):
+        codes, names = region_lookup(column)
+        looked_up = region_names(codes, names)
+        assert looked_up[0] == looked_up[3] == 'USA' and looked_up[2] == 'China'
+        assert looked_up[1] != looked_up[1]  # NaN, as in the column
+
+
+def test_analysis_is_the_same_in_either_layout():
+    df = pd.read_csv(DATA)
+    plain = run_analysis(df, options=analysis_options({}))
+    compact = run_analysis(intake_frame(df), options=analysis_options({}))
+    for section in ('global_insights', 'country_analyses', 'food_source_analysis', 'population_clusters'):
+        assert plain[section] == compact[section]
+    narrow = run_analysis(df, options=analysis_options({'dtype': 'float32'}))
+    assert narrow['memory']['dtype'] == 'float32'
+    assert narrow['research_summary'] == plain['research_summary']
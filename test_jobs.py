@@ -0,0 +1,112 @@
+# Background jobs: status, results, failures, the queue limit and shared job directories
+import json
+import time
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+from microplastic import AnalysisInputError
+
+STAGES = ['Read', 'Analyze', 'Report']
+
+
+def staged_sum(values, reporter):
+    for stage in range(1, len(STAGES) + 1):
+        reporter(stage)
+    return {'total': sum(values)}
+
+
+def reject_upload(reporter):
+    reporter(1)
+    raise AnalysisInputError('No food intake columns found')
+
+
+def crash(reporter):
+    raise RuntimeError('worker crashed')
+
+
+def sleep_then_return(seconds, reporter):
+    time.sleep(seconds)
+    return {}
+
+
+def wait_until_finished(manager, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status['state'] in ('done', 'failed'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+@pytest.fixture(scope='module')
+def manager(tmp_path_factory):
+    # One worker pool for the module: spawning workers costs seconds
+    manager = JobManager(STAGES, max_workers=1, max_pending=2, spool_dir=str(tmp_path_factory.mktemp('spool')),
+                         client_errors=(AnalysisInputError,))
+    yield manager
+    manager.shutdown()
+
+
+def test_job_result_and_status(manager):
+    job_id = manager.submit(staged_sum, [1, 2, 3])
+    status = wait_until_finished(manager, job_id)
+    assert status['state'] == 'done'
+    assert status['stage'] == 'Report'
+    assert (status['stage_number'], status['stage_count'], status['progress']) == (3, 3, 1.0)
+    assert status['error'] is None
+    assert manager.job(job_id)['results'] == {'total': 6}
+
+    manager.store_payload(job_id, b'{"total": 6}')
+    assert manager.job(job_id)['results'] is None
+    assert manager.job(job_id)['payload'] == b'{"total": 6}'
+
+
+def test_failures_record_their_kind(manager):
+    rejected = wait_until_finished(manager, manager.submit(reject_upload))
+    assert (rejected['state'], rejected['error_kind']) == ('failed', 'input')
+    assert rejected['error'] == 'No food intake columns found'
+
+    crashed = wait_until_finished(manager, manager.submit(crash))
+    assert (crashed['state'], crashed['error_kind'], crashed['error']) == ('failed', 'internal', 'worker crashed')
+
+
+def test_unknown_job(manager):
+    assert manager.status('0' * 32) is None
+    assert manager.job('not-a-job') is None
+
+
+def test_queue_full(manager):
+    jobs = [manager.submit(sleep_then_return, 0.5) for _ in range(2)]
+    with pytest.raises(JobQueueFull):
+        manager.submit(sleep_then_return, 0)
+    for job_id in jobs:
+        wait_until_finished(manager, job_id)
+    # Finished jobs no longer count against the limit
+    wait_until_finished(manager, manager.submit(sleep_then_return, 0))
+
+
+def test_completed_jobs_are_pruned():
+    # Recording completed jobs never starts the worker pool
+    manager = JobManager(STAGES, max_finished=2)
+    job_ids = [manager.add_completed(b'{}', cache_key=str(i)) for i in range(3)]
+    assert manager.status(job_ids[0]) is None
+    assert [manager.status(job_id)['state'] for job_id in job_ids[1:]] == ['done', 'done']
+    assert manager.job(job_ids[2])['cache_key'] == '2'
+
+
+def test_shared_directory_serves_other_processes(tmp_path):
+    shared = str(tmp_path / 'jobs')
+    accepting = JobManager(STAGES, max_workers=1, spool_dir=str(tmp_path), shared_dir=shared)
+    accepting.render = lambda cache_key, results: json.dumps({'key': cache_key, **results}).encode()
+    # Another server process: it never submits, so it only sees the shared records
+    other = JobManager(STAGES, shared_dir=shared)
+    try:
+        job_id = accepting.submit(staged_sum, [4, 5], cache_key='abc')
+        wait_until_finished(accepting, job_id)
+        status = other.status(job_id)
+        assert (status['state'], status['stage_number']) == ('done', 3)
+        assert json.loads(other.job(job_id)['payload']) == {'key': 'abc', 'total': 9}
+    finally:
+        accepting.shutdown()
@@ -0,0 +1,56 @@
+# JSON providers: orjson output parses to the same results as the standard library encoder
+import json
+import os
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from json_provider import NumpyJSONProvider, OrjsonProvider
+from microplastic import analysis_options, analyze_csv
+
+pytest.importorskip('orjson')
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+@pytest.fixture(scope='module')
+def providers():
+    app = Flask(__name__)
+    return OrjsonProvider(app), NumpyJSONProvider(app)
+
+
+@pytest.mark.parametrize('values', [
+    {},
+    {'dtype': 'float32', 'compact': '1'},
+    {'aggregate': 'region', 'dtype': 'float32'},
+    {'clusters': 'auto'},
+    {'mode': 'streaming'},
+])
+def test_analysis_results_match(providers, values):
+    results = analyze_csv(DATA, analysis_options(values))
+    results.pop('plot_spec', None)
+    results.pop('country_table', None)
+    fast, standard = providers
+    assert json.loads(fast.dumps(results)) == json.loads(standard.dumps(results))
+
+
+def test_numpy_values_and_representation(providers):
+    fast, standard = providers
+    value = {
+        'counts': np.array([[1, 2], [3, 4]], dtype=np.int32),
+        'total': np.int64(7),
+        'flags': np.array([True, False]),
+        'names': np.array(['Côte d\'Ivoire', 'Türkiye'], dtype=object),
+        'empty': np.array([], dtype=np.float64),
+        'missing': np.array([1.5, np.nan]),
+    }
+    fast_value = json.loads(fast.dumps(value))
+    standard_value = json.loads(standard.dumps(value))
+    assert standard_value['missing'][1] != standard_value['missing'][1]  # NaN
+    assert fast_value.pop('missing') == [1.5, None]
+    standard_value.pop('missing')
+    assert fast_value == standard_value
+    # Text is UTF-8 rather than \u escapes
+    assert 'Türkiye' in fast.dumps(value['names'])
+    assert fast.loads(fast.dumps({'b': 1, 'a': [2]})) == {'a': [2], 'b': 1}
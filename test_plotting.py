@@ -0,0 +1,53 @@
+# Cluster plot specs: content ids, round trips and off-request rendering
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from microplastic import analysis_options, run_analysis
+from microplastic.plotting import (PLOT_FORMATS, decode_plot_spec, encode_plot_spec, pca_coordinates, plot_id,
+                                   render_cluster_plot)
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+MAGIC = {'png': b'\x89PNG', 'svg': b'<?xml', 'webp': b'RIFF'}
+
+
+@pytest.fixture(scope='module')
+def results():
+    return run_analysis(pd.read_csv(DATA), options=analysis_options({'include_pca': '1'}))
+
+
+def test_spec_round_trip(results):
+    spec = decode_plot_spec(results['plot_spec'])
+    assert plot_id(spec) == results['visualization_id']
+    again = decode_plot_spec(encode_plot_spec(spec))
+    assert all(np.array_equal(again[name], spec[name]) for name in spec)
+    assert pca_coordinates(spec) == results['pca_coordinates']
+    assert len(spec['pc1']) == len(spec['countries']) == 60
+    assert spec['legend'].tolist() == [f"{cluster['risk_category']} (n={cluster['sample_count']})"
+                                       for cluster in results['population_clusters']]
+
+
+def test_ids_follow_content(results):
+    spec = decode_plot_spec(results['plot_spec'])
+    moved = dict(spec, pc1=spec['pc1'] + np.float32(1))
+    assert plot_id(moved) != plot_id(spec)
+    assert plot_id(dict(spec)) == plot_id(spec)
+
+
+@pytest.mark.parametrize('fmt', list(PLOT_FORMATS))
+def test_render_formats(results, fmt):
+    image = render_cluster_plot(decode_plot_spec(results['plot_spec']), fmt, dpi=60)
+    assert image.startswith(MAGIC[fmt])
+
+
+def png_width(image):
+    return int.from_bytes(image[16:20], 'big')
+
+
+def test_dpi_sets_resolution(results):
+    spec = decode_plot_spec(results['plot_spec'])
+    small, large = (png_width(render_cluster_plot(spec, 'png', dpi)) for dpi in (50, 100))
+    # About twice as wide; the tight bounding box is not exactly proportional
+    assert abs(large - 2 * small) <= 0.02 * large
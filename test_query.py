@@ -0,0 +1,84 @@
+# Region and per-food indexes of a country table against brute-force filtering
+import numpy as np
+import pytest
+
+from microplastic.errors import AnalysisInputError
+from microplastic.query import build_index, query_rows
+
+
+def make_table(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    food = rng.integers(0, 50, size=(rows, 2)).astype(np.float64)  # integers, so ties are common
+    food[rng.random(rows) < 0.1, 1] = np.nan
+    total = np.nansum(food, axis=1)
+    return {
+        'sample_id': np.arange(rows),
+        'country': rng.integers(0, 3, size=rows).astype(np.int32),
+        'country_names': np.array(['China', 'Norway', 'USA']),
+        'total_intake': total,
+        'average_intake': total / 2,
+        'food_intake': food,
+        'food_sources': np.array(['Seafood', 'Bottled Water']),
+        'food_columns': np.array(['Seafood_Intake', 'Bottled_Water_Intake'])
+    }
+
+
+def expected_rows(values, mask):
+    """Matching rows, highest value first and ties in table order"""
+    rows = np.flatnonzero(mask & ~np.isnan(values))
+    return rows[np.argsort(-values[rows], kind='stable')].tolist()
+
+
+def test_region_lookup():
+    table = make_table()
+    index = build_index(table)
+    rows, name = query_rows(index, region='Norway')
+    assert name is None
+    assert rows.tolist() == np.flatnonzero(table['country'] == 1).tolist()
+    assert query_rows(index, region='Atlantis')[0].tolist() == []
+
+
+@pytest.mark.parametrize('region', [None, 'China', 'USA'])
+@pytest.mark.parametrize('minimum, maximum', [(None, None), (10, None), (None, 20), (10, 20), (20, 10)])
+def test_range(region, minimum, maximum):
+    table = make_table()
+    index = build_index(table)
+    values = table['food_intake'][:, 0]
+    mask = np.ones(len(values), dtype=bool)
+    if region is not None:
+        mask &= table['country_names'][table['country']] == region
+    if minimum is not None:
+        mask &= values >= minimum
+    if maximum is not None:
+        mask &= values <= maximum
+    rows, name = query_rows(index, region, 'seafood_intake', minimum, maximum)
+    assert name == 'Seafood'
+    assert rows.tolist() == expected_rows(values, mask)
+
+
+def test_top_n():
+    table = make_table()
+    index = build_index(table)
+    rows, name = query_rows(index, by='Total_Intake', top=10)
+    assert name == 'total_intake'
+    assert rows.tolist() == expected_rows(table['total_intake'], np.ones(300, dtype=bool))[:10]
+    china = table['country'] == 0
+    rows, _ = query_rows(index, region='China', by='total intake', top=5)
+    assert rows.tolist() == expected_rows(table['total_intake'], china)[:5]
+
+
+def test_nan_rows_never_match():
+    table = make_table()
+    index = build_index(table)
+    values = table['food_intake'][:, 1]
+    rows, _ = query_rows(index, by='bottled water')
+    assert not np.isnan(values[rows]).any()
+    assert rows.tolist() == expected_rows(values, np.ones(300, dtype=bool))
+    rows, _ = query_rows(index, region='USA', by='Bottled_Water_Intake', minimum=0)
+    assert rows.tolist() == expected_rows(values, table['country'] == 2)
+
+
+def test_unknown_key():
+    index = build_index(make_table())
+    with pytest.raises(AnalysisInputError):
+        query_rows(index, by='Rice_Intake')
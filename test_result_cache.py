@@ -0,0 +1,63 @@
+# Two-tier result cache: memory LRU, disk tier, eviction and content-addressed keys
+import io
+import os
+import time
+
+from result_cache import ResultCache, hash_upload
+
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    assert cache.get('a') == b'1'  # 'a' is now the most recently used
+    cache.put('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1' and cache.get('c') == b'3'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['memory_entries']) == (3, 1, 1, 2)
+
+
+def test_disk_tier_outlives_memory(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put('a', b'first')
+    cache.put('b', b'second')
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'b.json']
+    assert cache.get('a') == b'first'
+    assert cache.stats()['disk_hits'] == 1
+    # A new instance (e.g. after a restart) reads the same directory
+    assert ResultCache(disk_dir=str(tmp_path)).get('b') == b'second'
+
+
+def test_disk_eviction_by_bytes(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path), max_disk_bytes=25)
+    for key in 'abc':
+        cache.put(key, b'x' * 10)
+        # Distinct mtimes, so the least recently used entry is well defined
+        past = time.time() - 100 + ord(key)
+        os.utime(tmp_path / f'{key}.json', (past, past))
+    cache.put('d', b'x' * 10)
+    assert sorted(os.listdir(tmp_path)) == ['c.json', 'd.json']
+    assert cache.stats()['disk_bytes'] == 20
+
+
+def test_extension_names_payload_type(tmp_path):
+    specs = ResultCache(disk_dir=str(tmp_path / 'plots'), extension='.npz')
+    images = ResultCache(disk_dir=str(tmp_path / 'images'), extension='')
+    specs.put('abc', b'spec')
+    images.put('abc.150.png', b'image')
+    assert os.listdir(tmp_path / 'plots') == ['abc.npz']
+    assert os.listdir(tmp_path / 'images') == ['abc.150.png']
+    assert images.stats()['disk_entries'] == 1
+    images.clear()
+    assert os.listdir(tmp_path / 'images') == []
+    assert specs.get('abc') == b'spec'
+
+
+def test_keys_follow_content_and_parameters():
+    upload = io.BytesIO(b'Region,Seafood_Intake\nA,1\n')
+    digest = hash_upload(upload)
+    assert upload.tell() == 0
+    assert ResultCache.make_key(digest, {'clusters': 3}) == ResultCache.make_key(digest, {'clusters': 3})
+    assert ResultCache.make_key(digest, {'clusters': 3}) != ResultCache.make_key(digest, {'clusters': 4})
+    assert digest != hash_upload(io.BytesIO(b'Region,Seafood_Intake\nA,2\n'))
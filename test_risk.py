@@ -0,0 +1,53 @@
+# Vectorized risk table against the original per-row loop over get_risk_level()
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from create_sample_data import create_scaled_dataset
+from microplastic.constants import FOOD_SOURCE_INFO, HEALTH_THRESHOLDS, RISK_LEVELS
+from microplastic.risk import (analyze_country_risk, build_country_analyses, compute_risk_table, get_risk_level,
+                               risk_level_codes, round_intake)
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+def per_row_analyses(df):
+    """Country analyses as /analyze built them row by row"""
+    analyses = []
+    for idx, row in df.iterrows():
+        numeric_row = row[df.select_dtypes(include=['number']).columns]
+        analysis = analyze_country_risk(numeric_row)
+        analysis['country'] = row.get('Region', f'Sample {idx + 1}')
+        analysis['sample_id'] = idx + 1
+        breakdown = []
+        for col in numeric_row.index:
+            if col in FOOD_SOURCE_INFO:
+                risk_level, color = get_risk_level(numeric_row[col])
+                breakdown.append({'food_source': FOOD_SOURCE_INFO[col]['name'], 'intake_level': round(numeric_row[col], 1),
+                                  'risk_level': risk_level, 'color': color})
+        analysis['food_breakdown'] = sorted(breakdown, key=lambda x: x['intake_level'], reverse=True)
+        analyses.append(analysis)
+    return sorted(analyses, key=lambda x: x['total_intake'], reverse=True)
+
+
+def test_risk_codes_match_get_risk_level():
+    thresholds = np.array(list(HEALTH_THRESHOLDS.values()), dtype=np.float64)
+    values = np.concatenate([thresholds, np.nextafter(thresholds, 0), [0.0, 1e6],
+                             np.random.default_rng(1).uniform(0, 600, 1000)])
+    codes = risk_level_codes(values)
+    assert [RISK_LEVELS[code] for code in codes] == [get_risk_level(value)[0] for value in values]
+
+
+def test_round_intake_matches_round():
+    rng = np.random.default_rng(2)
+    # Many exact .x5 values, where np.round and round() can disagree
+    values = np.concatenate([rng.integers(0, 100000, 5000) / 100 + 0.005, rng.uniform(0, 2000, 5000)])
+    assert round_intake(values).tolist() == [round(value, 1) for value in values.tolist()]
+
+
+@pytest.mark.parametrize('df', [pd.read_csv(DATA), create_scaled_dataset(800, seed=5),
+                                pd.read_csv(DATA).drop(columns='Region')], ids=['bundled', 'synthetic', 'no-region'])
+def test_country_analyses_match_per_row_loop(df):
+    assert build_country_analyses(compute_risk_table(df)) == per_row_analyses(df)
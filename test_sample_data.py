@@ -0,0 +1,49 @@
+# Synthetic dataset generator: output independent of worker count and chunking of the formatter
+import io
+
+import pandas as pd
+import pytest
+
+from create_sample_data import create_scaled_dataset, format_csv_chunk, main, select_countries
+
+
+def generate(path, *flags):
+    assert main(['--output', str(path), '--seed', '7', '--chunk-rows', '300'] + list(flags)) == 0
+    return path.read_bytes()
+
+
+def test_workers_do_not_change_the_file(tmp_path):
+    serial = generate(tmp_path / 'serial.csv', '--rows', '1000', '-j', '1')
+    parallel = generate(tmp_path / 'parallel.csv', '--rows', '1000', '-j', '3')
+    assert serial == parallel
+    frame = pd.read_csv(io.BytesIO(serial))
+    assert len(frame) == 1000
+    pd.testing.assert_frame_equal(frame, create_scaled_dataset(1000, seed=7, chunk_rows=300))
+
+
+def test_per_country_counts(tmp_path):
+    data = generate(tmp_path / 'counts.csv', '--countries', 'China=400,USA,Norway=5', '--per-country', '20', '-j', '2')
+    frame = pd.read_csv(io.BytesIO(data))
+    assert frame['Region'].tolist() == ['China'] * 400 + ['USA'] * 20 + ['Norway'] * 5
+
+
+def test_csv_formatting_matches_pandas():
+    chunk = create_scaled_dataset(2000, seed=3)
+    chunk.loc[0, 'Region'] = 'Korea, Republic of'
+    assert format_csv_chunk(chunk) == chunk.to_csv(index=False)
+    assert format_csv_chunk(chunk.iloc[:0], header=False) == ''
+
+
+def test_parquet_matches_csv(tmp_path):
+    pytest.importorskip('pyarrow')
+    generate(tmp_path / 'data.csv', '--rows', '700', '-j', '2')
+    generate(tmp_path / 'data.parquet', '--rows', '700', '-j', '2')
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'data.parquet'), pd.read_csv(tmp_path / 'data.csv'))
+
+
+def test_invalid_country_selection():
+    with pytest.raises(ValueError):
+        select_countries('Atlantis=5')
+    with pytest.raises(ValueError):
+        select_countries('China=5,USA')
+    assert main(['--countries', 'USA']) == 2
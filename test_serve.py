@@ -0,0 +1,61 @@
+# Production server entry point: server choice, shared state between workers, and option checks
+import os
+
+import pytest
+
+import serve
+
+
+@pytest.fixture
+def clean_env(monkeypatch):
+    for name in ('MICROPLASTIC_CACHE_DIR', 'MICROPLASTIC_JOB_DIR'):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+@pytest.fixture
+def launched(clean_env):
+    """Arguments main() would start each server with, without starting one"""
+    calls = {}
+    clean_env.setattr(serve, 'run_gunicorn', lambda *args: calls.setdefault('gunicorn', args))
+    clean_env.setattr(serve, 'run_waitress', lambda *args: calls.setdefault('waitress', args))
+    return calls
+
+
+def test_single_worker_keeps_state_in_process(clean_env):
+    assert serve.share_state_between_workers(1) is None
+    assert 'MICROPLASTIC_CACHE_DIR' not in os.environ
+
+
+def test_workers_share_cache_and_job_directories(clean_env):
+    root = serve.share_state_between_workers(4)
+    assert os.environ['MICROPLASTIC_CACHE_DIR'] == os.path.join(root, 'cache')
+    assert os.environ['MICROPLASTIC_JOB_DIR'] == os.path.join(root, 'jobs')
+
+
+def test_explicit_directories_win(clean_env, tmp_path):
+    clean_env.setenv('MICROPLASTIC_CACHE_DIR', str(tmp_path))
+    serve.share_state_between_workers(2)
+    assert os.environ['MICROPLASTIC_CACHE_DIR'] == str(tmp_path)
+
+
+def test_gunicorn_launch(launched):
+    pytest.importorskip('gunicorn')
+    assert serve.main(['--server', 'gunicorn', '--workers', '3', '--threads', '2', '--bind', '127.0.0.1:9999']) == 0
+    wsgi_app, bind, workers, threads, timeout, shared_root = launched['gunicorn']
+    assert (bind, workers, threads, timeout) == ('127.0.0.1:9999', 3, 2, serve.DEFAULT_TIMEOUT)
+    assert wsgi_app.name == 'app' and shared_root is not None
+
+
+def test_waitress_runs_one_process(launched):
+    assert serve.main(['--server', 'waitress', '--workers', '3']) == 0
+    assert launched['waitress'][2:] == (3, 4)
+    assert 'MICROPLASTIC_CACHE_DIR' not in os.environ
+
+
+def test_server_choice_and_validation(launched):
+    assert serve.choose_server('waitress') == 'waitress'
+    assert serve.choose_server('auto') in ('gunicorn', 'waitress')
+    with pytest.raises(SystemExit):
+        serve.main(['--workers', '0'])
+    assert not launched
@@ -0,0 +1,73 @@
+# Quantile sketch rank error, merging and state round-trips
+import json
+
+import numpy as np
+import pytest
+
+from microplastic.sketches import QuantileSketch, rank_error, sketch_k
+
+QS = np.linspace(0.01, 0.99, 99)
+
+
+def data(seed=0, rows=40_000):
+    rng = np.random.default_rng(seed)
+    return rng.lognormal(4, 0.8, rows)
+
+
+def max_rank_error(sorted_values, estimates):
+    """Largest distance between each q and the rank range of its estimate, as a fraction of the count"""
+    n = len(sorted_values)
+    lower = np.searchsorted(sorted_values, estimates, side='left') / n
+    upper = np.searchsorted(sorted_values, estimates, side='right') / n
+    return float(np.max(np.maximum(lower - QS, QS - upper).clip(min=0)))
+
+
+def streamed(values, k, chunks=20, seed=42):
+    sketch = QuantileSketch(k=k, seed=seed)
+    for chunk in np.array_split(values, chunks):
+        sketch.update(chunk)
+    return sketch
+
+
+@pytest.mark.parametrize('k', [32, 200, 1000])
+def test_rank_error_within_bound(k):
+    values = data()
+    sketch = streamed(values, k)
+    assert sketch.count == len(values)
+    assert max_rank_error(np.sort(values), sketch.quantiles(QS)) <= sketch.rank_error
+
+
+@pytest.mark.parametrize('k', [32, 200])
+def test_merged_partitions_within_bound(k):
+    values = data(1)
+    parts = [streamed(part, k, chunks=5, seed=seed) for seed, part in enumerate(np.array_split(values, 4))]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    single = streamed(values, k)
+
+    ordered = np.sort(values)
+    assert merged.count == single.count == len(values)
+    assert (merged.min, merged.max) == (ordered[0], ordered[-1])
+    assert max_rank_error(ordered, merged.quantiles(QS)) <= rank_error(k)
+    # Both answers lie within the bound of the true rank, so of each other within twice that
+    rank_gap = np.abs(np.searchsorted(ordered, merged.quantiles(QS)) - np.searchsorted(ordered, single.quantiles(QS)))
+    assert rank_gap.max() / len(values) <= 2 * rank_error(k)
+
+
+def test_sketch_k_meets_error():
+    for error in (0.001, 0.01, 0.05):
+        assert rank_error(sketch_k(error)) <= error
+        assert rank_error(sketch_k(error) - 1) > error
+
+
+def test_state_round_trip():
+    values = data(2)
+    sketch = streamed(values[:20_000], 100)
+    restored = QuantileSketch.from_state(json.loads(json.dumps(sketch.state())))
+    assert np.array_equal(restored.quantiles(QS), sketch.quantiles(QS))
+    # The compaction RNG is restored too, so both continue identically
+    sketch.update(values[20_000:])
+    restored.update(values[20_000:])
+    assert np.array_equal(restored.quantiles(QS), sketch.quantiles(QS))
+    assert restored.count == sketch.count
@@ -0,0 +1,54 @@
+# Fused column statistics against pandas' per-column reductions
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from microplastic.intake import intake_frame
+from microplastic.stats import column_statistics
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+
+
+def numeric(df):
+    return df.select_dtypes(include=['number'])
+
+
+def with_blanks(df):
+    df = df.copy()
+    df.iloc[[3, 17, 40], 1] = np.nan
+    df.iloc[[5], 4] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('df', [pd.read_csv(DATA), with_blanks(pd.read_csv(DATA)), intake_frame(pd.read_csv(DATA))],
+                         ids=['bundled', 'blanks', 'intake-frame'])
+def test_statistics_match_pandas(df):
+    values = numeric(df)
+    stats = column_statistics(values)
+    assert stats['columns'] == values.columns.tolist()
+    assert stats['count'].tolist() == values.count().tolist()
+    np.testing.assert_allclose(stats['mean'], values.mean(), rtol=1e-12)
+    assert stats['min'].tolist() == values.min().tolist()
+    assert stats['max'].tolist() == values.max().tolist()
+    np.testing.assert_allclose(stats['median'], values.median(), rtol=1e-12)
+    np.testing.assert_allclose(stats['p75'], values.quantile(0.75), rtol=1e-12)
+    assert stats['above_p75'].tolist() == (values > values.quantile(0.75)).sum().tolist()
+    # Row totals skip blanks and add columns left to right, like sum()
+    assert stats['totals'].tolist() == [sum(value for value in row if value == value)
+                                        for row in values.itertuples(index=False)]
+
+
+def test_float32_statistics_are_float64():
+    stats = column_statistics(numeric(intake_frame(pd.read_csv(DATA), 'float32')))
+    assert stats['values'].dtype == np.float32
+    for key in ('mean', 'min', 'max', 'median', 'p75', 'totals'):
+        assert stats[key].dtype == np.float64
+
+
+def test_empty_table():
+    stats = column_statistics(numeric(pd.read_csv(DATA)).iloc[:0])
+    assert stats['count'].tolist() == [0] * 5
+    assert np.isnan(stats['mean']).all() and np.isnan(stats['median']).all()
+    assert len(stats['totals']) == 0
@@ -0,0 +1,92 @@
+# Persistent datasets: appends and recomputes against streaming-mode analysis of the same samples
+import io
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from microplastic import analyze_streaming
+from microplastic.store import DatasetStore
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+# Sections computed from running sums, extremes and risk counts, exact after every append
+EXACT_SECTIONS = ('global_insights', 'research_summary', 'country_analyses')
+# Sections that also use the sketched medians and 75th percentiles, exact after a recompute
+STREAM_SECTIONS = EXACT_SECTIONS + ('food_source_analysis', 'consumption_patterns', 'quantile_estimates')
+
+
+def csv_file(frame):
+    return io.BytesIO(frame.to_csv(index=False).encode())
+
+
+@pytest.fixture
+def samples():
+    return pd.read_csv(DATA)
+
+
+@pytest.fixture
+def store(tmp_path, samples):
+    store = DatasetStore(str(tmp_path / 'survey'))
+    store.append(csv_file(samples[:25]))
+    store.append(csv_file(samples[25:]))
+    return store
+
+
+def saved_state(store, keys):
+    with open(store.state_path) as f:
+        saved = json.load(f)
+    return {key: saved[key] for key in keys}
+
+
+def test_appends_match_streaming(store, samples):
+    results = store.results()
+    expected = analyze_streaming(csv_file(samples))
+    assert results['dataset']['rows'] == len(samples)
+    assert results['dataset']['batches'] == 2
+    for section in EXACT_SECTIONS:
+        assert results[section] == expected[section], section
+    assert results['clustering']['rows'] + results['clustering']['pending_rows'] == len(samples)
+
+
+def test_recompute_matches_streaming(store, samples):
+    store.recompute()
+    results = store.results()
+    expected = analyze_streaming(csv_file(samples))
+    assert results['dataset']['appends_since_recompute'] == 0
+    for section in STREAM_SECTIONS:
+        assert results[section] == expected[section], section
+
+    # Per-food figures against the samples themselves
+    foods = {food['food_source']: food for food in results['food_source_analysis']}
+    for column, name in (('Seafood_Intake', 'Seafood'), ('Bottled_Water_Intake', 'Bottled Water')):
+        assert foods[name]['global_average'] == round(samples[column].mean(), 1)
+        assert foods[name]['highest_exposure'] == samples[column].max()
+
+
+def test_recompute_reproduces_state(store):
+    # Running statistics and per-region aggregates are rebuilt exactly as the appends left them
+    appended = saved_state(store, ('columns', 'stats', 'regions', 'batches'))
+    store.recompute()
+    assert saved_state(store, appended) == appended
+
+    # Recomputing again changes nothing but the clusters, which keep refining from their centroids
+    statistics = ('columns', 'stats', 'regions', 'itemsets', 'above_p75', 'batches', 'appends_since_recompute')
+    recomputed = saved_state(store, statistics)
+    results = store.results()
+    store.recompute()
+    assert saved_state(store, statistics) == recomputed
+    again = store.results()
+    for section in STREAM_SECTIONS:
+        assert again[section] == results[section], section
+
+
+def test_small_first_batches_are_clustered(tmp_path, samples):
+    store = DatasetStore(str(tmp_path / 'small'))
+    store.append(csv_file(samples[:1]))
+    assert store.results()['clustering']['pending_rows'] == 1
+    store.append(csv_file(samples[1:20]))
+    clustering = store.results()['clustering']
+    assert clustering['fitted'] and clustering['pending_rows'] == 0
+    assert clustering['rows'] == 20
+    assert sum(cluster['sample_count'] for cluster in store.results()['population_clusters']) == 20
@@ -0,0 +1,51 @@
+# Streaming mode against full mode: the sections both compute agree, blank cells included
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from microplastic import analysis_options, analyze_csv
+from microplastic.constants import RISK_BINS
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'global_microplastic_research_data.csv')
+# Sections computed from sums, extremes and risk counts (the medians and 75th percentiles are sketched)
+SHARED_SECTIONS = ('global_insights', 'research_summary')
+
+
+def with_blanks(frame, cells=12, seed=0):
+    frame = frame.copy()
+    numeric = frame.select_dtypes(include=['number']).columns
+    rng = np.random.default_rng(seed)
+    for _ in range(cells):
+        frame.loc[int(rng.integers(len(frame))), numeric[int(rng.integers(len(numeric)))]] = np.nan
+    return frame
+
+
+def analyze(frame, mode):
+    upload = io.BytesIO(frame.to_csv(index=False).encode())
+    return analyze_csv(upload, analysis_options({'mode': mode}))
+
+
+@pytest.mark.parametrize('blanks', [False, True])
+def test_modes_agree(blanks):
+    frame = pd.read_csv(DATA)
+    if blanks:
+        frame = with_blanks(frame)
+    full, streaming = analyze(frame, 'full'), analyze(frame, 'streaming')
+    for section in SHARED_SECTIONS:
+        assert full[section] == streaming[section]
+    for full_source, streaming_source in zip(full['food_source_analysis'], streaming['food_source_analysis']):
+        for key in ('food_source', 'global_average', 'highest_exposure', 'lowest_exposure'):
+            assert full_source[key] == streaming_source[key]
+
+
+def test_blank_cells_count_as_no_intake():
+    frame = with_blanks(pd.read_csv(DATA))
+    numeric = frame.select_dtypes(include=['number'])
+    averages = numeric.sum(axis=1, skipna=True).to_numpy() / numeric.shape[1]
+    counts = np.bincount(np.digitize(averages, RISK_BINS), minlength=len(RISK_BINS) + 1)
+    expected = {'high_risk': int(counts[2] + counts[3]), 'moderate_risk': int(counts[1]), 'low_risk': int(counts[0])}
+    for mode in ('full', 'streaming'):
+        assert analyze(frame, mode)['research_summary']['risk_distribution'] == expected
@@ -0,0 +1,68 @@
+# Stage instrumentation: per-stage timings and memory, and their Prometheus histograms
+import time
+
+import numpy as np
+
+from metrics import Histogram
+from microplastic.timing import StageTimer
+
+STAGES = ['Read', 'Transform', 'Write']
+
+
+def test_stages_end_where_the_next_starts():
+    timer = StageTimer(STAGES)
+    timer(1)
+    time.sleep(0.02)
+    timer(2)
+    timer(1)  # reported again; the first start counts
+    time.sleep(0.01)
+    timer.stop()
+    timings = timer.timings()
+    assert list(timings) == ['Read', 'Transform']
+    assert timings['Read'] >= 0.02 and timings['Transform'] >= 0.01
+    assert timer.elapsed() >= timings['Read'] + timings['Transform'] - 1e-3
+    assert [entry['stage_number'] for entry in timer.report()] == [1, 2]
+
+
+def test_overlapping_stages_use_their_own_ends():
+    timer = StageTimer(STAGES)
+    timer(1)
+    timer(2)
+    time.sleep(0.02)
+    timer.finish(2)
+    time.sleep(0.02)
+    timer.finish(1)
+    timer.stop()
+    timings = timer.timings()
+    assert timings['Read'] >= 0.04 and 0.02 <= timings['Transform'] < timings['Read']
+    # Wall clock, not the sum of overlapping stages
+    assert timer.elapsed() < timings['Read'] + timings['Transform']
+
+
+def test_memory_peaks_per_stage():
+    timer = StageTimer(STAGES, trace_memory=True)
+    timer(1)
+    block = np.ones(4 * 1024 * 1024 // 8)  # 4 MiB
+    del block
+    timer(2)
+    timer.stop()
+    peaks = timer.peak_memory()
+    assert peaks['Read'] >= 4 * 1024 * 1024 > peaks['Transform']
+    assert timer.request_peak_memory() >= peaks['Read']
+    assert timer.report()[0]['peak_memory_bytes'] == peaks['Read']
+    assert StageTimer(STAGES).request_peak_memory() is None
+
+
+def test_histogram_text_format():
+    histogram = Histogram('stage_seconds', 'Seconds per stage', (0.1, 1), ('stage',))
+    for seconds in (0.05, 0.5, 5):
+        histogram.observe(seconds, stage='Read "raw"')
+    assert histogram.render() == [
+        '# HELP stage_seconds Seconds per stage',
+        '# TYPE stage_seconds histogram',
+        'stage_seconds_bucket{stage="Read \\"raw\\"",le="0.1"} 1',
+        'stage_seconds_bucket{stage="Read \\"raw\\"",le="1.0"} 2',
+        'stage_seconds_bucket{stage="Read \\"raw\\"",le="+Inf"} 3',
+        'stage_seconds_sum{stage="Read \\"raw\\""} 5.55',
+        'stage_seconds_count{stage="Read \\"raw\\""} 3',
+    ]